@@ -1,7 +1,17 @@
+import os
 import tkinter as tk
-from tkinter import messagebox
-import threading
-import time
+from tkinter import filedialog, messagebox, ttk
+
+import metrics
+from animation import StepPlayer
+from grant_analysis import analyze_requests, pending_requests
+from grid_editor import GridEditor
+from matrix_state import MatrixState
+from verdict_cache import VerdictCache
+
+# Above this many matrix cells the inputs switch to paged grid editors
+ENTRY_LIMIT = 2000
+BANKER_KEYS = ("allocation", "maximum", "available")
 
 class ScrollableFrame(tk.Frame):
     def __init__(self, master):
@@ -32,8 +42,14 @@ class ProMaxBankersVisualizerScrollable:
         self.entries_allocation = []
         self.entries_maximum = []
         self.entries_available = []
+        self.editors = []
+        self.matrix_widgets = []
+        self.state = None
         self.num_processes = 0
         self.num_resources = 0
+        self.player = None
+        # What-if edits often revisit a state; DEADLOCK_VERDICT_CACHE adds a persistent tier
+        self.verdicts = VerdictCache(path=os.environ.get("DEADLOCK_VERDICT_CACHE"))
 
         self.setup_ui()
 
@@ -61,7 +77,25 @@ class ProMaxBankersVisualizerScrollable:
         self.result_label = tk.Label(frame, text="", font=("Arial", 16, "bold"))
         self.result_label.grid(row=4, column=0, columnspan=10, pady=10)
 
-    def create_input_matrices(self):
+        # Playback controls
+        controls = tk.Frame(frame)
+        controls.grid(row=0, column=5, columnspan=5, sticky="w")
+        tk.Button(controls, text="📂 Import", command=self.import_matrices).pack(side="left", padx=2)
+        tk.Button(controls, text="🧾 Grantable", command=self.show_grantable).pack(side="left", padx=2)
+        self.pause_button = tk.Button(controls, text="⏸ Pause", command=self.toggle_playback, width=9)
+        self.pause_button.pack(side="left", padx=2)
+        tk.Button(controls, text="⏭ Jump to Result", command=self.jump_to_result).pack(side="left", padx=2)
+        tk.Label(controls, text="Speed:").pack(side="left", padx=(10, 0))
+        self.speed_scale = tk.Scale(controls, from_=0.5, to=100, resolution=0.5, orient="horizontal",
+                                    length=120, command=self.change_speed)
+        self.speed_scale.set(1)
+        self.speed_scale.pack(side="left")
+        tk.Label(controls, text="Step:").pack(side="left", padx=(10, 0))
+        self.seek_scale = tk.Scale(controls, from_=0, to=0, orient="horizontal", length=200, showvalue=False)
+        self.seek_scale.bind("<ButtonRelease-1>", lambda e: self.seek(self.seek_scale.get()))
+        self.seek_scale.pack(side="left")
+
+    def create_input_matrices(self, state=None):
         frame = self.scroll_frame.scrollable_frame
         try:
             self.num_processes = int(self.proc_entry.get())
@@ -70,114 +104,263 @@ class ProMaxBankersVisualizerScrollable:
             messagebox.showerror("Input Error", "Please enter valid integers.")
             return
 
+        for widget in self.matrix_widgets:
+            widget.destroy()
+        self.matrix_widgets = []
         self.entries_allocation = []
         self.entries_maximum = []
         self.entries_available = []
+        self.editors = []
+        self.state = state or MatrixState.empty(self.num_processes, self.num_resources, BANKER_KEYS)
+
+        def place(widget, row, column, **grid):
+            widget.grid(row=row, column=column, **grid)
+            self.matrix_widgets.append(widget)
+            return widget
+
+        place(tk.Label(frame, text="Allocation Matrix", font=("Arial", 10, "bold")), 5, 0, columnspan=5)
+        place(tk.Label(frame, text="Maximum Matrix", font=("Arial", 10, "bold")), 5, 6, columnspan=5)
+        if self.num_processes * self.num_resources > ENTRY_LIMIT:
+            # Only the visible window of cells gets widgets; edits go straight into self.state
+            self.editors = [place(GridEditor(frame, self.state.allocation), 6, 0, columnspan=5, sticky="nw"),
+                            place(GridEditor(frame, self.state.maximum), 6, 6, columnspan=5, sticky="nw")]
+            place(tk.Label(frame, text="Available:", font=("Arial", 10, "bold")), 7, 0)
+            self.editors.append(place(GridEditor(frame, self.state.available), 8, 0, columnspan=10, sticky="nw"))
+            place(tk.Button(frame, text="Start Visualization", command=self.start_visualization,
+                            bg="#2196F3", fg="white"), 9, 0, columnspan=5)
+            return
 
-        tk.Label(frame, text="Allocation Matrix", font=("Arial", 10, "bold")).grid(row=5, column=0, columnspan=5)
-        for i in range(self.num_processes):
-            row = []
-            for j in range(self.num_resources):
-                e = tk.Entry(frame, width=4)
-                e.grid(row=6 + i, column=j)
-                row.append(e)
-            self.entries_allocation.append(row)
-
-        tk.Label(frame, text="Maximum Matrix", font=("Arial", 10, "bold")).grid(row=5, column=6, columnspan=5)
-        for i in range(self.num_processes):
-            row = []
-            for j in range(self.num_resources):
-                e = tk.Entry(frame, width=4)
-                e.grid(row=6 + i, column=6 + j)
-                row.append(e)
-            self.entries_maximum.append(row)
-
-        tk.Label(frame, text="Available:", font=("Arial", 10, "bold")).grid(row=6 + self.num_processes, column=0)
+        # Cells are left blank unless a loaded state fills them
+        values = self.state.to_lists() if state is not None else {}
+        for entries, key, column in ((self.entries_allocation, "allocation", 0), (self.entries_maximum, "maximum", 6)):
+            for i in range(self.num_processes):
+                row = []
+                for j in range(self.num_resources):
+                    e = place(tk.Entry(frame, width=4), 6 + i, column + j)
+                    if key in values:
+                        e.insert(0, str(values[key][i][j]))
+                    row.append(e)
+                entries.append(row)
+
+        place(tk.Label(frame, text="Available:", font=("Arial", 10, "bold")), 6 + self.num_processes, 0)
         for j in range(self.num_resources):
-            e = tk.Entry(frame, width=4)
-            e.grid(row=7 + self.num_processes, column=j)
+            e = place(tk.Entry(frame, width=4), 7 + self.num_processes, j)
+            if "available" in values:
+                e.insert(0, str(values["available"][j]))
             self.entries_available.append(e)
 
-        tk.Button(frame, text="Start Visualization", command=self.start_visualization_thread, bg="#2196F3", fg="white").grid(row=8 + self.num_processes, column=0, columnspan=5)
+        place(tk.Button(frame, text="Start Visualization", command=self.start_visualization, bg="#2196F3", fg="white"),
+              8 + self.num_processes, 0, columnspan=5)
 
-    def start_visualization_thread(self):
-        threading.Thread(target=self.visualize).start()
+    def show_state(self, state):
+        # Sizes the inputs to a loaded MatrixState and fills them from it
+        for entry, value in ((self.proc_entry, state.num_processes), (self.res_entry, state.num_resources)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.create_input_matrices(state)
 
-    def visualize(self):
+    def load_scenario(self, scenario):
+        # Fills the matrices from a scenario shared by the hub
+        if not all(scenario.get(k) for k in BANKER_KEYS):
+            return
+        self.show_state(MatrixState.from_scenario({k: scenario[k] for k in BANKER_KEYS + ("request",) if k in scenario}))
+
+    def import_matrices(self):
+        # One scenario file, or allocation/maximum/available as separate NPY or CSV files
+        paths = filedialog.askopenfilenames(
+            title="Import matrices",
+            filetypes=[("Matrix files", "*.npy *.npz *.csv *.json"), ("All files", "*.*")])
+        if not paths:
+            return
         try:
-            allocation = [[int(e.get()) for e in row] for row in self.entries_allocation]
-            maximum = [[int(e.get()) for e in row] for row in self.entries_maximum]
-            available = [int(e.get()) for e in self.entries_available]
+            state = MatrixState.load(*paths)
+            missing = [k for k in BANKER_KEYS if getattr(state, k) is None]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+        except Exception as e:
+            messagebox.showerror("Import Error", f"Could not import matrices: {e}")
+            return
+        self.show_state(state)
+
+    def read_state(self):
+        # The inputs as a MatrixState; paged editors already write into self.state
+        if self.editors:
+            if not all([editor.commit() for editor in self.editors]):
+                raise ValueError("invalid cell")
+            return self.state
+        return MatrixState([[int(e.get()) for e in row] for row in self.entries_allocation],
+                           [[int(e.get()) for e in row] for row in self.entries_maximum],
+                           available=[int(e.get()) for e in self.entries_available])
+
+    def start_visualization(self):
+        try:
+            with metrics.phase("parse"):
+                state = self.read_state()
         except:
-            messagebox.showerror("Error", "All fields must be filled with valid integers.")
+            messagebox.showerror("Error", "All fields must be filled with valid non-negative integers.")
+            return
+
+        try:
+            self.result = self.verdicts.check(state.allocation, state.maximum, state.available)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
-        need = [[maximum[i][j] - allocation[i][j] for j in range(self.num_resources)] for i in range(self.num_processes)]
-        finish = [False] * self.num_processes
-        safe_sequence = []
-        work = available[:]
+        self.allocation = state.allocation.tolist()
+        self.need = self.result.need
+        self.available = state.available.tolist()
+        steps = self.record_steps(self.result)
+
+        if self.player is not None:
+            self.player.stop()
+        self.player = StepPlayer(self.master, steps, self.apply_step, reset=self.reset_canvas,
+                                 delay_ms=1000, on_progress=self.update_progress)
+        self.player.set_speed(self.speed_scale.get())
+        self.seek_scale.config(to=len(steps))
+        self.reset_canvas()
+        self.pause_button.config(text="⏸ Pause")
+        self.player.play()
+
+    def show_grantable(self):
+        # Ranks pending requests by whether granting them right now keeps the state safe
+        try:
+            state = self.read_state()
+        except:
+            messagebox.showerror("Error", "All fields must be filled with valid non-negative integers.")
+            return
+        window = tk.Toplevel(self.master)
+        window.title("Grantable Requests")
+        tk.Label(window, text="Pending requests, one per line as P<i>: <instances per resource>",
+                 font=("Arial", 10, "bold")).pack(anchor="w", padx=5)
+        text = tk.Text(window, height=8, width=120, font=("Consolas", 10))
+        text.pack(fill="x", padx=5)
+        # Requests from a loaded scenario; otherwise whether each process could get its whole remaining need
+        loaded = self.state.request if self.state is not None else None
+        pending = loaded if loaded is not None and loaded.shape == state.allocation.shape else state.need
+        text.insert("1.0", "\n".join(f"P{i}: {' '.join(map(str, row))}" for i, row in pending_requests(pending)))
+        summary = tk.Label(window, text="", font=("Arial", 11, "bold"))
+
+        columns = ("rank", "process", "grant", "margin", "request", "reason")
+        table = tk.Frame(window)
+        tree = ttk.Treeview(table, columns=columns, show="headings", height=20)
+        for column, width in zip(columns, (50, 70, 60, 70, 360, 260)):
+            tree.heading(column, text=column.capitalize())
+            tree.column(column, width=width, anchor="w")
+        tree.tag_configure("yes", background="#C8E6C9")
+        tree.tag_configure("no", background="#FFCDD2")
+        scrollbar = tk.Scrollbar(table, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        def analyze():
+            try:
+                requests = []
+                for line in text.get("1.0", tk.END).splitlines():
+                    if line.strip():
+                        process, values = line.split(":", 1)
+                        requests.append((int(process.strip().lstrip("Pp")), [int(v) for v in values.replace(",", " ").split()]))
+                result = analyze_requests(state.allocation, state.maximum, state.available, requests)
+            except ValueError as e:
+                messagebox.showerror("Invalid Request", str(e) or "Write each request as P<i>: <counts>.", parent=window)
+                return
+            tree.delete(*tree.get_children())
+            for rank, row in enumerate(result.rows, 1):
+                verdict = "yes" if row.grantable else "no"
+                margin = "" if row.margin is None else row.margin
+                tree.insert("", tk.END, values=(rank, f"P{row.process}", verdict, margin, row.request, row.reason),
+                            tags=(verdict,))
+            summary.config(text=f"Current state {'safe' if result.baseline_safe else 'UNSAFE'}: "
+                                f"{len(result.grantable)} of {len(result.rows)} requests can be granted now",
+                           fg="green" if result.grantable else "red")
+
+        tk.Button(window, text="Analyze", command=analyze, bg="#2196F3", fg="white").pack(anchor="w", padx=5, pady=5)
+        summary.pack(anchor="w", padx=5)
+        table.pack(fill="both", expand=True, padx=5, pady=5)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        analyze()
+
+    def record_steps(self, result):
+        # The whole run as compact (kind, process, work) steps, computed up front
+        steps = []
+        work = self.available[:]
+        for i in result.sequence:
+            steps.append(("check", i, work))
+            work = [w + a for w, a in zip(work, self.allocation[i])]
+            steps.append(("done", i, work))
+        for i in result.unfinished:
+            steps.append(("blocked", i, work))
+        steps.append(("verdict", None, work))
+        return steps
+
+    def reset_canvas(self):
         self.canvas.delete("all")
         self.status_text.delete("1.0", tk.END)
+        self.result_label.config(text="")
+        self.available_label.config(text="")
         self.process_boxes.clear()
 
         x, y = 40, 40
         for i in range(self.num_processes):
             box = self.canvas.create_rectangle(x, y, x+180, y+130, fill="#e0e0e0")
-            text = self.canvas.create_text(x+90, y+65, text=f"P{i}\nAlloc: {allocation[i]}\nNeed: {need[i]}", font=("Arial", 9))
+            text = self.canvas.create_text(x+90, y+65, text=f"P{i}\nAlloc: {self.allocation[i]}\nNeed: {self.need[i]}", font=("Arial", 9))
             self.process_boxes.append((box, text))
             x += 200
 
-        time.sleep(1)
-        step = 0
-        while step < self.num_processes:
-            allocated = False
-            for i in range(self.num_processes):
-                if not finish[i]:
-                    self.canvas.itemconfig(self.process_boxes[i][0], fill="#FFF176")
-                    self.status_text.insert(tk.END, f"\n🔍 Checking P{i}...\n")
-                    self.status_text.insert(tk.END, f"   Need: {need[i]}\n   Available: {work}\n")
-
-                    if all(need[i][j] <= work[j] for j in range(self.num_resources)):
-                        self.status_text.insert(tk.END, f"✅ P{i} can execute.\n")
-                        self.canvas.itemconfig(self.process_boxes[i][0], fill="#81C784")
-                        self.canvas.itemconfig(self.process_boxes[i][1], text=f"P{i}\n✓ Done")
-                        self.canvas.update()
-                        time.sleep(1)
-
-                        for j in range(self.num_resources):
-                            work[j] += allocation[i][j]
-
-                        finish[i] = True
-                        safe_sequence.append(f"P{i}")
-                        self.update_available_display(work)
-                        allocated = True
-                        step += 1
-                        break
-                    else:
-                        for j in range(self.num_resources):
-                            if need[i][j] > work[j]:
-                                self.status_text.insert(tk.END, f"❌ Cannot allocate R{j}: Need {need[i][j]}, Available {work[j]}\n")
-                        self.canvas.itemconfig(self.process_boxes[i][0], fill="#EF5350")
-                        self.canvas.itemconfig(self.process_boxes[i][1], text=f"P{i}\nBlocked")
-                        self.canvas.update()
-                        time.sleep(1)
-                        self.canvas.itemconfig(self.process_boxes[i][0], fill="#e0e0e0")
-                        self.canvas.itemconfig(self.process_boxes[i][1], text=f"P{i}\nAlloc: {allocation[i]}\nNeed: {need[i]}")
-
-            if not allocated:
-                break
-
-        if len(safe_sequence) == self.num_processes:
-            self.result_label.config(text="✅ SAFE STATE! Sequence: " + " → ".join(safe_sequence), fg="green")
+    def apply_step(self, step):
+        kind, i, work = step
+        need = self.need
+        if kind == "check":
+            self.canvas.itemconfig(self.process_boxes[i][0], fill="#FFF176")
+            self.status_text.insert(tk.END, f"\n🔍 Checking P{i}...\n")
+            self.status_text.insert(tk.END, f"   Need: {need[i]}\n   Available: {work}\n")
+        elif kind == "done":
+            self.status_text.insert(tk.END, f"✅ P{i} can execute.\n")
+            self.canvas.itemconfig(self.process_boxes[i][0], fill="#81C784")
+            self.canvas.itemconfig(self.process_boxes[i][1], text=f"P{i}\n✓ Done")
+            self.update_available_display(work)
+        elif kind == "blocked":
+            self.status_text.insert(tk.END, f"\n🔍 Checking P{i}...\n")
+            self.status_text.insert(tk.END, f"   Need: {need[i]}\n   Available: {work}\n")
+            for j in range(self.num_resources):
+                if need[i][j] > work[j]:
+                    self.status_text.insert(tk.END, f"❌ Cannot allocate R{j}: Need {need[i][j]}, Available {work[j]}\n")
+            self.canvas.itemconfig(self.process_boxes[i][0], fill="#EF5350")
+            self.canvas.itemconfig(self.process_boxes[i][1], text=f"P{i}\nBlocked")
         else:
-            self.result_label.config(text="❌ NOT SAFE! System is in DEADLOCK", fg="red")
+            result = self.result
+            if result.safe:
+                self.result_label.config(text="✅ SAFE STATE! Sequence: " + " → ".join(f"P{p}" for p in result.sequence), fg="green")
+            else:
+                self.result_label.config(text="❌ NOT SAFE! System is in DEADLOCK", fg="red")
+
+    def update_progress(self, position, total):
+        self.seek_scale.set(position)
+        if position >= total:
+            self.pause_button.config(text="▶ Play")
+
+    def toggle_playback(self):
+        if self.player is not None:
+            self.player.toggle()
+            self.pause_button.config(text="⏸ Pause" if self.player.playing else "▶ Play")
+
+    def jump_to_result(self):
+        if self.player is not None:
+            self.player.finish()
+
+    def seek(self, index):
+        if self.player is not None:
+            self.player.seek(index)
+
+    def change_speed(self, value):
+        if self.player is not None:
+            self.player.set_speed(value)
 
     def update_available_display(self, available):
         self.available_label.config(text=f"📦 Available Resources: {available}", fg="blue")
-        self.available_label.update()
-        time.sleep(1)
 
 # Run the app
-root = tk.Tk()
-app = ProMaxBankersVisualizerScrollable(root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    root = tk.Tk()
+    app = ProMaxBankersVisualizerScrollable(root)
+    root.mainloop()
\ No newline at end of file
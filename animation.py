@@ -0,0 +1,111 @@
+import math
+
+
+class StepPlayer:
+    """Plays back precomputed visual steps on the Tk main loop.
+
+    The algorithm runs headlessly first and records a list of steps; `apply`
+    draws one step. Playback is driven by `widget.after`, so nothing sleeps
+    and no widget is touched from another thread. When steps are due faster
+    than one frame, several are applied per frame, so a long run at high
+    speed still finishes in a few seconds. `reset` restores the empty picture
+    and is used when seeking backwards.
+    """
+
+    def __init__(self, widget, steps, apply, reset=None, delay_ms=500, batch=200,
+                 min_frame_ms=16, on_progress=None):
+        self.widget = widget
+        self.steps = steps
+        self.apply = apply
+        self.reset = reset
+        self.delay_ms = delay_ms
+        self.batch = batch
+        self.min_frame_ms = min_frame_ms
+        self.on_progress = on_progress
+        self.speed = 1.0
+        self.position = 0
+        self.playing = False
+        self._job = None
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def done(self):
+        return self.position >= len(self.steps)
+
+    def play(self):
+        if not self.playing and not self.done:
+            self.playing = True
+            self._schedule()
+
+    def pause(self):
+        self.playing = False
+        self._cancel()
+
+    def toggle(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+
+    def set_speed(self, multiplier):
+        self.speed = max(float(multiplier), 1e-3)
+        if self.playing:
+            self._cancel()
+            self._schedule()
+
+    def seek(self, index):
+        index = max(0, min(int(index), len(self.steps)))
+        if index < self.position:
+            if self.reset is not None:
+                self.reset()
+            self.position = 0
+        self._advance(index - self.position)
+
+    def finish(self):
+        # Jump straight to the final picture
+        self.pause()
+        self.seek(len(self.steps))
+
+    def stop(self):
+        self.pause()
+        self.steps = []
+
+    def _frame(self):
+        # (milliseconds between frames, steps per frame)
+        if self.delay_ms <= 0:
+            return 1, self.batch
+        interval = self.delay_ms / self.speed
+        if interval >= self.min_frame_ms:
+            return int(interval), 1
+        return self.min_frame_ms, math.ceil(self.min_frame_ms / interval)
+
+    def _schedule(self):
+        interval, _ = self._frame()
+        # The first step of a fresh run is shown right away
+        self._job = self.widget.after(0 if self.position == 0 else interval, self._tick)
+
+    def _cancel(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _tick(self):
+        self._job = None
+        if not self.playing:
+            return
+        _, count = self._frame()
+        self._advance(count)
+        if self.done:
+            self.playing = False
+        else:
+            self._schedule()
+
+    def _advance(self, count):
+        stop = min(self.position + count, len(self.steps))
+        for step in self.steps[self.position:stop]:
+            self.apply(step)
+        self.position = stop
+        if self.on_progress is not None:
+            self.on_progress(self.position, len(self.steps))
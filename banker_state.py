@@ -0,0 +1,281 @@
+import metrics
+from safety_engine import reduce_by_threshold
+
+INF = float("inf")
+
+
+class _SlackTree:
+    # Segment tree over safe-sequence positions holding, per resource, the
+    # slack work_k - need_k of the process at position k. Supports adding a
+    # vector to every position before `stop` and querying the minimum there.
+    def __init__(self, slacks, num_resources, capacity):
+        self.m = num_resources
+        self.size = 1
+        while self.size < max(capacity, 1):
+            self.size *= 2
+        empty = [INF] * num_resources
+        self.mins = [empty] * (2 * self.size)
+        self.lazy = [None] * (2 * self.size)
+        for k, slack in enumerate(slacks):
+            self.mins[self.size + k] = slack
+        for node in range(self.size - 1, 0, -1):
+            self.mins[node] = [min(a, b) for a, b in zip(self.mins[2 * node], self.mins[2 * node + 1])]
+
+    def _push(self, node):
+        delta = self.lazy[node]
+        if delta is not None:
+            for child in (2 * node, 2 * node + 1):
+                self.mins[child] = [v + d for v, d in zip(self.mins[child], delta)]
+                pending = self.lazy[child]
+                self.lazy[child] = delta if pending is None else [p + d for p, d in zip(pending, delta)]
+            self.lazy[node] = None
+
+    def add_prefix(self, stop, delta, node=1, lo=0, hi=None):
+        hi = self.size if hi is None else hi
+        if stop <= lo:
+            return
+        if hi <= stop:
+            self.mins[node] = [v + d for v, d in zip(self.mins[node], delta)]
+            pending = self.lazy[node]
+            self.lazy[node] = delta if pending is None else [p + d for p, d in zip(pending, delta)]
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        self.add_prefix(stop, delta, 2 * node, lo, mid)
+        self.add_prefix(stop, delta, 2 * node + 1, mid, hi)
+        self.mins[node] = [min(a, b) for a, b in zip(self.mins[2 * node], self.mins[2 * node + 1])]
+
+    def min_prefix(self, stop, node=1, lo=0, hi=None):
+        hi = self.size if hi is None else hi
+        if stop <= lo:
+            return [INF] * self.m
+        if hi <= stop:
+            return self.mins[node]
+        self._push(node)
+        mid = (lo + hi) // 2
+        left = self.min_prefix(stop, 2 * node, lo, mid)
+        right = self.min_prefix(stop, 2 * node + 1, mid, hi)
+        return [min(a, b) for a, b in zip(left, right)]
+
+    def set_leaf(self, pos, slack, node=1, lo=0, hi=None):
+        hi = self.size if hi is None else hi
+        if hi - lo == 1:
+            self.mins[node] = slack
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        if pos < mid:
+            self.set_leaf(pos, slack, 2 * node, lo, mid)
+        else:
+            self.set_leaf(pos, slack, 2 * node + 1, mid, hi)
+        self.mins[node] = [min(a, b) for a, b in zip(self.mins[2 * node], self.mins[2 * node + 1])]
+
+
+class BankerState:
+    """Long-lived Banker's state answering Request/Release calls incrementally.
+
+    The last safe sequence is cached. Granting r to Pi only lowers `work` by r
+    for the processes ordered before Pi (Pi's own need shrinks by the same
+    amount and everything after it sees the same work as before), so a
+    request is admitted if r fits in the minimum slack of that prefix, which a
+    segment tree answers in O(m·log n). Releases and removals can never break
+    the cached sequence. When the fast check fails, the cached sequence is
+    walked to its first broken position and the safety engine resumes from
+    the still valid prefix.
+    """
+
+    def __init__(self, allocation=(), maximum=(), available=(), pids=None):
+        allocation = [list(row) for row in allocation]
+        maximum = [list(row) for row in maximum]
+        if pids is None:
+            pids = [f"P{i}" for i in range(len(allocation))]
+        if len(pids) != len(allocation) or len(maximum) != len(allocation):
+            raise ValueError("Allocation, Maximum and process ids must have the same length.")
+
+        self.available = list(available)
+        self.num_resources = len(self.available)
+        self.allocation = {}
+        self.maximum = {}
+        self.need = {}
+        for pid, alloc_row, max_row in zip(pids, allocation, maximum):
+            self._set_process(pid, max_row, alloc_row)
+
+        # Available plus everything allocated; adding or removing processes only moves units around
+        self.total = list(self.available)
+        for row in self.allocation.values():
+            self.total = [t + a for t, a in zip(self.total, row)]
+
+        self.safe = False
+        self._slots = []        # cached safe sequence, None marks a removed process
+        self._position = {}
+        self._tree = None
+        self._recompute()
+
+    @property
+    def sequence(self):
+        return [pid for pid in self._slots if pid is not None]
+
+    def is_safe(self):
+        return self.safe
+
+    def _check_vector(self, vector, label):
+        vector = list(vector)
+        if len(vector) != self.num_resources:
+            raise ValueError(f"{label} must list exactly {self.num_resources} resource values.")
+        if any(v < 0 for v in vector):
+            raise ValueError(f"{label} cannot contain negative values.")
+        return vector
+
+    def _set_process(self, pid, maximum, allocation):
+        maximum = self._check_vector(maximum, f"Maximum of {pid}")
+        allocation = self._check_vector(allocation, f"Allocation of {pid}")
+        need = [mx - al for al, mx in zip(allocation, maximum)]
+        if any(v < 0 for v in need):
+            raise ValueError(f"{pid} holds more than its maximum claim.")
+        self.allocation[pid] = allocation
+        self.maximum[pid] = maximum
+        self.need[pid] = need
+
+    def _forget(self, pid):
+        del self.allocation[pid]
+        del self.maximum[pid]
+        del self.need[pid]
+
+    def _set_sequence(self, sequence, safe):
+        self._slots = sequence
+        self.safe = safe
+        self._position = {pid: k for k, pid in enumerate(sequence)}
+        self._tree = None
+        if safe:
+            slacks = []
+            work = list(self.available)
+            for pid in sequence:
+                slacks.append([w - n for w, n in zip(work, self.need[pid])])
+                work = [w + a for w, a in zip(work, self.allocation[pid])]
+            self._tree = _SlackTree(slacks, self.num_resources, 2 * len(sequence))
+
+    def _save(self):
+        # A failed check replaces these with new objects, so the old ones can simply be put back
+        return self._slots, self.safe, self._position, self._tree
+
+    def _restore(self, saved):
+        self._slots, self.safe, self._position, self._tree = saved
+
+    def _recompute(self, prefix=(), work=None):
+        # Full safety run, optionally resuming after an already valid prefix. The
+        # rows were validated on the way in, so this skips SafetyEngine's checks
+        pids = list(self.allocation)
+        index = {pid: i for i, pid in enumerate(pids)}
+        done = [False] * len(pids)
+        for pid in prefix:
+            done[index[pid]] = True
+        work = list(self.available if work is None else work)
+        with metrics.phase("safety"):
+            sequence = reduce_by_threshold([self.need[p] for p in pids], [self.allocation[p] for p in pids],
+                                           work, done)
+        safe = all(done)
+        self._set_sequence(list(prefix) + [pids[i] for i in sequence], safe)
+        return safe
+
+    def _revalidate(self):
+        # Walk the cached sequence to its first broken position and resume from there
+        work = list(self.available)
+        sequence = self.sequence
+        for k, pid in enumerate(sequence):
+            if any(n > w for n, w in zip(self.need[pid], work)):
+                return self._recompute(sequence[:k], work)
+            work = [w + a for w, a in zip(work, self.allocation[pid])]
+        return self._recompute(sequence, work)
+
+    def _apply(self, pid, request):
+        self.available = [a - r for a, r in zip(self.available, request)]
+        self.allocation[pid] = [a + r for a, r in zip(self.allocation[pid], request)]
+        self.need[pid] = [n - r for n, r in zip(self.need[pid], request)]
+
+    def request(self, pid, request):
+        """Grant `request` to `pid` if the resulting state is safe.
+
+        Returns True when granted, False when the process has to wait.
+        """
+        request = self._check_vector(request, "Request")
+        if any(r > n for r, n in zip(request, self.need[pid])):
+            raise ValueError(f"{pid} has exceeded its maximum claim.")
+        if any(r > a for r, a in zip(request, self.available)):
+            return False
+
+        if self.safe:
+            pos = self._position[pid]
+            slack = self._tree.min_prefix(pos)
+            if all(r <= s for r, s in zip(request, slack)):
+                self._apply(pid, request)
+                self._tree.add_prefix(pos, [-r for r in request])
+                return True
+
+        saved = self._save()
+        self._apply(pid, request)
+        granted = self._revalidate() if saved[1] else self._recompute()
+        if not granted:
+            self._apply(pid, [-r for r in request])
+            self._restore(saved)
+        return granted
+
+    def release(self, pid, release):
+        release = self._check_vector(release, "Release")
+        if any(r > a for r, a in zip(release, self.allocation[pid])):
+            raise ValueError(f"{pid} cannot release more than it holds.")
+        self._apply(pid, [-r for r in release])
+        if self.safe:
+            self._tree.add_prefix(self._position[pid], release)
+        else:
+            # A release never invalidates a safe sequence, but may rescue an unsafe state
+            self._recompute()
+
+    def add_process(self, pid, maximum, allocation=None):
+        """Admit a new process; returns False (and changes nothing) if unsafe."""
+        if pid in self.allocation:
+            raise ValueError(f"{pid} already exists.")
+        if allocation is None:
+            allocation = [0] * self.num_resources
+        self._set_process(pid, maximum, allocation)
+        allocation = self.allocation[pid]
+        if any(a > v for a, v in zip(allocation, self.available)):
+            self._forget(pid)
+            return False
+
+        if self.safe and len(self._slots) < self._tree.size:
+            # Appended at the end, where work is the total minus its own allocation
+            pos = len(self._slots)
+            slack = self._tree.min_prefix(pos)
+            if (all(a <= s for a, s in zip(allocation, slack))
+                    and all(mx <= t for mx, t in zip(self.maximum[pid], self.total))):
+                self.available = [v - a for v, a in zip(self.available, allocation)]
+                self._tree.add_prefix(pos, [-a for a in allocation])
+                self._tree.set_leaf(pos, [t - mx for t, mx in zip(self.total, self.maximum[pid])])
+                self._slots.append(pid)
+                self._position[pid] = pos
+                return True
+
+        saved = self._save()
+        self.available = [v - a for v, a in zip(self.available, allocation)]
+        admitted = self._revalidate() if saved[1] else self._recompute()
+        if not admitted:
+            self.available = [v + a for v, a in zip(self.available, allocation)]
+            self._forget(pid)
+            self._restore(saved)
+        return admitted
+
+    def remove_process(self, pid):
+        # The process finishes or is aborted: everything it holds goes back to the pool
+        allocation = self.allocation[pid]
+        self.available = [v + a for v, a in zip(self.available, allocation)]
+        self._forget(pid)
+        if not self.safe:
+            self._recompute()
+            return
+
+        pos = self._position.pop(pid)
+        self._slots[pos] = None
+        self._tree.add_prefix(pos, allocation)
+        self._tree.set_leaf(pos, [INF] * self.num_resources)
+        if len(self._position) * 2 < len(self._slots):
+            self._set_sequence(self.sequence, True)
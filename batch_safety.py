@@ -0,0 +1,84 @@
+import numpy as np
+
+import metrics
+
+
+class BatchSafetyResult:
+    def __init__(self, safe, sequences, lengths):
+        self.safe = safe                # (S,) bool verdict per scenario
+        self.sequences = sequences      # (S, n) process indices in finishing order, padded with -1
+        self.lengths = lengths          # (S,) number of processes that could finish
+
+    def sequence(self, s):
+        return self.sequences[s, :self.lengths[s]].tolist()
+
+    def __len__(self):
+        return len(self.safe)
+
+
+def _safety_rounds(allocation, need, work):
+    # Every process that fits into `work` is released in the same round; any
+    # order of simultaneously ready processes is a valid safe ordering, so this
+    # needs as many rounds as the longest dependency chain rather than n.
+    S, n, _ = allocation.shape
+    finished = np.zeros((S, n), dtype=bool)
+    sequences = np.full((S, n), -1, dtype=np.int64)
+    lengths = np.zeros(S, dtype=np.int64)
+    active = np.arange(S)
+    rounds = 0
+
+    while active.size:
+        rounds += 1
+        ready = ~finished[active] & (need[active] <= work[active][:, None, :]).all(axis=2)
+        progressed = ready.any(axis=1)
+        if not progressed.all():
+            active, ready = active[progressed], ready[progressed]
+            if not active.size:
+                break
+
+        rows, cols = np.nonzero(ready)
+        slots = np.cumsum(ready, axis=1)[rows, cols] - 1 + lengths[active][rows]
+        sequences[active[rows], slots] = cols
+        lengths[active] += ready.sum(axis=1)
+        finished[active] |= ready
+        work[active] += np.matmul(ready[:, None, :].astype(allocation.dtype), allocation[active])[:, 0, :]
+
+        active = active[lengths[active] < n]
+
+    metrics.count("safety_batch_rounds", rounds)
+    return lengths == n, sequences, lengths
+
+
+def check_safety_batch(allocation, maximum, available, chunk_size=None):
+    """Run the Banker's safety algorithm over a stack of scenarios at once.
+
+    `allocation` and `maximum` are (scenarios × processes × resources) arrays;
+    `available` is (scenarios × resources) or a single (resources,) vector
+    shared by every scenario. Scenarios are processed `chunk_size` at a time so
+    the temporaries stay bounded at O(chunk_size · n · m).
+    """
+    allocation = np.asarray(allocation)
+    maximum = np.asarray(maximum)
+    if allocation.ndim != 3 or allocation.shape != maximum.shape:
+        raise ValueError("Allocation and Maximum must both be (scenarios, processes, resources) arrays.")
+    S, n, m = allocation.shape
+    available = np.broadcast_to(np.asarray(available), (S, m))
+
+    dtype = np.result_type(allocation, maximum, available, np.int64)
+    safe = np.zeros(S, dtype=bool)
+    sequences = np.full((S, n), -1, dtype=np.int64)
+    lengths = np.zeros(S, dtype=np.int64)
+
+    step = S if not chunk_size else chunk_size
+    for start in range(0, S, max(step, 1)):
+        stop = min(start + step, S)
+        alloc = allocation[start:stop].astype(dtype, copy=False)
+        need = maximum[start:stop].astype(dtype, copy=False) - alloc
+        if (need < 0).any():
+            s, i = np.argwhere((need < 0).any(axis=2))[0]
+            raise ValueError(f"Scenario {start + s}: P{i} holds more than its maximum claim.")
+        work = available[start:stop].astype(dtype, copy=True)
+        with metrics.phase("safety_batch"):
+            safe[start:stop], sequences[start:stop], lengths[start:stop] = _safety_rounds(alloc, need, work)
+
+    return BatchSafetyResult(safe, sequences, lengths)
@@ -0,0 +1,92 @@
+# Time from clicking a tool in the hub to its window being visible:
+#   subprocess - the old hub: a fresh interpreter runs the tool script
+#   hub cold   - first open inside the single-process hub (module imported lazily)
+#   hub warm   - reopening the tool after its window was closed
+# Needs a display. Run from the repository root: python -m benchmarks.bench_startup
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from main_menu import TOOLS
+
+
+def wait_visible(window):
+    while not window.winfo_viewable():
+        window.update()
+
+
+def child_subprocess(tool):
+    # What `python <tool>.py` does, minus mainloop
+    import importlib
+    import tkinter as tk
+    root = tk.Tk()
+    _, module, class_name, geometry, _ = TOOLS[tool]
+    root.geometry(geometry)
+    getattr(importlib.import_module(module), class_name)(root)
+    wait_visible(root)
+    print("visible", flush=True)
+    root.destroy()
+
+
+def child_hub(tool):
+    import tkinter as tk
+    from main_menu import Hub
+    root = tk.Tk()
+    hub = Hub(root, fullscreen=False)
+    wait_visible(root)
+
+    start = time.perf_counter()
+    window, _ = hub.open_tool(tool)
+    wait_visible(window)
+    cold = time.perf_counter() - start
+
+    hub.close_tool(tool)
+    root.update()
+    start = time.perf_counter()
+    window, _ = hub.open_tool(tool)
+    wait_visible(window)
+    warm = time.perf_counter() - start
+
+    print(json.dumps({"cold": cold, "warm": warm}), flush=True)
+    root.destroy()
+
+
+def run_child(*args):
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_startup", "--child", *args],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    elapsed = time.perf_counter() - start
+    proc.wait()
+    if proc.returncode:
+        sys.exit(f"child {' '.join(args)} failed (is a display available?)")
+    return elapsed, line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub-to-tool startup times.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "TOOL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        mode, tool = args.child
+        (child_subprocess if mode == "subprocess" else child_hub)(tool)
+        return
+
+    print(f"{'tool':>10} {'subprocess':>12} {'hub cold':>10} {'hub warm':>10}")
+    for tool in TOOLS:
+        relaunch, cold, warm = [], [], []
+        for _ in range(args.repeat):
+            relaunch.append(run_child("subprocess", tool)[0])
+            times = json.loads(run_child("hub", tool)[1])
+            cold.append(times["cold"])
+            warm.append(times["warm"])
+        print(f"{tool:>10} {statistics.median(relaunch) * 1e3:>10.0f}ms {statistics.median(cold) * 1e3:>8.0f}ms "
+              f"{statistics.median(warm) * 1e3:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Incremental wait-for maintenance vs. rebuilding the graph and rerunning
+# WaitForGraphVisualizer.detect_cycle after every change.
+# Run from the repository root: python -m benchmarks.bench_wait_for
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from dynamic_wait_for import DynamicWaitForGraph
+from waitforgraphs import WaitForGraphVisualizer
+
+
+def workload(num_processes, num_events, seed=0):
+    rng = random.Random(seed)
+    live = []
+    live_set = set()
+    for _ in range(num_events):
+        if live and rng.random() < 0.4:
+            k = rng.randrange(len(live))
+            live[k], live[-1] = live[-1], live[k]
+            edge = live.pop()
+            live_set.discard(edge)
+            yield "remove", edge
+        else:
+            p, q = rng.sample(range(num_processes), 2)
+            # Mostly forward waits, with the odd back edge closing a cycle
+            if p > q and rng.random() < 0.95:
+                p, q = q, p
+            edge = (f"P{p}", f"P{q}")
+            if edge in live_set:
+                continue
+            live.append(edge)
+            live_set.add(edge)
+            yield "add", edge
+
+
+def run_incremental(events):
+    graph = DynamicWaitForGraph()
+    deadlocks = 0
+    for op, (p, q) in events:
+        if op == "add":
+            deadlocks += graph.add_wait(p, q) is not None
+        else:
+            graph.remove_wait(p, q)
+    return deadlocks
+
+
+def run_full_rebuild(events, num_processes):
+    processes = [f"P{i}" for i in range(num_processes)]
+    edges = []
+    deadlocks = 0
+    for op, edge in events:
+        if op == "add":
+            edges.append(edge)
+        else:
+            edges.remove(edge)
+        view = SimpleNamespace(processes=processes, edges=list(edges), cycle_nodes=set(), cycle_path=[])
+        deadlocks += op == "add" and WaitForGraphVisualizer.detect_cycle(view)
+    return deadlocks
+
+
+def main():
+    sys.setrecursionlimit(10000)
+    print(f"{'processes':>10} {'events':>8} {'incremental':>14} {'full rebuild':>14} {'speedup':>8}")
+    for num_processes, num_events in [(50, 1000), (200, 2000), (1000, 4000)]:
+        events = list(workload(num_processes, num_events))
+
+        start = time.perf_counter()
+        run_incremental(events)
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_full_rebuild(events, num_processes)
+        full = time.perf_counter() - start
+
+        print(f"{num_processes:>10} {len(events):>8} {incremental * 1e3:>12.1f}ms {full * 1e3:>12.1f}ms "
+              f"{full / incremental:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Scaling benchmarks for the safety check, cycle detection and wait-for
+# graph construction on seeded synthetic workloads.
+# Run from the repository root:
+#   python -m benchmarks.suite --output results.json
+#   python -m benchmarks.suite --baseline results.json     # exit 1 on regressions
+#
+# benchmarks/baseline.json is the reference run (its header records the
+# Python, NumPy and machine), produced with
+#   python -m benchmarks.suite --max-size 100000 -o benchmarks/baseline.json
+# and checked with the same sizes:
+#   python -m benchmarks.suite --max-size 100000 --baseline benchmarks/baseline.json
+# Absolute times only compare on a similar, idle machine; elsewhere add
+# --tolerance 1000 so that only the growth exponents are checked, or record
+# a baseline of your own on the commit you branched from. Regenerate the
+# reference whenever a change is meant to move the numbers.
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from batch_safety import check_safety_batch
+from benchmarks import workloads
+from cycle_detection import deadlocked_components
+from graph_reduction import detect_deadlock
+from matrix_state import BitMatrix, RagBits
+from safety_engine import check_safety
+from waitforgraphs import WaitForGraphVisualizer
+
+SIZES = (10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6)
+
+
+class Case:
+    """One benchmark: `setup(n)` builds the workload, `run(workload)` is timed."""
+
+    def __init__(self, name, setup, run, max_size=10 ** 6):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+
+
+def _wait_for_detect_cycle(graph):
+    # WaitForGraphVisualizer.detect_cycle on a bare object with its attributes
+    edges = [(p, q) for p, qs in graph.items() for q in qs]
+    view = SimpleNamespace(processes=list(graph), edges=edges, cycle_nodes=set(), cycle_path=[])
+    return lambda: WaitForGraphVisualizer.detect_cycle(view)
+
+
+def _setup_graph(texts):
+    # WaitForGraphVisualizer.setup_graph up to the edge list, with the widgets stubbed out
+    held, requested = texts
+    entry = lambda text: SimpleNamespace(get=lambda: text)
+    view = SimpleNamespace(
+        output_box=SimpleNamespace(delete=lambda *a: None, insert=lambda *a: None),
+        proc_entry=entry(""), res_entry=entry(""), held_entry=entry(held), req_entry=entry(requested),
+        cycle_nodes=set(), cycle_path=[],
+        detect_cycle=lambda: False, draw_graph=lambda: None)
+    view.parse_pairs = lambda text: WaitForGraphVisualizer.parse_pairs(view, text)
+    return lambda: WaitForGraphVisualizer.setup_graph(view)
+
+
+def _rag_bits(n):
+    allocation, request, _ = workloads.multi_instance_rag(n)
+    return RagBits(request, allocation.T)
+
+
+def _chain_rag_bits(n):
+    # P0 -> R0 -> P1 -> ... -> P(n-1) as n x n bitsets: the longest peel there is
+    request, assignment = BitMatrix(n, n), BitMatrix(n, n)
+    i = np.arange(n)
+    request.bits[i, i >> 3] = 0x80 >> (i & 7)
+    assignment.bits[i[:-1], i[1:] >> 3] = 0x80 >> (i[1:] & 7)
+    return RagBits(request, assignment)
+
+
+def cases():
+    found = []
+    for kind in ("random", "adversarial"):
+        generate = getattr(workloads, f"{kind}_allocation")
+        found.append(Case(f"banker/{kind}", generate, lambda w: lambda: check_safety(*w)))
+    found.append(Case("banker_batch/random",
+                      lambda n: [np.stack(a) for a in zip(*(workloads.random_allocation(n, seed=s) for s in range(16)))],
+                      lambda w: lambda: check_safety_batch(*w), max_size=10 ** 5))
+
+    for shape, generate in workloads.WAIT_FOR_GRAPHS.items():
+        found.append(Case(f"scc/{shape}", generate, lambda g: lambda: deadlocked_components(g)))
+        # Recursive DFS: deeper graphs overflow the interpreter stack
+        found.append(Case(f"wait_for_detect_cycle/{shape}", generate, _wait_for_detect_cycle, max_size=10 ** 4))
+
+    found.append(Case("rag/reduction", workloads.multi_instance_rag, lambda w: lambda: detect_deadlock(*w)))
+    found.append(Case("rag/graph_scc", lambda n: workloads.rag_graph(*workloads.multi_instance_rag(n)[:2]),
+                      lambda g: lambda: deadlocked_components(g)))
+    # The RAG visualizer's single-instance path: the same graph as packed bitsets, trimmed before the SCC search
+    found.append(Case("rag/bitset_scc", _rag_bits, lambda bits: lambda: bits.deadlocked_components()))
+    found.append(Case("rag/bitset_chain", _chain_rag_bits, lambda bits: lambda: bits.deadlocked_components(),
+                      max_size=10 ** 4))
+    found.append(Case("wait_for/setup_graph", workloads.held_requested_text, _setup_graph))
+    return found
+
+
+def measure(func, min_time=0.2, max_repeats=20):
+    # Repeat until min_time has been spent; the fastest run is the least noisy
+    times = []
+    while len(times) < max_repeats and (not times or sum(times) < min_time):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times), len(times)
+
+
+def exponents(results):
+    # Empirical growth exponent between consecutive sizes: t ~ n^k
+    by_case = {}
+    for r in results:
+        by_case.setdefault(r["case"], []).append(r)
+    for rows in by_case.values():
+        rows.sort(key=lambda r: r["size"])
+        for a, b in zip(rows, rows[1:]):
+            if a["min"] > 1e-4:
+                b["exponent"] = math.log(b["min"] / a["min"]) / math.log(b["size"] / a["size"])
+    return results
+
+
+def run_suite(sizes, pattern=None, min_time=0.2, out=sys.stderr):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    results = []
+    for case in cases():
+        if pattern and pattern not in case.name:
+            continue
+        for n in sizes:
+            if n > case.max_size:
+                continue
+            func = case.run(case.setup(n))
+            best, median, repeats = measure(func, min_time)
+            results.append({"case": case.name, "size": n, "min": best, "median": median, "repeats": repeats})
+            print(f"{case.name:<32} {n:>9} {best * 1e3:>12.3f}ms  x{repeats}", file=out)
+    return exponents(results)
+
+
+def compare(results, baseline, tolerance=0.5, exponent_tolerance=0.3, floor=1e-3):
+    """Regressions against a baseline run, as printable lines.
+
+    A time regresses when it is more than `tolerance` slower (ignoring runs
+    under `floor` seconds, which are mostly noise). The growth exponent is
+    compared too: it does not depend on the machine, so a jump there means
+    an algorithmic regression even when absolute times are not comparable.
+    """
+    old = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = old.get((r["case"], r["size"]))
+        if b is None:
+            continue
+        label = f"{r['case']} n={r['size']}"
+        if max(r["min"], b["min"]) >= floor and r["min"] > b["min"] * (1 + tolerance):
+            regressions.append(f"{label}: {b['min'] * 1e3:.3f}ms -> {r['min'] * 1e3:.3f}ms")
+        if "exponent" in r and "exponent" in b and r["exponent"] > b["exponent"] + exponent_tolerance:
+            regressions.append(f"{label}: growth n^{b['exponent']:.2f} -> n^{r['exponent']:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deadlock toolkit benchmark suite.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated problem sizes")
+    parser.add_argument("--max-size", type=int, help="skip sizes above this")
+    parser.add_argument("-k", "--filter", help="only cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend per measurement")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown as a fraction")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if not args.max_size or int(s) <= args.max_size]
+    results = run_suite(sizes, args.filter, args.min_time)
+    report = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+              "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
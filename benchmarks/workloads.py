@@ -0,0 +1,98 @@
+# Seeded synthetic workloads for the benchmark suite. The same (size, seed)
+# always gives the same workload, so timings are comparable across runs.
+import numpy as np
+
+
+def _safe_state(allocation, order, rng):
+    # Needs chosen so that `order` is a safe sequence: process order[k] needs
+    # exactly what is free once order[:k] have finished
+    n, m = allocation.shape
+    freed = np.zeros((n, m), dtype=np.int64)
+    freed[1:] = np.cumsum(allocation[order[:-1]], axis=0)
+    available = rng.integers(0, 3, m)
+    need = np.zeros_like(allocation)
+    need[order] = available + freed
+    return allocation, allocation + need, available
+
+
+def random_allocation(n, m=4, seed=0):
+    """A random safe state: (allocation, maximum, available) with a random safe order."""
+    rng = np.random.default_rng(seed)
+    allocation = rng.integers(0, 4, (n, m))
+    order = rng.permutation(n)
+    allocation, maximum, available = _safe_state(allocation, order, rng)
+    # Ask for less than the bound so many processes are ready at once
+    maximum = allocation + (rng.random((n, m)) * (maximum - allocation + 1)).astype(np.int64)
+    return allocation, maximum, available
+
+
+def adversarial_allocation(n, m=4, seed=0):
+    """A safe state where exactly one process becomes ready at a time, last index first.
+
+    Every need is tight against what the previous processes free, so a
+    scan-from-the-start safety check does a full pass per finished process.
+    """
+    rng = np.random.default_rng(seed)
+    allocation = rng.integers(1, 3, (n, m))
+    return _safe_state(allocation, np.arange(n)[::-1], rng)
+
+
+def chain_graph(n):
+    # P0 -> P1 -> ... -> Pn-1, no cycle but the deepest possible DFS
+    return {f"P{i}": [f"P{i + 1}"] if i + 1 < n else [] for i in range(n)}
+
+
+def ring_graph(n):
+    # The chain closed into one big cycle
+    return {f"P{i}": [f"P{(i + 1) % n}"] for i in range(n)}
+
+
+def dense_graph(n, degree=16, seed=0):
+    """Random wait-for graph with out-degree min(degree, n - 1)."""
+    rng = np.random.default_rng(seed)
+    degree = min(degree, n - 1)
+    targets = rng.integers(0, n - 1, (n, degree))
+    targets += targets >= np.arange(n)[:, None]      # no self-loops
+    return {f"P{i}": [f"P{j}" for j in row] for i, row in enumerate(targets.tolist())}
+
+
+WAIT_FOR_GRAPHS = {"chain": chain_graph, "ring": ring_graph, "dense": dense_graph}
+
+
+def multi_instance_rag(n, m=8, seed=0, deadlocked=0.1):
+    """(allocation, request, available) for n processes over m resource types.
+
+    Roughly a `deadlocked` fraction of the processes request more than
+    will ever be free; graph reduction finishes everyone else.
+    """
+    rng = np.random.default_rng(seed)
+    allocation = rng.integers(0, 3, (n, m))
+    request = rng.integers(0, 3, (n, m))
+    available = rng.integers(1, 4, m)
+    stuck = rng.random(n) < deadlocked
+    request[stuck, rng.integers(0, m, int(stuck.sum()))] = allocation.sum() + 1
+    return allocation, request, available
+
+
+def rag_graph(allocation, request):
+    # Single-instance RAG view of the matrices: P -> R requests, R -> P assignments
+    graph = {}
+    for i, (held, wanted) in enumerate(zip(allocation.tolist(), request.tolist())):
+        graph[f"P{i}"] = [f"R{j}" for j, q in enumerate(wanted) if q]
+        for j, a in enumerate(held):
+            if a:
+                graph.setdefault(f"R{j}", []).append(f"P{i}")
+    return graph
+
+
+def held_requested_text(n, seed=0, holders=2):
+    """(held, requested) in the wait-for visualizer's "P:R,P:R" input format.
+
+    Each process holds its own resource; each resource is shared by up to
+    `holders` processes, and every process requests a random resource.
+    """
+    rng = np.random.default_rng(seed)
+    resources = max(n // holders, 1)
+    held = ",".join(f"P{i}:R{i % resources}" for i in range(n))
+    requested = ",".join(f"P{i}:R{r}" for i, r in enumerate(rng.integers(0, resources, n).tolist()))
+    return held, requested
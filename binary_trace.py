@@ -0,0 +1,181 @@
+import argparse
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from trace_ingest import OPS, LiveState, TraceEvent, TraceIngestor, read_events
+
+MAGIC = b"DLTRACE1"
+HEADER = struct.Struct("<8sQQQ")    # magic, record count, trailer offset, trailer length
+RECORD = np.dtype([("ts", "<f8"), ("op", "u1"), ("pid", "<u4"), ("rid", "<u4"), ("count", "<i4")])
+NO_RESOURCE = 0xFFFFFFFF
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+
+class _Interner:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def __call__(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+def _snapshot(state, intern):
+    # Live state with interned ids, compact enough to keep one per checkpoint
+    held = [[intern(p), intern(r), c] for p, rs in state.held.items() for r, c in rs.items()]
+    started = [intern(p) for p, rs in state.held.items() if not rs]
+    waiting = [[intern(p), intern(r), c] for p, rs in state.waiting.items() for r, c in rs.items()]
+    return {"held": held, "started": started, "waiting": waiting}
+
+
+def convert(text_path, out_path, checkpoint_every=100000, batch_size=65536):
+    """Convert a JSONL/CSV trace into the fixed-width binary format.
+
+    Records are streamed out in batches; a LiveState snapshot is stored every
+    `checkpoint_every` records so readers can rebuild state at any timestamp
+    by replaying at most that many records.
+    """
+    intern = _Interner()
+    state = LiveState()
+    checkpoints = []
+    batch = np.zeros(batch_size, dtype=RECORD)
+    filled = 0
+    count = 0
+
+    with open(out_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, 0, 0, 0))
+        for event in read_events(text_path):
+            if count % checkpoint_every == 0:
+                checkpoints.append([count, event.ts, _snapshot(state, intern)])
+            batch[filled] = (event.ts, OP_CODES[event.op], intern(event.pid),
+                             NO_RESOURCE if event.rid is None else intern(event.rid), event.count)
+            filled += 1
+            count += 1
+            state.apply(event)
+            if filled == batch_size:
+                out.write(batch.tobytes())
+                filled = 0
+        out.write(batch[:filled].tobytes())
+
+        trailer = json.dumps({"strings": intern.strings, "checkpoints": checkpoints}).encode("utf-8")
+        trailer_offset = out.tell()
+        out.write(trailer)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, count, trailer_offset, len(trailer)))
+    return count
+
+
+class BinaryTrace:
+    """Zero-copy, memory-mapped view of a binary trace with random access by time."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, trailer_offset, trailer_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary deadlock trace")
+        self.records = np.frombuffer(self._mmap, dtype=RECORD, count=count, offset=HEADER.size)
+        trailer = json.loads(self._mmap[trailer_offset:trailer_offset + trailer_length].decode("utf-8"))
+        self.strings = trailer["strings"]
+        self.checkpoints = trailer["checkpoints"]
+        # Sparse time index: first record number and timestamp of each checkpoint block
+        self.index_records = np.array([c[0] for c in self.checkpoints], dtype=np.int64)
+        self.index_ts = np.array([c[1] for c in self.checkpoints], dtype=np.float64)
+
+    def close(self):
+        self.records = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    def position(self, ts):
+        # Number of records with timestamp <= ts, searching only inside one checkpoint block
+        block = max(int(np.searchsorted(self.index_ts, ts, side="right")) - 1, 0)
+        lo = int(self.index_records[block]) if len(self.index_records) else 0
+        hi = int(self.index_records[block + 1]) if block + 1 < len(self.index_records) else len(self.records)
+        return lo + int(np.searchsorted(self.records["ts"][lo:hi], ts, side="right"))
+
+    def events(self, start=0, stop=None, chunk=65536):
+        strings = self.strings
+        stop = len(self.records) if stop is None else stop
+        for lo in range(start, stop, chunk):
+            for ts, op, pid, rid, count in self.records[lo:min(lo + chunk, stop)].tolist():
+                yield TraceEvent(ts, OPS[op], strings[pid], None if rid == NO_RESOURCE else strings[rid], count)
+
+    def state_at(self, ts=None, position=None):
+        """LiveState after every record up to `ts` (or the first `position` records)."""
+        if position is None:
+            position = len(self.records) if ts is None else self.position(ts)
+        block = max(int(np.searchsorted(self.index_records, position, side="right")) - 1, 0)
+        state = LiveState()
+        start = 0
+        if self.checkpoints:
+            start, _, snapshot = self.checkpoints[block]
+            strings = self.strings
+            for p in snapshot["started"]:
+                state.held.setdefault(strings[p], {})
+            for p, r, c in snapshot["held"]:
+                state.held.setdefault(strings[p], {})[strings[r]] = c
+                state.holders.setdefault(strings[r], {})[strings[p]] = c
+            for p, r, c in snapshot["waiting"]:
+                state.waiting.setdefault(strings[p], {})[strings[r]] = c
+        for event in self.events(start, position):
+            state.apply(event)
+        return state
+
+    def replay(self, ingestor, start_ts=None, stop_ts=None):
+        """Run `ingestor` over the records between two timestamps.
+
+        The ingestor's state is rebuilt from the nearest checkpoint before
+        `start_ts`, so replay can begin anywhere without reading the prefix.
+        """
+        start = 0 if start_ts is None else self.position(start_ts)
+        stop = None if stop_ts is None else self.position(stop_ts)
+        ingestor.state = self.state_at(position=start)
+        return ingestor.run(self.events(start, stop))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert or replay binary deadlock traces.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="convert a JSONL/CSV trace")
+    conv.add_argument("trace")
+    conv.add_argument("output")
+    conv.add_argument("--checkpoint-every", type=int, default=100000)
+    rep = sub.add_parser("replay", help="replay a binary trace through the detectors")
+    rep.add_argument("trace")
+    rep.add_argument("--start", type=float, help="trace timestamp to start from")
+    rep.add_argument("--stop", type=float, help="trace timestamp to stop at")
+    rep.add_argument("--every", type=int, default=10000, help="checkpoint every N events")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert(args.trace, args.output, args.checkpoint_every)
+        print(f"Wrote {count} records to {args.output}")
+        return
+
+    with BinaryTrace(args.trace) as trace:
+        ingestor = TraceIngestor(args.every)
+        for report in trace.replay(ingestor, args.start, args.stop):
+            if report.has_deadlock:
+                print(json.dumps(report.to_dict()))
+        print(f"{ingestor.events} events, {ingestor.events_per_second:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import metrics
+
+
+def strongly_connected_components(graph):
+    """Iterative Tarjan SCC over `graph` (node -> iterable of successors).
+
+    Runs in O(V + E) with an explicit stack, so it is not bounded by Python's
+    recursion limit. Successors that are not keys of `graph` are treated as
+    nodes without outgoing edges.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph.get(root, ())))]
+
+        while work:
+            node, successors = work[-1]
+            for neighbor in successors:
+                if neighbor not in index:
+                    index[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(graph.get(neighbor, ()))))
+                    break
+                elif neighbor in on_stack and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.reverse()
+                    components.append(component)
+
+    recorder = metrics.active()
+    if recorder is not None:
+        recorder.count("nodes_visited", len(index))
+        recorder.count("edges_scanned", sum(len(graph.get(node, ())) for node in index))
+    return components
+
+
+def deadlocked_components(graph):
+    # An SCC is deadlocked when it contains a cycle: more than one node, or a self-loop
+    with metrics.phase("scc"):
+        deadlocked = [c for c in strongly_connected_components(graph)
+                      if len(c) > 1 or c[0] in graph.get(c[0], ())]
+    metrics.count("cycles_found", len(deadlocked))
+    return deadlocked
+
+
+def cycle_in_component(graph, component):
+    # Every node of a cyclic SCC has a successor inside it, so walking those
+    # edges from any member must revisit a node; that stretch is a cycle.
+    members = set(component)
+    seen = {}
+    path = []
+    node = component[0]
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = next(n for n in graph.get(node, ()) if n in members)
+    return path[seen[node]:]
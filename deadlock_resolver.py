@@ -1,19 +1,27 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 from datetime import datetime
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
+import metrics
+from cycle_detection import deadlocked_components
+from recovery import ProcessCost, plan_recovery
+from timeline import EventStore, RedrawCoalescer
+from wait_for_builder import build_wait_for_graph, held_and_requested
 
-class DeadlockResolverApp(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("🛡️ Deadlock Resolver")
-        self.geometry("1100x650")
-        self.configure(bg="#f2f2f2")
 
-        self.events = []
+class DeadlockResolverApp(tk.Frame):
+    def __init__(self, master, max_events=1000, max_fps=10):
+        super().__init__(master, bg="#f2f2f2")
+        self.master = master
+        self.master.title("🛡️ Deadlock Resolver")
+        self.pack(fill=tk.BOTH, expand=True)
+
+        self.max_fps = max_fps
+        self.events = EventStore(capacity=max_events)
         self.processes = {}  # Starts empty
+        self.deadlocked = set()
 
         self._build_ui()
 
@@ -41,7 +49,25 @@ class DeadlockResolverApp(tk.Tk):
         self.res_entry = tk.Entry(input_frame)
         self.res_entry.grid(row=1, column=1)
 
-        tk.Button(input_frame, text="➕ Add Process", command=self._add_process, bg="#5cb85c", fg="black").grid(row=2, column=0, columnspan=2, pady=5)
+        tk.Label(input_frame, text="Requests (comma-separated):", bg="#ffffff").grid(row=2, column=0, sticky="e")
+        self.req_entry = tk.Entry(input_frame)
+        self.req_entry.grid(row=2, column=1)
+
+        tk.Label(input_frame, text="Priority:", bg="#ffffff").grid(row=3, column=0, sticky="e")
+        self.priority_entry = tk.Entry(input_frame)
+        self.priority_entry.insert(0, "1")
+        self.priority_entry.grid(row=3, column=1)
+
+        tk.Label(input_frame, text="Progress (%):", bg="#ffffff").grid(row=4, column=0, sticky="e")
+        self.progress_entry = tk.Entry(input_frame)
+        self.progress_entry.insert(0, "0")
+        self.progress_entry.grid(row=4, column=1)
+
+        tk.Button(input_frame, text="➕ Add Process", command=self._add_process, bg="#5cb85c", fg="black").grid(row=5, column=0, columnspan=2, pady=5)
+        tk.Button(input_frame, text="🤖 Auto Resolve", command=self.auto_resolve, bg="#5bc0de", fg="black").grid(row=6, column=0, columnspan=2, pady=5)
+
+        self.deadlock_label = tk.Label(input_frame, text="✅ No deadlock", font=("Arial", 12, "bold"), bg="#ffffff", fg="green")
+        self.deadlock_label.grid(row=7, column=0, columnspan=2, pady=5)
 
         self._render_processes()
 
@@ -55,6 +81,7 @@ class DeadlockResolverApp(tk.Tk):
         self.event_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
         self._setup_chart()
+        self.redraw = RedrawCoalescer(self, self._update_chart, max_fps=self.max_fps)
 
     def _render_processes(self):
         # Clear old process widgets (except the static label/input)
@@ -62,14 +89,17 @@ class DeadlockResolverApp(tk.Tk):
             widget.destroy()
 
         for pid, proc in self.processes.items():
-            frame = tk.Frame(self.left_frame, bg="#f0f0f0", bd=1, relief=tk.RIDGE, padx=10, pady=5)
+            bg = "#f8d7da" if pid in self.deadlocked else "#f0f0f0"
+            frame = tk.Frame(self.left_frame, bg=bg, bd=1, relief=tk.RIDGE, padx=10, pady=5)
             frame.pack(fill=tk.X, pady=6, padx=10)
 
-            info = f"{pid} | Resources: {', '.join(proc['resources'])} | Status: {proc['status']}"
-            tk.Label(frame, text=info, font=("Arial", 12), bg="#f0f0f0", fg="black").pack(anchor="w", pady=2)
+            info = (f"{pid} | Resources: {', '.join(proc['resources']) or '-'} | "
+                    f"Waiting for: {', '.join(proc['requests']) or '-'} | "
+                    f"Priority: {proc['priority']} | Progress: {proc['progress']:.0%} | Status: {proc['status']}")
+            tk.Label(frame, text=info, font=("Arial", 12), bg=bg, fg="black").pack(anchor="w", pady=2)
 
             if proc["status"] == "running":
-                btn_frame = tk.Frame(frame, bg="#f0f0f0")
+                btn_frame = tk.Frame(frame, bg=bg)
                 btn_frame.pack(anchor="w", pady=2)
 
                 tk.Button(btn_frame, text="❌ Kill", command=lambda p=pid: self.kill_process(p),
@@ -77,59 +107,147 @@ class DeadlockResolverApp(tk.Tk):
                           relief=tk.FLAT, padx=10).pack(side=tk.LEFT, padx=5)
 
                 for rid in proc["resources"]:
-                    tk.Button(btn_frame, text=f"⚡ Preempt {rid}", command=lambda r=rid: self.preempt_resource(r),
+                    tk.Button(btn_frame, text=f"⚡ Preempt {rid}", command=lambda p=pid, r=rid: self.preempt_resource(p, r),
                               bg="#f0ad4e", fg="black", font=("Arial", 10),
                               relief=tk.FLAT, padx=10).pack(side=tk.LEFT, padx=5)
 
     def _add_process(self):
         pid = self.pid_entry.get().strip()
         resources = [r.strip() for r in self.res_entry.get().split(",") if r.strip()]
-
-        if pid and resources:
-            self.processes[pid] = {"resources": resources, "status": "running"}
-            self._log_event(f"🟢 {pid} added with resources {', '.join(resources)}")
-            self._render_processes()
+        requests = [r.strip() for r in self.req_entry.get().split(",") if r.strip()]
+        try:
+            priority = int(self.priority_entry.get() or 1)
+            progress = float(self.progress_entry.get() or 0) / 100
+        except ValueError:
+            messagebox.showerror("Input Error", "Priority and progress must be numbers.")
+            return
+
+        if pid and (resources or requests):
+            self.processes[pid] = {"resources": resources, "requests": requests, "priority": priority,
+                                   "progress": progress, "status": "running"}
+            self._log_event(f"🟢 {pid} added with resources {', '.join(resources) or 'none'}"
+                            + (f", waiting for {', '.join(requests)}" if requests else ""))
             self.pid_entry.delete(0, tk.END)
             self.res_entry.delete(0, tk.END)
+            self.req_entry.delete(0, tk.END)
+            self._detect()
+
+    def load_scenario(self, scenario):
+        # Replaces the process table with a scenario shared by the hub
+        held, requested = held_and_requested(scenario)
+        priority, progress = scenario.get("priority", {}), scenario.get("progress", {})
+        self.processes = {pid: {"resources": list(held.get(pid, [])), "requests": list(requested.get(pid, [])),
+                                "priority": priority.get(pid, 1), "progress": progress.get(pid, 0.0),
+                                "status": "running"}
+                          for pid in dict.fromkeys(list(held) + list(requested))}
+        self._log_event(f"📂 Loaded scenario with {len(self.processes)} processes")
+        self._detect()
 
     def kill_process(self, pid):
-        self.processes[pid]["status"] = "killed"
-        self._log_event(f"🔴 {pid} killed")
+        self._kill(pid)
+        self._grant_free_resources()
+        self._detect()
+
+    def preempt_resource(self, pid, rid):
+        self._preempt(pid, [rid])
+        self._grant_free_resources(last={pid})
+        self._detect()
+
+    def _kill(self, pid):
+        proc = self.processes[pid]
+        released = proc["resources"]
+        proc.update(status="killed", resources=[], requests=[])
+        self._log_event(f"🔴 {pid} killed" + (f", released {', '.join(released)}" if released else ""))
+
+    def _preempt(self, pid, resources):
+        # The victim is rolled back: it loses the resources and has to request them again
+        proc = self.processes[pid]
+        proc["resources"] = [r for r in proc["resources"] if r not in resources]
+        proc["requests"] = proc["requests"] + [r for r in resources if r not in proc["requests"]]
+        for rid in resources:
+            self._log_event(f"⚡ Resource {rid} preempted from {pid}")
+
+    def _grant_free_resources(self, last=()):
+        # Freed resources go to waiting processes, rolled-back victims get their turn last
+        held = {rid for proc in self.processes.values() for rid in proc["resources"]}
+        order = sorted(self.processes, key=lambda p: p in last)
+        for pid in order:
+            proc = self.processes[pid]
+            if proc["status"] != "running":
+                continue
+            for rid in list(proc["requests"]):
+                if rid not in held:
+                    held.add(rid)
+                    proc["requests"].remove(rid)
+                    proc["resources"].append(rid)
+                    self._log_event(f"🔓 {pid} acquired {rid}")
+
+    def _wait_for_graph(self):
+        running = {pid: proc for pid, proc in self.processes.items() if proc["status"] == "running"}
+        return build_wait_for_graph({pid: proc["resources"] for pid, proc in running.items()},
+                                    {pid: proc["requests"] for pid, proc in running.items()})
+
+    def _detect(self):
+        components = deadlocked_components(self._wait_for_graph())
+        self.deadlocked = {pid for component in components for pid in component}
+        if components:
+            sets = "; ".join(", ".join(component) for component in components)
+            self.deadlock_label.config(text=f"❌ Deadlock: {sets}", fg="red")
+            self._log_event(f"🔁 Deadlock detected: {sets}")
+        else:
+            self.deadlock_label.config(text="✅ No deadlock", fg="green")
         self._render_processes()
-
-    def preempt_resource(self, rid):
-        self._log_event(f"⚡ Resource {rid} preempted")
+        return components
+
+    def auto_resolve(self):
+        costs = {pid: ProcessCost(proc["priority"], proc["progress"], len(proc["resources"]))
+                 for pid, proc in self.processes.items()}
+        plan = plan_recovery(self._wait_for_graph(), costs)
+        if not plan.actions:
+            self._log_event("✅ Nothing to resolve")
+            return
+        self._log_event(f"🤖 Recovery plan (cost {plan.total_cost:.1f}): "
+                        + ", ".join(f"{action} {pid}" for pid, action, _ in plan.actions))
+        preempted = set()
+        for pid, action, _ in plan.actions:
+            if action == "kill":
+                self._kill(pid)
+            else:
+                self._preempt(pid, list(self.processes[pid]["resources"]))
+                preempted.add(pid)
+        self._grant_free_resources(last=preempted)
+        self._detect()
 
     def _log_event(self, message):
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.events.append((timestamp, message))
+        if self.events.append(message) is not None:
+            self.event_listbox.delete(0)
         self.event_listbox.insert(tk.END, f"⏰ {timestamp} — {message}")
-        self._update_chart()
+        self.redraw.request()
 
     def _setup_chart(self):
         self.figure = Figure(figsize=(5.5, 3), dpi=100)
         self.ax = self.figure.add_subplot(111)
         self.ax.set_title("📈 Event Timeline")
-        self.ax.set_xlabel("Time")
-        self.ax.set_ylabel("Event Count")
+        self.ax.set_xlabel("Time (s)")
+        self.ax.set_ylabel("Events / s")
         self.ax.grid(True, linestyle="--", color="gray", alpha=0.6)
+        self.line, = self.ax.plot([], [], marker='o', linestyle='-', color='purple')
 
         self.canvas = FigureCanvasTkAgg(self.figure, self.right_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=False, padx=10, pady=10)
 
     def _update_chart(self):
-        self.ax.clear()
-        times = [t for t, _ in self.events]
-        y_vals = list(range(1, len(times) + 1))
-        self.ax.plot(times, y_vals, marker='o', linestyle='-', color='purple')
-        self.ax.set_title("📈 Event Timeline")
-        self.ax.set_xlabel("Time")
-        self.ax.set_ylabel("Event Count")
-        self.ax.grid(True, linestyle="--", color="gray", alpha=0.6)
-        self.figure.autofmt_xdate()
-        self.canvas.draw()
+        # Update the existing line in place; the coalescer keeps this to a few frames per second
+        self.line.set_data(*self.events.rate_series())
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
 
 
 if __name__ == "__main__":
-    app = DeadlockResolverApp()
-    app.mainloop()
+    metrics.enable_from_env()
+    root = tk.Tk()
+    root.geometry("1100x650")
+    app = DeadlockResolverApp(root)
+    root.mainloop()
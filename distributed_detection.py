@@ -0,0 +1,355 @@
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import queue
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from cycle_detection import deadlocked_components
+
+SHARDS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def owner(pid, shards):
+    # Processes are named P<n> and sharded by number, like the lock managers
+    return int(pid[1:]) % shards
+
+
+def make_scenario(processes=2000, deadlocks=20, cycle_length=(2, 6), background=4000, transient=400, seed=0):
+    """A seeded timeline of ("wait" | "release", p, q) events on processes P0..Pn-1.
+
+    Background waits follow one random order, so on their own they never
+    form a cycle. `deadlocks` cycles are added among fresh processes, and
+    `transient` waits go against the order (often closing a cycle through
+    the background) and are released again a few events later, as a lock
+    wait timeout would. Only the first kind of cycle is a real deadlock;
+    reports about the second are false positives.
+    """
+    rng = random.Random(seed)
+    names = [f"P{i}" for i in range(processes)]
+    rank = {p: k for k, p in enumerate(rng.sample(names, processes))}
+    events = []
+    for _ in range(background):
+        p, q = rng.sample(names, 2)
+        events.append(("wait",) + ((p, q) if rank[p] < rank[q] else (q, p)))
+    rng.shuffle(events)
+
+    late = []
+    pool = rng.sample(names, min(processes, deadlocks * cycle_length[1]))
+    for _ in range(deadlocks):
+        size = rng.randint(*cycle_length)
+        if len(pool) < size:
+            break
+        cycle, pool = pool[:size], pool[size:]
+        late.extend(("wait", cycle[i], cycle[(i + 1) % size]) for i in range(size))
+    for _ in range(transient):
+        p, q = rng.sample(names, 2)
+        late.append(("transient",) + ((p, q) if rank[p] > rank[q] else (q, p)))
+    rng.shuffle(late)
+
+    pending = []
+    for op, p, q in late:
+        events.append(("wait", p, q))
+        if op == "transient":
+            heapq.heappush(pending, (len(events) + rng.randint(1, 20), p, q))
+        while pending and pending[0][0] <= len(events):
+            _, a, b = heapq.heappop(pending)
+            events.append(("release", a, b))
+    events.extend(("release", a, b) for _, a, b in sorted(pending))
+    return _dedupe(events)
+
+
+def _dedupe(events):
+    # A process waits for another at most once at a time
+    current = set()
+    kept = []
+    for op, p, q in events:
+        if op == "wait" and (p, q) not in current:
+            current.add((p, q))
+            kept.append((op, p, q))
+        elif op == "release" and (p, q) in current:
+            current.discard((p, q))
+            kept.append((op, p, q))
+    return kept
+
+
+def final_graph(events):
+    graph = {}
+    for op, p, q in events:
+        if op == "wait":
+            graph.setdefault(p, set()).add(q)
+        else:
+            graph[p].discard(q)
+    return {p: sorted(qs) for p, qs in graph.items()}
+
+
+def _cmh_site(index, shards, inbox, inboxes, results):
+    # Chandy–Misra–Haas for the AND model. A process that starts waiting
+    # initiates a computation (initiator, sequence); a blocked process
+    # forwards each computation's probe along its own waits once, and a probe
+    # that returns to its initiator proves a deadlock.
+    waits = {}          # local process -> processes it waits for
+    dependent = {}      # local process -> computations already forwarded through it
+    sequence = {}
+    sent = received = local = 0
+
+    def forward(tag, target, stack):
+        nonlocal sent, local
+        site = owner(target, shards)
+        if site == index:
+            local += 1
+            stack.append((tag, target))
+        else:
+            sent += 1
+            inboxes[site].put(("probe", tag, target))
+
+    def chase(stack):
+        while stack:
+            tag, k = stack.pop()
+            if k not in waits:
+                continue        # k is running; the chain it was on is not a deadlock
+            if k == tag[0]:
+                results.put(("deadlock", k, time.monotonic()))
+                continue
+            seen = dependent.setdefault(k, set())
+            if tag not in seen:
+                seen.add(tag)
+                for m in waits[k]:
+                    forward(tag, m, stack)
+
+    while True:
+        message = inbox.get()
+        kind = message[0]
+        if kind == "wait":
+            _, p, q = message
+            waits.setdefault(p, set()).add(q)
+            sequence[p] = sequence.get(p, 0) + 1
+            stack = []
+            forward((p, sequence[p]), q, stack)
+            chase(stack)
+        elif kind == "release":
+            _, p, q = message
+            waits[p].discard(q)
+            if not waits[p]:
+                del waits[p]
+                dependent.pop(p, None)
+        elif kind == "probe":
+            received += 1
+            chase([(message[1], message[2])])
+        elif kind == "flush":
+            results.put(("count", message[1], sent, received))
+        else:
+            results.put(("stats", sent, local))
+            return
+
+
+def _forwarding_site(index, shards, inbox, coordinator, results):
+    # Centralized mode: every wait and release is shipped to the coordinator
+    sent = 0
+    while True:
+        message = inbox.get()
+        kind = message[0]
+        if kind in ("wait", "release"):
+            sent += 1
+            coordinator.put(message)
+        elif kind == "flush":
+            results.put(("count", message[1], sent, 0))
+        else:
+            results.put(("stats", sent, 0))
+            return
+
+
+def _coordinator(inbox, results):
+    # Keeps the whole graph and runs WaitForGraphVisualizer.detect_cycle after
+    # every batch, setting aside each reported cycle to look for the next one
+    from waitforgraphs import WaitForGraphVisualizer
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    graph = {}
+    reported = set()
+    received = 0
+    batch = [inbox.get()]
+    while True:
+        try:
+            while True:
+                batch.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+        changed = False
+        for message in batch:
+            kind = message[0]
+            if kind == "wait":
+                received += 1
+                graph.setdefault(message[1], set()).add(message[2])
+                changed = True
+            elif kind == "release":
+                received += 1
+                graph[message[1]].discard(message[2])
+            elif kind == "flush":
+                results.put(("count", message[1], 0, received))
+            else:
+                results.put(("stats", 0, 0))
+                return
+        # Only a new wait can close a cycle
+        while changed:
+            view = SimpleNamespace(
+                processes=[p for p in graph if p not in reported],
+                edges=[(p, q) for p, qs in graph.items() if p not in reported for q in qs if q not in reported],
+                cycle_nodes=set(), cycle_path=[])
+            changed = WaitForGraphVisualizer.detect_cycle(view)
+            if changed:
+                reported.update(view.cycle_path)
+                results.put(("deadlock", view.cycle_path[0], time.monotonic()))
+        batch = [inbox.get()]
+
+
+class DetectionRun:
+    def __init__(self, mode, shards, events, messages, local_hops, reports, detected, missed, false_positives,
+                 latencies, wall):
+        self.mode = mode
+        self.shards = shards
+        self.events = events
+        self.messages = messages            # between processes (sites and coordinator)
+        self.local_hops = local_hops        # probe hops that stayed inside a site
+        self.reports = reports              # distinct processes reported as deadlocked
+        self.detected = detected            # true deadlocks found
+        self.missed = missed
+        self.false_positives = false_positives
+        self.latencies = latencies          # seconds from a deadlock's last wait to its first report
+        self.wall = wall
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+        return {"mode": self.mode, "shards": self.shards, "events": self.events, "messages": self.messages,
+                "local_hops": self.local_hops, "reports": self.reports, "detected": self.detected,
+                "missed": self.missed, "false_positives": self.false_positives,
+                "false_positive_rate": self.false_positives / self.reports if self.reports else 0.0,
+                "latency_mean": sum(ordered) / len(ordered) if ordered else 0.0,
+                "latency_p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0,
+                "wall_seconds": self.wall}
+
+
+def run(events, shards, mode="cmh", poll=0.01):
+    """Play `events` against `shards` site processes and score the reports.
+
+    mode="cmh" chases probes between the sites; mode="central" ships every
+    wait and release to one coordinator process running detect_cycle.
+    Deadlocks are permanent, so a report is scored against the graph left
+    once every event has been played: a reported process outside every
+    deadlock of that graph is a false positive.
+    """
+    context = mp.get_context()
+    results = context.Queue()
+    inboxes = [context.Queue() for _ in range(shards)]
+    workers = []
+    if mode == "cmh":
+        for i in range(shards):
+            workers.append(context.Process(target=_cmh_site, args=(i, shards, inboxes[i], inboxes, results)))
+    elif mode == "central":
+        coordinator = context.Queue()
+        workers.append(context.Process(target=_coordinator, args=(coordinator, results)))
+        for i in range(shards):
+            workers.append(context.Process(target=_forwarding_site,
+                                           args=(i, shards, inboxes[i], coordinator, results)))
+    else:
+        raise ValueError(f"Unknown mode '{mode}'")
+    targets = inboxes if mode == "cmh" else inboxes + [coordinator]
+    for worker in workers:
+        worker.start()
+
+    start = time.monotonic()
+    sent_at = {}
+    for op, p, q in events:
+        if op == "wait":
+            sent_at[(p, q)] = time.monotonic()
+        inboxes[owner(p, shards)].put((op, p, q))
+
+    reports = {}
+
+    def collect(kind, timeout):
+        while True:
+            message = results.get(timeout=timeout)
+            if message[0] == "deadlock":
+                reports.setdefault(message[1], message[2])
+            elif message[0] == kind:
+                return message
+
+    # Quiescence: two flush rounds in a row with every sent message received
+    previous = None
+    for flush in range(1, 10 ** 6):
+        for target in targets:
+            target.put(("flush", flush))
+        counts = [collect("count", 60) for _ in targets]
+        totals = (sum(c[2] for c in counts), sum(c[3] for c in counts))
+        if totals[0] == totals[1] and totals == previous:
+            break
+        previous = totals
+        time.sleep(poll)
+    wall = time.monotonic() - start
+    for target in targets:
+        target.put(("stop",))
+    stats = [collect("stats", 60) for _ in targets]
+    for worker in workers:
+        worker.join()
+    try:
+        while True:
+            message = results.get_nowait()
+            if message[0] == "deadlock":
+                reports.setdefault(message[1], message[2])
+    except queue.Empty:
+        pass
+
+    components = deadlocked_components(final_graph(events))
+    member = {p: k for k, component in enumerate(components) for p in component}
+    first = {}
+    for p, when in reports.items():
+        if p in member:
+            k = member[p]
+            first[k] = min(first.get(k, when), when)
+    latencies = []
+    for k, when in first.items():
+        nodes = set(components[k])
+        closed = max(sent_at[(p, q)] for p in nodes for q in nodes if (p, q) in sent_at)
+        latencies.append(max(when - closed, 0.0))
+    return DetectionRun(mode, shards, len(events), sum(s[1] for s in stats), sum(s[2] for s in stats),
+                        len(reports), len(first), len(components) - len(first),
+                        sum(1 for p in reports if p not in member), latencies, wall)
+
+
+def sweep(events, shard_counts=SHARDS, modes=("cmh", "central")):
+    return [run(events, shards, mode) for shards in shard_counts for mode in modes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare edge-chasing and centralized deadlock detection.")
+    parser.add_argument("--processes", type=int, default=2000)
+    parser.add_argument("--deadlocks", type=int, default=20)
+    parser.add_argument("--background", type=int, default=4000, help="waits that never close a cycle")
+    parser.add_argument("--transient", type=int, default=400, help="waits withdrawn shortly after")
+    parser.add_argument("--shards", default=",".join(map(str, SHARDS)), help="comma-separated site counts")
+    parser.add_argument("--modes", default="cmh,central")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per run")
+    args = parser.parse_args()
+
+    events = make_scenario(args.processes, args.deadlocks, background=args.background, transient=args.transient,
+                           seed=args.seed)
+    results = sweep(events, [int(s) for s in args.shards.split(",")], args.modes.split(","))
+    if args.json:
+        for result in results:
+            print(json.dumps(result.to_dict()))
+        return
+    print(f"{'mode':<8} {'shards':>6} {'messages':>9} {'local':>7} {'found':>6} {'missed':>6} "
+          f"{'false+':>7} {'fp rate':>8} {'latency':>9} {'p99':>9} {'wall':>7}")
+    for result in results:
+        d = result.to_dict()
+        print(f"{d['mode']:<8} {d['shards']:>6} {d['messages']:>9} {d['local_hops']:>7} {d['detected']:>6} "
+              f"{d['missed']:>6} {d['false_positives']:>7} {d['false_positive_rate']:>8.1%} "
+              f"{d['latency_mean'] * 1e3:>7.1f}ms {d['latency_p99'] * 1e3:>7.1f}ms {d['wall_seconds']:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from cycle_detection import strongly_connected_components
+
+
+class DynamicWaitForGraph:
+    """Wait-for graph that reports deadlocks as edges arrive and depart.
+
+    Every wait is kept in `successors`/`predecessors`, cycles included. The
+    strongly connected components are kept in a topological order with the
+    Pearce–Kelly algorithm: inserting p → q only searches the components
+    whose order lies between q's and p's, so the cost is proportional to the
+    affected region rather than the whole graph. When that search finds q
+    reaching p, the components on the way are merged into one, and the new
+    edge's cycle is found by a breadth-first search from both of its ends
+    inside it. Removing a wait inside a component re-splits just that
+    component.
+    """
+
+    def __init__(self):
+        self.successors = {}
+        self.predecessors = {}
+        self.leader = {}            # process -> representative of its component
+        self.members = {}           # representative -> processes of its component
+        self.order = {}             # representative -> position of its component
+        self.deadlocked = set()     # representatives of components that contain a cycle
+        self._next_order = 0
+
+    def add_process(self, p):
+        if p not in self.leader:
+            self.leader[p] = p
+            self.members[p] = [p]
+            self.order[p] = self._next_order
+            self._next_order += 1
+            self.successors[p] = set()
+            self.predecessors[p] = set()
+
+    def add_wait(self, p, q):
+        """Record that p waits for q; returns the cycle it closes, else None."""
+        self.add_process(p)
+        self.add_process(q)
+        self.successors[p].add(q)
+        self.predecessors[q].add(p)
+        if p == q:
+            self.deadlocked.add(self.leader[p])
+        elif self.leader[p] != self.leader[q]:
+            if self.order[self.leader[q]] > self.order[self.leader[p]] or not self._insert(p, q):
+                return None
+        return self._cycle(p, q)
+
+    def remove_wait(self, p, q):
+        """Drop p → q; returns the deadlocks still present afterwards."""
+        if q not in self.successors.get(p, ()):
+            raise KeyError(f"{p} is not waiting for {q}")
+        self.successors[p].discard(q)
+        self.predecessors[q].discard(p)
+        # Removing an edge never invalidates the order, but it may break up a component
+        if self.leader[p] == self.leader[q]:
+            self._split(self.leader[p])
+        return self.cycles()
+
+    def remove_process(self, p):
+        for q in list(self.successors.get(p, ())):
+            self.remove_wait(p, q)
+        for q in list(self.predecessors.get(p, ())):
+            self.remove_wait(q, p)
+        if p in self.leader:
+            del self.members[self.leader.pop(p)]
+            self.order.pop(p)
+            self.deadlocked.discard(p)
+            del self.successors[p], self.predecessors[p]
+
+    def cycles(self):
+        """Processes of every deadlock, one list per cyclic strongly connected component."""
+        return [list(self.members[leader]) for leader in self.deadlocked]
+
+    def has_deadlock(self):
+        return bool(self.deadlocked)
+
+    def edges(self):
+        for p, targets in self.successors.items():
+            for q in targets:
+                yield p, q
+
+    def _cycle(self, p, q):
+        # p, q, ..., back to p inside their component. Breadth-first from q
+        # forward and from p backward, a whole level at a time on the smaller
+        # side, until the two searches meet
+        if p == q:
+            return [p]
+        forward, backward = {q: None}, {p: None}
+        ahead, behind = [q], [p]
+        while ahead and behind:
+            if len(ahead) <= len(behind):
+                ahead, meet = self._expand(ahead, forward, backward, self.successors)
+            else:
+                behind, meet = self._expand(behind, backward, forward, self.predecessors)
+            if meet is not None:
+                path, node = [], meet
+                while node is not None:
+                    path.append(node)
+                    node = forward[node]
+                path.reverse()
+                node = backward[meet]
+                while node is not None:
+                    path.append(node)
+                    node = backward[node]
+                return path[-1:] + path[:-1]
+        raise AssertionError(f"{q} does not lead back to {p} inside its component")
+
+    def _expand(self, frontier, seen, other, edges):
+        # One search level inside the component; returns the next level and
+        # the first node the other side has already seen
+        leader = self.leader
+        component = leader[frontier[0]]
+        level = []
+        for node in frontier:
+            for nxt in edges[node]:
+                if nxt not in seen and leader[nxt] == component:
+                    seen[nxt] = node
+                    if nxt in other:
+                        return level, nxt
+                    level.append(nxt)
+        return level, None
+
+    def _reach(self, start, edges, keep):
+        # Components reachable from `start` over `edges` whose order passes `keep`
+        leader = self.leader
+        seen = {start}
+        stack = [start]
+        while stack:
+            component = stack.pop()
+            for node in self.members[component]:
+                for other in edges[node]:
+                    other = leader[other]
+                    if other not in seen and keep(self.order[other]):
+                        seen.add(other)
+                        stack.append(other)
+        return seen
+
+    def _insert(self, p, q):
+        # p → q runs backwards in the order; returns True if it closed a cycle
+        order = self.order
+        source, target = self.leader[p], self.leader[q]
+        lower, upper = order[target], order[source]
+        forward = self._reach(target, self.successors, lambda o: o <= upper)
+        backward = self._reach(source, self.predecessors, lambda o: o >= lower)
+        merged = forward & backward if source in forward else set()
+
+        # Reuse the affected order slots: everything reaching p now precedes
+        # everything q reaches, with the merged cycle (if any) in between.
+        # The latter only move up and the former only down, so edges
+        # leaving the affected region stay forward
+        slots = sorted(order[c] for c in forward | backward)
+        backward = sorted(backward - merged, key=order.__getitem__)
+        forward = sorted(forward - merged, key=order.__getitem__)
+        if merged:
+            backward.append(self._merge(merged))
+        for component, slot in zip(backward, slots):
+            order[component] = slot
+        for component, slot in zip(forward, slots[len(slots) - len(forward):]):
+            order[component] = slot
+        return bool(merged)
+
+    def _merge(self, components):
+        # One component out of `components`, led by the largest
+        head = max(components, key=lambda c: len(self.members[c]))
+        members = self.members[head]
+        for component in components:
+            if component != head:
+                for node in self.members.pop(component):
+                    self.leader[node] = head
+                    members.append(node)
+                del self.order[component]
+                self.deadlocked.discard(component)
+        self.deadlocked.add(head)
+        return head
+
+    def _split(self, head):
+        # Recompute the components of `head`'s members after an edge inside it went away
+        leader = self.leader
+        members = self.members.pop(head)
+        slot = self.order.pop(head)
+        self.deadlocked.discard(head)
+        inside = {node: [n for n in self.successors[node] if leader[n] == head] for node in members}
+        # Tarjan emits components sinks first; the new ones take consecutive slots
+        parts = strongly_connected_components(inside)[::-1]
+        if len(parts) > 1:
+            for component, position in self.order.items():
+                if position > slot:
+                    self.order[component] = position + len(parts) - 1
+            self._next_order += len(parts) - 1
+        for offset, part in enumerate(parts):
+            first = part[0]
+            for node in part:
+                leader[node] = first
+            self.members[first] = part
+            self.order[first] = slot + offset
+            if len(part) > 1 or first in self.successors[first]:
+                self.deadlocked.add(first)
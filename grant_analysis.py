@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import metrics
+from batch_safety import check_safety_batch
+from safety_engine import SafetyEngine
+
+
+class GrantRow:
+    def __init__(self, process, request, grantable, reason, margin=None, blocked=()):
+        self.process = process          # index of the requesting process
+        self.request = request          # requested instances per resource
+        self.grantable = grantable
+        self.reason = reason
+        self.margin = margin            # smallest slack left along the safe sequence after the grant
+        self.blocked = list(blocked)    # processes that could not finish after the grant
+
+    def to_dict(self):
+        return {"process": f"P{self.process}", "request": self.request, "grantable": self.grantable,
+                "reason": self.reason, "margin": self.margin, "blocked": [f"P{i}" for i in self.blocked]}
+
+
+class GrantTable:
+    """Pending requests ranked: grantable ones first, widest safety margin first."""
+
+    def __init__(self, rows, baseline_safe, sequence, full_checks):
+        self.rows = sorted(rows, key=lambda r: (not r.grantable, -(r.margin or 0), r.process))
+        self.baseline_safe = baseline_safe
+        self.sequence = sequence        # safe sequence of the current state
+        self.full_checks = full_checks  # requests that needed a whole safety run
+
+    @property
+    def grantable(self):
+        return [row for row in self.rows if row.grantable]
+
+    def to_dict(self):
+        return {"baseline_safe": self.baseline_safe, "sequence": [f"P{i}" for i in self.sequence],
+                "full_checks": self.full_checks, "rows": [row.to_dict() for row in self.rows]}
+
+    def __str__(self):
+        lines = [f"{'#':>4}  {'process':<8} {'grant':<6} {'margin':>6}  {'request':<24} reason"]
+        for rank, row in enumerate(self.rows, 1):
+            margin = "" if row.margin is None else row.margin
+            request = str(row.request)
+            request = request if len(request) <= 24 else request[:23] + "…"
+            lines.append(f"{rank:>4}  P{row.process:<7} {'yes' if row.grantable else 'no':<6} {margin:>6}  "
+                         f"{request:<24} {row.reason}")
+        return "\n".join(lines)
+
+
+def pending_requests(request):
+    """(process, vector) for every non-zero row of a request matrix."""
+    return [(i, row) for i, row in enumerate(np.asarray(request).tolist()) if any(row)]
+
+
+def _slack(order, allocation, need, work):
+    # Slack work - need of each process when it runs in `order`, one row per position
+    taken = allocation[order]
+    return work + np.cumsum(taken, axis=0) - taken - need[order]
+
+
+_context = None     # (allocation, maximum, available) shared by every full check in a process
+
+
+def _set_context(allocation, maximum, available):
+    global _context
+    _context = (allocation, maximum, available)
+
+
+def _full_check(task):
+    # Tentatively grant and rerun the (vectorized) safety check on the new state
+    i, request = task
+    allocation, maximum, available = _context
+    allocation = allocation.copy()
+    allocation[i] += request
+    work = available - request
+    result = check_safety_batch(allocation[None], maximum[None], work)
+    order = result.sequence(0)
+    if not result.safe[0]:
+        return False, np.setdiff1d(np.arange(len(allocation)), order).tolist()
+    slack = _slack(order, allocation, maximum - allocation, work)
+    return True, int(slack.min()) if slack.size else None
+
+
+def _check_all(tasks, context, workers, chunksize):
+    if workers <= 1:
+        _set_context(*context)
+        return [_full_check(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_context, initargs=context) as pool:
+        return list(pool.map(_full_check, tasks, chunksize=chunksize))
+
+
+def analyze_requests(allocation, maximum, available, requests, workers=None, min_parallel_work=2_000_000):
+    """Which of `requests` ((process, vector) pairs) can be granted right now.
+
+    `need` and the baseline safe sequence are computed once. A grant to Pi
+    only lowers the work seen by the processes ordered before Pi, so a
+    request within the prefix-minimum slack at Pi's position keeps the
+    baseline sequence valid; that is one vectorized comparison for all
+    requests. The rest get a full tentative-grant run of the vectorized
+    safety check, fanned out over `workers` processes once their total size
+    (requests x n x m) reaches `min_parallel_work`. A state that is already
+    unsafe stays unsafe after any grant, so then nothing is grantable.
+    """
+    engine = SafetyEngine(allocation, maximum, available)
+    with metrics.phase("baseline"):
+        baseline = engine.run()
+    n, m = engine.num_processes, engine.num_resources
+    requests = [(int(i), list(r.tolist() if hasattr(r, "tolist") else r)) for i, r in requests]
+    for i, request in requests:
+        if not 0 <= i < n:
+            raise ValueError(f"P{i} does not exist.")
+        if len(request) != m:
+            raise ValueError(f"Request of P{i} must list exactly {m} resource values.")
+        if any(r < 0 for r in request):
+            raise ValueError(f"Request of P{i} cannot contain negative values.")
+
+    rows = [None] * len(requests)
+    if not requests:
+        return GrantTable([], baseline.safe, baseline.sequence, 0)
+    process = np.array([i for i, _ in requests])
+    vectors = np.array([r for _, r in requests], dtype=np.int64).reshape(len(requests), m)
+    alloc = np.array(engine.allocation, dtype=np.int64).reshape(n, m)
+    need = np.array(engine.need, dtype=np.int64).reshape(n, m)
+    free = np.array(engine.available, dtype=np.int64)
+    over_claim = (vectors > need[process]).any(axis=1)
+    too_big = (vectors > free).any(axis=1)
+
+    fast = np.zeros(len(requests), dtype=bool)
+    margins = np.zeros(len(requests), dtype=np.int64)
+    if baseline.safe and n:
+        with metrics.phase("prefix_slack"):
+            order = np.array(baseline.sequence)
+            slack = _slack(order, alloc, need, free)
+            inf = np.iinfo(np.int64).max
+            prefix = np.vstack([np.full((1, m), inf), np.minimum.accumulate(slack, axis=0)])
+            suffix = np.append(np.minimum.accumulate(slack.min(axis=1, initial=inf)[::-1])[::-1], inf)
+            position = np.empty(n, dtype=np.int64)
+            position[order] = np.arange(n)
+            pos = position[process]
+            fast = ~over_claim & ~too_big & (vectors <= prefix[pos]).all(axis=1)
+            margins = np.minimum((prefix[pos] - vectors).min(axis=1, initial=inf), suffix[pos])
+
+    slow = []
+    for k, (i, request) in enumerate(requests):
+        if over_claim[k]:
+            rows[k] = GrantRow(i, request, False, "exceeds maximum claim")
+        elif too_big[k]:
+            rows[k] = GrantRow(i, request, False, "not enough available")
+        elif not baseline.safe:
+            rows[k] = GrantRow(i, request, False, "state already unsafe")
+        elif fast[k]:
+            margin = int(margins[k]) if margins[k] != np.iinfo(np.int64).max else None
+            rows[k] = GrantRow(i, request, True, "safe, keeps the current order", margin)
+        else:
+            slow.append(k)
+    metrics.count("grant_fast_checks", len(requests) - len(slow))
+    metrics.count("grant_full_checks", len(slow))
+
+    if slow:
+        workers = workers or os.cpu_count() or 1
+        if len(slow) * n * m < min_parallel_work:
+            workers = 1
+        workers = min(workers, len(slow))
+        context = (alloc, alloc + need, free)
+        tasks = [(requests[k][0], vectors[k]) for k in slow]
+        with metrics.phase("full_checks"):
+            outcomes = _check_all(tasks, context, workers, max(1, len(tasks) // (4 * workers)))
+        for k, (safe, detail) in zip(slow, outcomes):
+            i, request = requests[k]
+            if safe:
+                rows[k] = GrantRow(i, request, True, "safe after reordering", detail)
+            else:
+                rows[k] = GrantRow(i, request, False, "would leave the safe state", blocked=detail)
+    return GrantTable(rows, baseline.safe, baseline.sequence, len(slow))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank pending requests by whether granting them keeps the state safe.")
+    parser.add_argument("paths", nargs="+",
+                        help="scenario file, or allocation/maximum/available(/request) files (see matrix_state)")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes for full checks (default: CPU count)")
+    parser.add_argument("--min-parallel-work", type=int, default=2_000_000,
+                        help="requests x processes x resources needed before checks fan out")
+    parser.add_argument("--json", action="store_true", help="print the table as JSON")
+    args = parser.parse_args()
+
+    from matrix_state import MatrixState
+    state = MatrixState.load(*args.paths)
+    if state.allocation is None or state.maximum is None or state.available is None:
+        parser.error("allocation, maximum and available are all required")
+    # Without a request matrix, ask whether each process could get everything it still needs
+    requests = pending_requests(state.request if state.request is not None else state.need)
+    table = analyze_requests(state.allocation, state.maximum, state.available, requests,
+                             args.workers, args.min_parallel_work)
+    if args.json:
+        print(json.dumps(table.to_dict()))
+    else:
+        print(f"Current state: {'safe' if table.baseline_safe else 'UNSAFE'}; "
+              f"{len(table.grantable)}/{len(table.rows)} requests grantable, {table.full_checks} needed a full check")
+        print(table)
+
+
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    main()
@@ -0,0 +1,273 @@
+import math
+
+import numpy as np
+
+import metrics
+from timeline import RedrawCoalescer
+
+
+class GraphRenderer:
+    """Draws a graph onto a Tk canvas without redrawing the whole scene.
+
+    Nodes and edges live in world coordinates; the canvas shows them at
+    `scale`. Each frame only the items intersecting the visible part of the
+    scroll region are wanted, and the wanted set is diffed against what is
+    already on the canvas: unchanged items are left alone, moved ones get new
+    coords, and items that scrolled out of view are deleted.
+
+    When nodes would be smaller than `min_node_px` or more than `max_items`
+    would be visible, ordinary nodes are collapsed into one glyph per
+    `cell_px` screen cell and their edges into one line per pair of cells.
+    Highlighted items (the deadlocked SCCs) are always drawn in full detail.
+    """
+
+    def __init__(self, canvas, node_radius=20, max_items=3000, min_node_px=4, label_px=10,
+                 cell_px=24, max_fps=30, font=None, edge_fill="black", edge_width=1):
+        self.canvas = canvas
+        self.node_radius = node_radius
+        self.font = font
+        self.edge_fill = edge_fill
+        self.edge_width = edge_width
+        self.max_items = max_items
+        self.min_node_px = min_node_px
+        self.label_px = label_px
+        self.cell_px = cell_px
+        self.scale = 1.0
+        self.world = (1.0, 1.0)
+        self.drawn = {}     # item key -> (spec, canvas item ids)
+        self.redraw = RedrawCoalescer(canvas, self.render, max_fps=max_fps)
+        self.clear()
+
+        canvas.bind("<Configure>", lambda e: self.redraw.request())
+        canvas.bind("<MouseWheel>", lambda e: self.zoom(1.25 if e.delta > 0 else 0.8, e.x, e.y))
+        canvas.bind("<Button-4>", lambda e: self.zoom(1.25, e.x, e.y))
+        canvas.bind("<Button-5>", lambda e: self.zoom(0.8, e.x, e.y))
+        canvas.bind("<ButtonPress-1>", lambda e: canvas.scan_mark(e.x, e.y))
+        canvas.bind("<B1-Motion>", self._drag)
+
+    def clear(self):
+        self.redraw.cancel()
+        self.canvas.delete("graph")
+        self.drawn = {}
+        self.nodes = {}     # key -> index into the node lists
+        self.node_keys, self.node_xy, self.node_style = [], [], []
+        self.edges = {}
+        self.edge_keys, self.edge_xy, self.edge_style = [], [], []
+        self._arrays = None
+
+    def set_world(self, width, height, fit=True):
+        self.world = (float(width), float(height))
+        if fit:
+            view_w = max(self.canvas.winfo_width(), int(self.canvas.cget("width")))
+            view_h = max(self.canvas.winfo_height(), int(self.canvas.cget("height")))
+            self.scale = min(view_w / self.world[0], view_h / self.world[1], 1.0)
+        self._update_scrollregion()
+        self.redraw.request()
+
+    def add_node(self, key, x, y, shape="oval", fill="#FFD54F", highlighted=False, label=None):
+        style = (shape, fill, highlighted, key if label is None else label)
+        index = self.nodes.get(key)
+        if index is None:
+            self.nodes[key] = len(self.node_keys)
+            self.node_keys.append(key)
+            self.node_xy.append((x, y))
+            self.node_style.append(style)
+        else:
+            self.node_xy[index] = (x, y)
+            self.node_style[index] = style
+        self._arrays = None
+        self.redraw.request()
+
+    def add_edge(self, key, x1, y1, x2, y2, highlighted=False, label=None):
+        style = (highlighted, label)
+        index = self.edges.get(key)
+        if index is None:
+            self.edges[key] = len(self.edge_keys)
+            self.edge_keys.append(key)
+            self.edge_xy.append((x1, y1, x2, y2))
+            self.edge_style.append(style)
+        else:
+            self.edge_xy[index] = (x1, y1, x2, y2)
+            self.edge_style[index] = style
+        self._arrays = None
+        self.redraw.request()
+
+    def retain(self, nodes, edges):
+        """Drop the nodes and edges whose keys are not in `nodes` / `edges`.
+
+        Redrawing a graph upserts its current items with add_node/add_edge and
+        calls this for the rest, so items that did not change keep their
+        canvas ids instead of everything being deleted and recreated.
+        """
+        nodes, edges = set(nodes), set(edges)
+        if nodes.issuperset(self.nodes) and edges.issuperset(self.edges):
+            return
+        keep = [i for i, key in enumerate(self.node_keys) if key in nodes]
+        self.node_keys = [self.node_keys[i] for i in keep]
+        self.node_xy = [self.node_xy[i] for i in keep]
+        self.node_style = [self.node_style[i] for i in keep]
+        self.nodes = {key: i for i, key in enumerate(self.node_keys)}
+        keep = [i for i, key in enumerate(self.edge_keys) if key in edges]
+        self.edge_keys = [self.edge_keys[i] for i in keep]
+        self.edge_xy = [self.edge_xy[i] for i in keep]
+        self.edge_style = [self.edge_style[i] for i in keep]
+        self.edges = {key: i for i, key in enumerate(self.edge_keys)}
+        self._arrays = None
+        self.redraw.request()
+
+    def zoom(self, factor, x=0, y=0):
+        # Keeps the world point under (x, y) in place
+        wx = self.canvas.canvasx(x) / self.scale
+        wy = self.canvas.canvasy(y) / self.scale
+        self.scale *= factor
+        self._update_scrollregion()
+        width, height = (w * self.scale for w in self.world)
+        self.canvas.xview_moveto((wx * self.scale - x) / width)
+        self.canvas.yview_moveto((wy * self.scale - y) / height)
+        self.redraw.request()
+
+    def xview(self, *args):
+        # Scrollbar commands, so scrolling also brings newly visible items in
+        self.canvas.xview(*args)
+        self.redraw.request()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw.request()
+
+    def _drag(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.redraw.request()
+
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.world[0] * self.scale, self.world[1] * self.scale))
+
+    def _refresh_arrays(self):
+        if self._arrays is None:
+            node_xy = np.array(self.node_xy, dtype=float).reshape(-1, 2)
+            node_hl = np.array([s[2] for s in self.node_style], dtype=bool)
+            edge_xy = np.array(self.edge_xy, dtype=float).reshape(-1, 4)
+            edge_hl = np.array([s[0] for s in self.edge_style], dtype=bool)
+            self._arrays = node_xy, node_hl, edge_xy, edge_hl
+        return self._arrays
+
+    def viewport(self):
+        # Visible rectangle in world coordinates
+        s = self.scale
+        x0, y0 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        return (x0 / s, y0 / s,
+                (x0 + max(self.canvas.winfo_width(), 1)) / s,
+                (y0 + max(self.canvas.winfo_height(), 1)) / s)
+
+    def render(self):
+        with metrics.phase("draw"):
+            self._render()
+
+    def _render(self):
+        node_xy, node_hl, edge_xy, edge_hl = self._refresh_arrays()
+        x0, y0, x1, y1 = self.viewport()
+        pad = self.node_radius
+        node_seen = ((node_xy[:, 0] >= x0 - pad) & (node_xy[:, 0] <= x1 + pad) &
+                     (node_xy[:, 1] >= y0 - pad) & (node_xy[:, 1] <= y1 + pad))
+        edge_seen = ((np.minimum(edge_xy[:, 0], edge_xy[:, 2]) <= x1) &
+                     (np.maximum(edge_xy[:, 0], edge_xy[:, 2]) >= x0) &
+                     (np.minimum(edge_xy[:, 1], edge_xy[:, 3]) <= y1) &
+                     (np.maximum(edge_xy[:, 1], edge_xy[:, 3]) >= y0))
+
+        radius = self.node_radius * self.scale
+        detail = (radius >= self.min_node_px and
+                  int(node_seen.sum()) + int(edge_seen.sum()) <= self.max_items)
+        wanted = {}
+        if detail:
+            nodes, edges = np.nonzero(node_seen)[0], np.nonzero(edge_seen)[0]
+        else:
+            nodes, edges = np.nonzero(node_seen & node_hl)[0], np.nonzero(edge_seen & edge_hl)[0]
+            self._aggregate(wanted, node_xy, node_seen & ~node_hl, edge_xy, edge_seen & ~edge_hl)
+        for i in edges.tolist():
+            wanted[("edge", self.edge_keys[i])] = self._edge_spec(i)
+        for i in nodes.tolist():
+            wanted[("node", self.node_keys[i])] = self._node_spec(i, radius)
+        self._apply(wanted)
+        metrics.count("canvas_items_wanted", len(wanted))
+
+    def _node_spec(self, i, radius):
+        shape, fill, highlighted, label = self.node_style[i]
+        x, y = (c * self.scale for c in self.node_xy[i])
+        spec = [(shape, (x - radius, y - radius, x + radius, y + radius),
+                 (("fill", fill), ("outline", "red" if highlighted else "black"),
+                  ("width", 3 if highlighted else 1)))]
+        if radius >= self.label_px:
+            spec.append(("text", (x, y), (("text", label),) + ((("font", self.font),) if self.font else ())))
+        return tuple(spec)
+
+    def _edge_spec(self, i):
+        highlighted, label = self.edge_style[i]
+        x1, y1, x2, y2 = (c * self.scale for c in self.edge_xy[i])
+        spec = [("line", (x1, y1, x2, y2),
+                 (("arrow", "last"), ("fill", "red" if highlighted else self.edge_fill),
+                  ("width", self.edge_width + 1 if highlighted else self.edge_width)))]
+        if label is not None and self.node_radius * self.scale >= self.label_px:
+            spec.append(("text", ((x1 + x2) / 2, (y1 + y2) / 2 - 8), (("text", label),)))
+        return tuple(spec)
+
+    def _aggregate(self, wanted, node_xy, node_mask, edge_xy, edge_mask):
+        # Screen cells are numbered row-major so grouping works on flat keys
+        size = self.cell_px / self.scale
+        rows = int(self.world[1] / size) + 1
+
+        # One square per occupied cell, sized by how many nodes it holds
+        cells = (node_xy[node_mask] // size).astype(np.int64)
+        occupied, counts = np.unique(cells[:, 0] * rows + cells[:, 1], return_counts=True)
+        for cell, count in zip(occupied.tolist(), counts.tolist()):
+            cx, cy = divmod(cell, rows)
+            half = min(self.cell_px / 2 - 1, 2 + 2 * math.log2(count))
+            x, y = (cx + 0.5) * self.cell_px, (cy + 0.5) * self.cell_px
+            wanted[("cell", cx, cy)] = (("rectangle", (x - half, y - half, x + half, y + half),
+                                         (("fill", "#B0BEC5"), ("outline", "#546E7A"), ("width", 1))),)
+
+        # One line per pair of distinct cells, the busiest pairs first
+        ends = (edge_xy[edge_mask] // size).astype(np.int64)
+        a = ends[:, 0] * rows + ends[:, 1]
+        b = ends[:, 2] * rows + ends[:, 3]
+        cols = int(self.world[0] / size) + 1
+        links, counts = np.unique((a * (rows * cols) + b)[a != b], return_counts=True)
+        budget = max(self.max_items - len(wanted), 0)
+        for k in np.argsort(-counts, kind="stable")[:budget].tolist():
+            (ax, ay), (bx, by) = (divmod(cell, rows) for cell in divmod(int(links[k]), rows * cols))
+            coords = tuple((c + 0.5) * self.cell_px for c in (ax, ay, bx, by))
+            width = min(1 + int(math.log2(counts[k])), 6)
+            wanted[("link", ax, ay, bx, by)] = (("line", coords, (("fill", "#90A4AE"), ("width", width))),)
+
+    def _apply(self, wanted):
+        canvas = self.canvas
+        for key in self.drawn.keys() - wanted.keys():
+            for item in self.drawn.pop(key)[1]:
+                canvas.delete(item)
+
+        created = False
+        for key, spec in wanted.items():
+            old = self.drawn.get(key)
+            if old is not None and old[0] == spec:
+                continue
+            if old is not None and [kind for kind, _, _ in old[0]] == [kind for kind, _, _ in spec]:
+                for item, (_, coords, options), (_, old_coords, old_options) in zip(old[1], spec, old[0]):
+                    if coords != old_coords:
+                        canvas.coords(item, *coords)
+                    if options != old_options:
+                        canvas.itemconfigure(item, **dict(options))
+                self.drawn[key] = (spec, old[1])
+                continue
+            if old is not None:
+                for item in old[1]:
+                    canvas.delete(item)
+            layer = "node" if key[0] in ("node", "cell") else "link"
+            items = [getattr(canvas, "create_" + kind)(*coords, tags=("graph", "text" if kind == "text" else layer),
+                                                         **dict(options))
+                     for kind, coords, options in spec]
+            self.drawn[key] = (spec, items)
+            created = True
+
+        if created:
+            # New edges must not cover nodes that were already there
+            canvas.tag_raise("node")
+            canvas.tag_raise("text")
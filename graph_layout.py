@@ -0,0 +1,328 @@
+import numpy as np
+
+import metrics
+
+
+def _nodes_and_edges(graph):
+    nodes = list(graph)
+    seen = set(nodes)
+    for targets in graph.values():
+        for q in targets:
+            if q not in seen:
+                seen.add(q)
+                nodes.append(q)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = [(index[p], index[q]) for p, targets in graph.items() for q in targets if p != q]
+    return nodes, index, edges
+
+
+def layered_layout(graph, sweeps=4):
+    """Sugiyama-style layout: {node: (x, y)} with x = layer, both in [0, 1].
+
+    Cycles are broken by reversing DFS back edges, nodes are layered by
+    longest path, and barycenter sweeps reduce crossings between layers.
+    """
+    nodes, index, edges = _nodes_and_edges(graph)
+    n = len(nodes)
+    if not n:
+        return {}
+    succ = [[] for _ in range(n)]
+    for p, q in edges:
+        succ[p].append(q)
+
+    # Cycle breaking: iterative DFS, edges into the active path are reversed
+    state = [0] * n     # 0 new, 1 on stack, 2 done
+    dag = [[] for _ in range(n)]
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(succ[root]))]
+        while stack:
+            v, it = stack[-1]
+            for w in it:
+                if state[w] == 1:
+                    dag[w].append(v)
+                else:
+                    dag[v].append(w)
+                    if state[w] == 0:
+                        state[w] = 1
+                        stack.append((w, iter(succ[w])))
+                        break
+            else:
+                state[v] = 2
+                stack.pop()
+
+    # Longest-path layering in topological order
+    indegree = [0] * n
+    for v in range(n):
+        for w in dag[v]:
+            indegree[w] += 1
+    layer = [0] * n
+    queue = [v for v in range(n) if indegree[v] == 0]
+    for v in queue:
+        for w in dag[v]:
+            layer[w] = max(layer[w], layer[v] + 1)
+            indegree[w] -= 1
+            if indegree[w] == 0:
+                queue.append(w)
+
+    num_layers = max(layer) + 1
+    layers = [[] for _ in range(num_layers)]
+    for v in range(n):
+        layers[layer[v]].append(v)
+
+    neighbors = [[] for _ in range(n)]
+    for v in range(n):
+        for w in dag[v]:
+            neighbors[v].append(w)
+            neighbors[w].append(v)
+
+    # Barycenter sweeps, alternating downwards and upwards
+    rank = [0.0] * n
+    for row in layers:
+        for k, v in enumerate(row):
+            rank[v] = k
+    for sweep in range(sweeps):
+        order = range(1, num_layers) if sweep % 2 == 0 else range(num_layers - 2, -1, -1)
+        fixed = -1 if sweep % 2 == 0 else 1
+        for k in order:
+            def barycenter(v):
+                ranks = [rank[w] for w in neighbors[v] if layer[w] == k + fixed]
+                return sum(ranks) / len(ranks) if ranks else rank[v]
+            layers[k].sort(key=barycenter)
+            for pos, v in enumerate(layers[k]):
+                rank[v] = pos
+
+    positions = {}
+    for k, row in enumerate(layers):
+        x = (k + 0.5) / num_layers
+        for pos, v in enumerate(row):
+            positions[nodes[v]] = (x, (pos + 0.5) / len(row))
+    return positions
+
+
+# Far-field interaction list relative to a node's own cell, per (x % 2, y % 2)
+# parity: children of the parent's 3 × 3 neighbourhood that are not adjacent.
+_FAR_OFFSETS = {
+    (px, py): [(ox - px, oy - py) for ox in range(-2, 4) for oy in range(-2, 4)
+               if abs(ox - px) > 1 or abs(oy - py) > 1]
+    for px in (0, 1) for py in (0, 1)
+}
+# Own cell plus half of the neighbours, so every adjacent pair is seen once
+_NEAR_OFFSETS = [(1, -1), (1, 0), (1, 1), (0, 1)]
+_PAD = 2
+
+
+def _scatter(index, vectors, n):
+    # Sum 2-D vectors into their rows; bincount is much faster than np.add.at
+    return np.stack([np.bincount(index, weights=vectors[:, 0], minlength=n),
+                     np.bincount(index, weights=vectors[:, 1], minlength=n)], axis=1)
+
+
+def _grid(pos, size):
+    # Cell coordinates on a grid padded by empty border cells, and their flat keys
+    cells = np.minimum((pos * size).astype(np.int64), size - 1) + _PAD
+    width = size + 2 * _PAD
+    return cells, cells[:, 0] * width + cells[:, 1], width
+
+
+def _expand(starts, counts):
+    # Concatenated ranges [start, start + count) plus the row each one came from
+    total = int(counts.sum())
+    rows = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rows, np.repeat(starts, counts) + offsets
+
+
+def _near_pairs(pos, size, rows=None):
+    # Node pairs in the same or adjacent cells of the finest grid; with `rows`,
+    # every neighbour of just those nodes instead, each pair once per row node
+    _, keys, width = _grid(pos, size)
+    order = np.argsort(keys, kind="stable")
+    count = np.bincount(keys, minlength=width * width)
+    start = np.cumsum(count) - count
+
+    if rows is not None:
+        left, right = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                target = keys[rows] + dx * width + dy
+                owner, slots = _expand(start[target], count[target])
+                left.append(rows[owner])
+                right.append(order[slots])
+        i, j = np.concatenate(left), np.concatenate(right)
+        return i[i != j], j[i != j]
+
+    rows, slots = _expand(start[keys], count[keys])
+    j = order[slots]
+    keep = rows < j
+    left, right = [rows[keep]], [j[keep]]
+    for dx, dy in _NEAR_OFFSETS:
+        target = keys + dx * width + dy
+        rows, slots = _expand(start[target], count[target])
+        left.append(rows)
+        right.append(order[slots])
+    return np.concatenate(left), np.concatenate(right)
+
+
+def _repulsion(pos, k, levels, active=None):
+    """Approximate all-pairs repulsion k²/d on a hierarchy of grids.
+
+    Like Barnes–Hut, but on regular 2^l × 2^l grids: at every level a node
+    feels the centre of mass of each cell whose parent neighbours its own
+    parent but which is not adjacent to its own cell (27 cells per level).
+    Only nodes in adjacent cells of the finest grid interact exactly. The
+    grids carry an empty border so no bounds checks are needed. With an
+    `active` mask only those nodes get a displacement; the cell masses still
+    cover every node.
+    """
+    n = len(pos)
+    disp = np.zeros((n, 2))
+    kk = k * k
+    for level in range(2, levels + 1):
+        size = 2 ** level
+        cells, keys, width = _grid(pos, size)
+        mass = np.bincount(keys, minlength=width * width).astype(float)
+        cx = np.bincount(keys, weights=pos[:, 0], minlength=width * width)
+        cy = np.bincount(keys, weights=pos[:, 1], minlength=width * width)
+        occupied = mass > 0
+        cx[occupied] /= mass[occupied]
+        cy[occupied] /= mass[occupied]
+        parity = (cells - _PAD) % 2
+        for (px, py), offsets in _FAR_OFFSETS.items():
+            mask = (parity[:, 0] == px) & (parity[:, 1] == py)
+            idx = np.nonzero(mask if active is None else mask & active)[0]
+            if not len(idx):
+                continue
+            key = keys[idx][:, None] + np.array([dx * width + dy for dx, dy in offsets])
+            dx = pos[idx, 0][:, None] - cx[key]
+            dy = pos[idx, 1][:, None] - cy[key]
+            scale = mass[key] * kk / np.maximum(dx * dx + dy * dy, 1e-9)
+            disp[idx, 0] += (dx * scale).sum(axis=1)
+            disp[idx, 1] += (dy * scale).sum(axis=1)
+
+    i, j = _near_pairs(pos, 2 ** levels, None if active is None else np.nonzero(active)[0])
+    if len(i):
+        delta = pos[i] - pos[j]
+        dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-9)
+        force = delta * (kk / dist2)[:, None]
+        disp += _scatter(i, force, n)
+        if active is None:
+            disp -= _scatter(j, force, n)
+    return disp
+
+
+def default_iterations(n):
+    # 60 iterations up to 2,000 nodes, then fewer so a large layout stays near a second
+    return min(60, max(12, 120_000 // max(n, 1)))
+
+
+def force_layout(graph, initial=None, iterations=None, temperature=0.1, seed=0, moving=None):
+    """Fruchterman–Reingold layout in [0, 1]² with grid-approximated repulsion.
+
+    Repulsion goes through a multilevel grid (see `_repulsion`), keeping each
+    iteration close to linear; `iterations` defaults to `default_iterations`,
+    so 10k nodes lay out in about a second. `initial` maps nodes to starting
+    positions; nodes missing from it start next to their already placed
+    neighbours. With `moving`, only those nodes (and the unplaced ones) move.
+    """
+    nodes, index, edges = _nodes_and_edges(graph)
+    n = len(nodes)
+    if not n:
+        return {}
+    if iterations is None:
+        iterations = default_iterations(n)
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    active = None       # nodes allowed to move; None means all of them
+    if initial:
+        placed = np.zeros(n, dtype=bool)
+        for node, xy in initial.items():
+            if node in index:
+                pos[index[node]] = xy
+                placed[index[node]] = True
+        if moving is not None:
+            active = ~placed
+            active[[index[node] for node in moving if node in index]] = True
+        for p, q in edges:
+            for a, b in ((p, q), (q, p)):
+                if not placed[a] and placed[b]:
+                    pos[a] = np.clip(pos[b] + rng.normal(0, 0.01, 2), 0.0, 1.0)
+                    placed[a] = True
+
+    k = 1.0 / np.sqrt(n)
+    # Finest grid holds a handful of nodes per cell
+    levels = max(2, int(np.ceil(np.log2(np.sqrt(n / 4) + 1))))
+    edge_array = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    for step in range(iterations):
+        disp = _repulsion(pos, k, levels, active)
+
+        if len(edge_array):
+            p, q = edge_array[:, 0], edge_array[:, 1]
+            delta = pos[p] - pos[q]
+            dist = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+            force = delta * (dist / k)[:, None]
+            disp += _scatter(q, force, n) - _scatter(p, force, n)
+        if active is not None:
+            disp[~active] = 0
+
+        # Move at most the current temperature, cooling linearly
+        t = temperature * (1 - step / iterations)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        pos += disp * (np.minimum(length, t) / length)[:, None]
+        pos = np.clip(pos, 0.0, 1.0)
+
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, pos)}
+
+
+def fit(positions, width, height, margin=40):
+    # Scale [0, 1] positions onto a canvas
+    return {node: (margin + x * (width - 2 * margin), margin + y * (height - 2 * margin))
+            for node, (x, y) in positions.items()}
+
+
+class LayoutCache:
+    """Per-graph cache of node positions.
+
+    An unchanged graph reuses its positions outright. For force-directed
+    layouts a graph that only gained or lost a few edges starts from the
+    cached positions and gets a short, low-temperature refinement, so the
+    picture stays stable instead of being laid out from scratch. Above
+    `local_threshold` nodes only the changed region moves: the endpoints of
+    added or removed edges, new nodes, and their direct neighbours.
+    """
+
+    def __init__(self, refine_iterations=15, refine_temperature=0.02, max_change=0.2, local_threshold=2000):
+        self.refine_iterations = refine_iterations
+        self.refine_temperature = refine_temperature
+        self.max_change = max_change
+        self.local_threshold = local_threshold
+        self.entries = {}   # key -> (method, edge set, positions)
+
+    def layout(self, key, graph, method="force"):
+        with metrics.phase("layout"):
+            return self._layout(key, graph, method)
+
+    def _layout(self, key, graph, method):
+        edges = frozenset((p, q) for p, targets in graph.items() for q in targets)
+        cached = self.entries.get(key)
+        if cached is not None and cached[0] == method:
+            _, old_edges, positions = cached
+            nodes = set(graph) | {q for _, q in edges}
+            if old_edges == edges and nodes <= set(positions):
+                return positions
+            changed = old_edges ^ edges
+            if method == "force" and len(changed) <= self.max_change * max(len(edges), 1):
+                moving = None
+                if len(nodes) > self.local_threshold:
+                    moving = {v for edge in changed for v in edge} | (nodes - set(positions))
+                    moving |= {v for p, q in edges if p in moving or q in moving for v in (p, q)}
+                positions = force_layout(graph, initial=positions, iterations=self.refine_iterations,
+                                         temperature=self.refine_temperature, moving=moving)
+                self.entries[key] = (method, edges, positions)
+                return positions
+
+        positions = layered_layout(graph) if method == "layered" else force_layout(graph)
+        self.entries[key] = (method, edges, positions)
+        return positions
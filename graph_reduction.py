@@ -0,0 +1,39 @@
+import metrics
+from safety_engine import reduce_by_threshold, as_rows
+
+
+class ReductionResult:
+    def __init__(self, deadlocked, reduction_order, work):
+        self.deadlocked = deadlocked            # processes left after the graph is fully reduced
+        self.reduction_order = reduction_order  # processes in the order their edges were erased
+        self.work = work                        # free instances once every reducible process released
+
+    @property
+    def has_deadlock(self):
+        return bool(self.deadlocked)
+
+
+def detect_deadlock(allocation, request, available):
+    """Holt/Coffman graph reduction for multi-instance resources.
+
+    `allocation[i][j]` and `request[i][j]` are the instances of resource j
+    that process i holds and is waiting for; `available[j]` the free ones. A
+    process whose whole request fits into the free pool is reduced: it can
+    run to completion and its holdings return to the pool. Whatever cannot be
+    reduced is exactly the set of deadlocked processes. Uses the same
+    threshold worklist as the safety engine, with requests as thresholds.
+    """
+    allocation = as_rows(allocation)
+    request = as_rows(request)
+    work = list(available.tolist() if hasattr(available, "tolist") else available)
+    if len(allocation) != len(request):
+        raise ValueError("Allocation and Request must have the same number of processes.")
+    for i, (alloc_row, req_row) in enumerate(zip(allocation, request)):
+        if len(alloc_row) != len(work) or len(req_row) != len(work):
+            raise ValueError(f"P{i} must list exactly {len(work)} resource values.")
+
+    done = [False] * len(allocation)
+    with metrics.phase("reduction"):
+        order = reduce_by_threshold(request, allocation, work, done)
+    deadlocked = [i for i, d in enumerate(done) if not d]
+    return ReductionResult(deadlocked, order, work)
@@ -0,0 +1,114 @@
+import tkinter as tk
+
+import numpy as np
+
+
+class GridEditor(tk.Frame):
+    """Paged editor for a NumPy array that only creates the visible cells.
+
+    A fixed window of at most `rows` x `cols` Entry widgets is reused as the
+    view scrolls over `array`, so a 500x200 matrix costs the same widgets as
+    a 20x12 one. Edits are written straight into `array` (a 1-D array is
+    shown as one row) when the view moves or `commit()` is called; a cell
+    that is not a non-negative integer turns red and holds the view in place.
+    """
+
+    def __init__(self, master, array, rows=20, cols=12, row_prefix="P", col_prefix="R", width=5):
+        super().__init__(master)
+        self.array = np.atleast_2d(array)
+        self.top = 0
+        self.left = 0
+        self.row_prefix = row_prefix
+        self.col_prefix = col_prefix
+        total_rows, total_cols = self.array.shape
+        self.rows = min(rows, total_rows)
+        self.cols = min(cols, total_cols)
+        self.shown = {}     # (r, c) window cell -> text written into it
+
+        self.col_labels = [tk.Label(self, width=width, font=("Arial", 8)) for _ in range(self.cols)]
+        for c, label in enumerate(self.col_labels):
+            label.grid(row=0, column=1 + c)
+        self.row_labels = [tk.Label(self, width=5, anchor="e", font=("Arial", 8)) for _ in range(self.rows)]
+        for r, label in enumerate(self.row_labels):
+            label.grid(row=1 + r, column=0)
+        self.entries = [[tk.Entry(self, width=width) for _ in range(self.cols)] for _ in range(self.rows)]
+        for r, row in enumerate(self.entries):
+            for c, entry in enumerate(row):
+                entry.grid(row=1 + r, column=1 + c)
+                entry.bind("<MouseWheel>", self._on_wheel)
+
+        self.vbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.hbar = tk.Scrollbar(self, orient="horizontal", command=self.xview)
+        if total_rows > self.rows:
+            self.vbar.grid(row=1, column=1 + self.cols, rowspan=max(self.rows, 1), sticky="ns")
+        if total_cols > self.cols:
+            self.hbar.grid(row=1 + self.rows, column=1, columnspan=max(self.cols, 1), sticky="ew")
+        self.refresh()
+
+    def refresh(self):
+        # Loads the window at (top, left) from the array
+        total_rows, total_cols = self.array.shape
+        window = self.array[self.top:self.top + self.rows, self.left:self.left + self.cols].tolist()
+        self.shown.clear()
+        for c, label in enumerate(self.col_labels):
+            label.config(text=f"{self.col_prefix}{self.left + c}")
+        for r, label in enumerate(self.row_labels):
+            label.config(text=f"{self.row_prefix}{self.top + r}" if self.array.shape[0] > 1 else "")
+        for r, row in enumerate(self.entries):
+            for c, entry in enumerate(row):
+                text = str(window[r][c])
+                entry.config(bg="white")
+                entry.delete(0, tk.END)
+                entry.insert(0, text)
+                self.shown[(r, c)] = text
+        if total_rows:
+            self.vbar.set(self.top / total_rows, (self.top + self.rows) / total_rows)
+        if total_cols:
+            self.hbar.set(self.left / total_cols, (self.left + self.cols) / total_cols)
+
+    def commit(self):
+        """Write edited cells back into the array; False if any cell is invalid."""
+        ok = True
+        for (r, c), text in self.shown.items():
+            entry = self.entries[r][c]
+            value = entry.get().strip()
+            if value == text:
+                continue
+            try:
+                number = int(value) if value else 0
+                if number < 0:
+                    raise ValueError(value)
+            except ValueError:
+                entry.config(bg="#FFCDD2")
+                ok = False
+                continue
+            self.array[self.top + r, self.left + c] = number
+            self.shown[(r, c)] = value
+            entry.config(bg="white")
+        return ok
+
+    def scroll_to(self, top=None, left=None):
+        if not self.commit():
+            return
+        total_rows, total_cols = self.array.shape
+        if top is not None:
+            self.top = max(0, min(int(top), total_rows - self.rows))
+        if left is not None:
+            self.left = max(0, min(int(left), total_cols - self.cols))
+        self.refresh()
+
+    def _move(self, args, start, size, total):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if args[0] == "moveto":
+            return float(args[1]) * total
+        step = size if args[2] == "pages" else 1
+        return start + int(args[1]) * step
+
+    def yview(self, *args):
+        self.scroll_to(top=self._move(args, self.top, self.rows, self.array.shape[0]))
+
+    def xview(self, *args):
+        self.scroll_to(left=self._move(args, self.left, self.cols, self.array.shape[1]))
+
+    def _on_wheel(self, event):
+        self.scroll_to(top=self.top - (1 if event.delta > 0 else -1) * 3)
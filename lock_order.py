@@ -0,0 +1,188 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from binary_trace import MAGIC, NO_RESOURCE, BinaryTrace
+from dynamic_wait_for import DynamicWaitForGraph
+from trace_ingest import OPS, read_events
+
+
+class Inversion:
+    def __init__(self, chain):
+        self.chain = chain      # [(held lock, acquired lock, pid, ts)], closing back on the first lock
+
+    @property
+    def locks(self):
+        return [held for held, *_ in self.chain]
+
+    def to_dict(self):
+        return {"locks": self.locks,
+                "chain": [{"held": held, "acquired": acquired, "pid": pid, "ts": ts}
+                          for held, acquired, pid, ts in self.chain]}
+
+    def __str__(self):
+        steps = "; ".join(f"{pid} took {acquired} holding {held} (t={ts:g})" for held, acquired, pid, ts in self.chain)
+        return f"{' → '.join(map(str, self.locks + self.locks[:1]))}: {steps}"
+
+
+class LockOrderReport:
+    def __init__(self, inversions, locks, pairs, events, cached):
+        self.inversions = inversions    # offending acquisition chains
+        self.locks = locks              # distinct locks seen in nested acquisitions
+        self.pairs = pairs              # distinct held -> acquired pairs in the order graph
+        self.events = events
+        self.cached = cached            # nested acquisitions answered by the validated-pair cache
+
+    def to_dict(self):
+        return {"events": self.events, "locks": self.locks, "pairs": self.pairs, "cached": self.cached,
+                "inversions": [inversion.to_dict() for inversion in self.inversions]}
+
+
+class LockOrderChecker:
+    """lockdep-style lock-order validation over recorded acquisitions.
+
+    Every time a process requests or acquires L while holding H, the pair
+    H → L is added to a global acquisition-order graph. A pair that closes a
+    cycle means two code paths take the same locks in opposite orders,
+    which can deadlock even if this trace never did; the cycle is reported
+    with the process and time that first established each step. The order
+    graph is kept topologically sorted incrementally (DynamicWaitForGraph),
+    and each distinct pair is validated only once: repeats are answered from
+    the `witness` map without touching the graph. A pair that closes a cycle
+    stays in the graph, so later cycles through it are reported too, each
+    with a short cycle through the pair that closed it.
+    """
+
+    def __init__(self):
+        self.order = DynamicWaitForGraph()
+        self.witness = {}       # (held, acquired) -> (pid, ts) that first took them in that order
+        self.held = {}          # pid -> {lock: count}, in acquisition order
+        self.inversions = []
+        self.events = 0
+        self.cached = 0
+
+    def apply(self, ts, op, pid, rid, count=1):
+        self.events += 1
+        if op == "request" or op == "acquire":
+            held = self.held.get(pid)
+            if held:
+                for lock in held:
+                    if lock != rid:
+                        pair = (lock, rid)
+                        if pair in self.witness:
+                            self.cached += 1
+                        else:
+                            self.add_pair(lock, rid, pid, ts)
+            if op == "acquire":
+                held = self.held.setdefault(pid, {})
+                held[rid] = held.get(rid, 0) + count
+        elif op == "release":
+            held = self.held.get(pid)
+            if held and rid in held:
+                held[rid] -= count
+                if held[rid] <= 0:
+                    del held[rid]
+        elif op == "exit":
+            self.held.pop(pid, None)
+
+    def feed(self, events):
+        for event in events:
+            self.apply(event.ts, event.op, event.pid, event.rid, event.count)
+        return self
+
+    def add_pair(self, held, acquired, pid, ts):
+        """Record held → acquired; returns the Inversion it completes, if any."""
+        self.witness[(held, acquired)] = (pid, ts)
+        cycle = self.order.add_wait(held, acquired)
+        if not cycle:
+            return None
+        steps = list(zip(cycle, cycle[1:] + cycle[:1]))
+        inversion = Inversion([(a, b, *self.witness[(a, b)]) for a, b in steps])
+        self.inversions.append(inversion)
+        metrics.count("lock_order_inversions")
+        return inversion
+
+    def report(self):
+        return LockOrderReport(self.inversions, len(self.order.successors), len(self.witness), self.events, self.cached)
+
+
+def _shard_pairs(path, shard, shards):
+    # One worker's processes of a binary trace, on interned ids; returns its pairs and counters
+    with BinaryTrace(path) as trace:
+        records = trace.records[trace.records["pid"] % shards == shard]
+        checker = LockOrderChecker()
+        for ts, op, pid, rid, count in records.tolist():
+            checker.apply(ts, OPS[op], pid, None if rid == NO_RESOURCE else rid, count)
+    return checker.witness, checker.events, checker.cached
+
+
+def check_sharded(path, workers):
+    """Check a binary trace with its processes sharded over `workers` processes.
+
+    Each worker reads only its processes' records from the memory-mapped
+    trace and collects their acquisition pairs. The pairs are merged, keeping
+    the earliest witness, and replayed in time order through one checker, so
+    the report matches a single pass over the whole trace (up to which pair
+    closes a cycle when several first appear at the same timestamp).
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(_shard_pairs, [path] * workers, range(workers), [workers] * workers))
+    with BinaryTrace(path) as trace:
+        strings = trace.strings
+    witness = {}
+    events = cached = 0
+    for pairs, shard_events, shard_cached in shards:
+        events += shard_events
+        cached += shard_cached
+        for pair, (pid, ts) in pairs.items():
+            first = witness.get(pair)
+            if first is not None:
+                cached += 1     # another shard saw this pair too; a single pass would have hit the cache
+            if first is None or ts < first[1]:
+                witness[pair] = (pid, ts)
+    checker = LockOrderChecker()
+    with metrics.phase("lock_order_merge"):
+        for (held, acquired), (pid, ts) in sorted(witness.items(), key=lambda item: item[1][1]):
+            checker.add_pair(strings[held], strings[acquired], strings[pid], ts)
+    report = checker.report()
+    report.events, report.cached = events, cached + checker.cached
+    return report
+
+
+def is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def check_trace(path, workers=1):
+    """Lock-order report for a JSONL/CSV or binary trace; binary traces can be sharded."""
+    if workers > 1 and is_binary(path):
+        return check_sharded(path, workers)
+    if is_binary(path):
+        with BinaryTrace(path) as trace:
+            return LockOrderChecker().feed(trace.events()).report()
+    return LockOrderChecker().feed(read_events(path)).report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find lock-order inversions (potential deadlocks) in a lock trace.")
+    parser.add_argument("trace", help="JSONL/CSV trace or binary trace from binary_trace.py")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="shard processes over N workers (binary traces only)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = check_trace(args.trace, args.workers)
+    if args.json:
+        print(json.dumps(report.to_dict()))
+        return
+    print(f"{report.events} events, {report.locks} locks, {report.pairs} ordered pairs "
+          f"({report.cached} repeats served from the cache), {len(report.inversions)} inversions")
+    for inversion in report.inversions:
+        print(f"  {inversion}")
+
+
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    main()
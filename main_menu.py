@@ -1,72 +1,133 @@
+import importlib
 import tkinter as tk
-import subprocess
-
-# Module launch functions
-def open_bankers():
-    subprocess.Popen(["python", "BankersAlgorithm.py"])
-
-def open_rag():
-    subprocess.Popen(["python", "module3_rag_cycle.py"])
-
-def open_wait_for_graph():
-    subprocess.Popen(["python", "waitforgraphs.py"])
-
-def open_deadlock_resolver():
-    subprocess.Popen(["python", "deadlock_resolver.py"])
-
-# Create main window
-root = tk.Tk()
-root.title("🧠 OS Algorithm Visualizer")
-root.attributes('-fullscreen', True)
-root.configure(bg="#f8f9fa")
-
-# Exit fullscreen on Escape
-root.bind("<Escape>", lambda e: root.attributes('-fullscreen', False))
-
-# Title label
-tk.Label(
-    root,
-    text="🧠 OS Algorithms Visualizer Hub",
-    font=("Helvetica", 32, "bold"),
-    bg="#f8f9fa",
-    fg="#2c3e50"
-).pack(pady=50)
-
-# Button container
-btn_frame = tk.Frame(root, bg="#f8f9fa")
-btn_frame.pack(pady=20)
-
-# Utility to create buttons
-def create_button(text, command, bg):
-    return tk.Button(
-        btn_frame,
-        text=text,
-        command=command,
-        font=("Arial", 16, "bold"),
-        width=35,
-        height=2,
-        bg=bg,
-        fg="white",
-        activebackground="#2c3e50",
-        activeforeground="white",
-        bd=0,
-        relief="raised",
-        cursor="hand2"
-    )
-
-# Add styled buttons
-create_button("💡 Banker's Algorithm Visualizer", open_bankers, "#4CAF50").pack(pady=15)
-create_button("🧮 RAG Deadlock Detector", open_rag, "#2196F3").pack(pady=15)
-create_button("🔗 Wait-For Graph Visualizer", open_wait_for_graph, "#9C27B0").pack(pady=15)
-create_button("🛡️ Deadlock Resolver & Timeline", open_deadlock_resolver, "#FF7043").pack(pady=15)
-
-# Footer
-tk.Label(
-    root,
-    text="Press ESC to exit fullscreen | Made by Varshitha © 2025",
-    font=("Arial", 11),
-    bg="#f8f9fa",
-    fg="#7f8c8d"
-).pack(side="bottom", pady=20)
-
-root.mainloop()
+from tkinter import filedialog, messagebox
+
+import metrics
+
+# Tool key -> (button text, module, app class, window size, button colour).
+# Modules are imported the first time their tool is opened, so the hub itself
+# starts without NumPy or matplotlib.
+TOOLS = {
+    "bankers": ("💡 Banker's Algorithm Visualizer", "BankersAlgorithm", "ProMaxBankersVisualizerScrollable",
+                "1300x900", "#4CAF50"),
+    "rag": ("🧮 RAG Deadlock Detector", "module3_rag_cycle", "ResourceAllocationGraphApp", "1300x900", "#2196F3"),
+    "wait_for": ("🔗 Wait-For Graph Visualizer", "waitforgraphs", "WaitForGraphVisualizer", "1500x900", "#9C27B0"),
+    "resolver": ("🛡️ Deadlock Resolver & Timeline", "deadlock_resolver", "DeadlockResolverApp", "1100x650", "#FF7043"),
+}
+
+
+class Hub:
+    """Hosts every tool as a Toplevel window inside one Tk process.
+
+    A tool window is created on first use and reused afterwards. A scenario
+    loaded through the hub is handed to every open tool that has a
+    `load_scenario` method, and to tools opened later.
+    """
+
+    def __init__(self, root, fullscreen=True):
+        self.root = root
+        self.windows = {}   # tool key -> (Toplevel, app)
+        self.scenario = None
+
+        root.title("🧠 OS Algorithm Visualizer")
+        root.attributes('-fullscreen', fullscreen)
+        root.configure(bg="#f8f9fa")
+
+        # Exit fullscreen on Escape
+        root.bind("<Escape>", lambda e: root.attributes('-fullscreen', False))
+
+        # Title label
+        tk.Label(
+            root,
+            text="🧠 OS Algorithms Visualizer Hub",
+            font=("Helvetica", 32, "bold"),
+            bg="#f8f9fa",
+            fg="#2c3e50"
+        ).pack(pady=50)
+
+        # Button container
+        self.btn_frame = tk.Frame(root, bg="#f8f9fa")
+        self.btn_frame.pack(pady=20)
+
+        for tool, (text, _, _, _, bg) in TOOLS.items():
+            self.create_button(text, lambda t=tool: self.open_tool(t), bg).pack(pady=15)
+        self.create_button("📂 Load Scenario (JSON / CSV / NPZ)", self.load_scenario, "#607D8B").pack(pady=15)
+
+        self.scenario_label = tk.Label(root, text="No scenario loaded", font=("Arial", 12), bg="#f8f9fa", fg="#2c3e50")
+        self.scenario_label.pack()
+
+        # Footer
+        tk.Label(
+            root,
+            text="Press ESC to exit fullscreen | Made by Varshitha © 2025",
+            font=("Arial", 11),
+            bg="#f8f9fa",
+            fg="#7f8c8d"
+        ).pack(side="bottom", pady=20)
+
+    # Utility to create buttons
+    def create_button(self, text, command, bg):
+        return tk.Button(
+            self.btn_frame,
+            text=text,
+            command=command,
+            font=("Arial", 16, "bold"),
+            width=35,
+            height=2,
+            bg=bg,
+            fg="white",
+            activebackground="#2c3e50",
+            activeforeground="white",
+            bd=0,
+            relief="raised",
+            cursor="hand2"
+        )
+
+    def open_tool(self, tool):
+        # Raises the tool's window, creating it (and importing its module) on first use
+        if tool in self.windows:
+            window, app = self.windows[tool]
+            window.deiconify()
+            window.lift()
+            return window, app
+        _, module, class_name, geometry, _ = TOOLS[tool]
+        app_class = getattr(importlib.import_module(module), class_name)
+        window = tk.Toplevel(self.root)
+        window.geometry(geometry)
+        window.protocol("WM_DELETE_WINDOW", lambda: self.close_tool(tool))
+        app = app_class(window)
+        self.windows[tool] = (window, app)
+        if self.scenario is not None:
+            self.share(app)
+        return window, app
+
+    def close_tool(self, tool):
+        window, _ = self.windows.pop(tool)
+        window.destroy()
+
+    def load_scenario(self, path=None):
+        path = path or filedialog.askopenfilename(
+            title="Load scenario",
+            filetypes=[("Scenario files", "*.json *.csv *.npz"), ("All files", "*.*")])
+        if not path:
+            return
+        from scenario_check import first_scenario
+        try:
+            self.scenario = first_scenario(path)
+        except Exception as e:
+            messagebox.showerror("Scenario Error", f"Could not load {path}: {e}")
+            return
+        self.scenario_label.config(text=f"Scenario: {self.scenario.get('name', path)}")
+        for _, app in self.windows.values():
+            self.share(app)
+
+    def share(self, app):
+        if hasattr(app, "load_scenario"):
+            app.load_scenario(self.scenario)
+
+
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    root = tk.Tk()
+    hub = Hub(root)
+    root.mainloop()
@@ -0,0 +1,232 @@
+import os
+
+import numpy as np
+
+import metrics
+from cycle_detection import deadlocked_components
+
+MATRICES = ("allocation", "maximum", "request")
+KEYS = MATRICES + ("available",)
+DTYPE = np.int32
+
+
+def _as_array(values, name, ndim):
+    array = np.array(values, dtype=np.int64, ndmin=ndim)
+    if array.ndim != ndim:
+        raise ValueError(f"{name} must be {ndim}-dimensional, got shape {array.shape}.")
+    if array.size and array.min() < 0:
+        raise ValueError(f"{name} must not contain negative values.")
+    if array.size and array.max() > np.iinfo(DTYPE).max:
+        raise ValueError(f"{name} has values too large for {np.dtype(DTYPE).name}.")
+    return array.astype(DTYPE)
+
+
+def matrix_key(path):
+    # "allocation.npy", "run1_maximum.csv" -> the matrix the file holds, else None
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    return next((key for key in KEYS if stem.endswith(key)), None)
+
+
+def load_matrix(path):
+    """One matrix (or the available vector) from an NPY file or a plain numeric CSV."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return np.load(path, allow_pickle=False)
+    if ext == ".csv":
+        return np.loadtxt(path, delimiter=",", dtype=np.int64, ndmin=2)
+    raise ValueError(f"Unsupported matrix file '{path}'")
+
+
+class MatrixState:
+    """Allocation, maximum, request and available as compact NumPy arrays.
+
+    Matrices are (processes, resources) int32 arrays and `available` a
+    (resources,) vector; a matrix the source does not provide is None. The
+    GUIs keep their inputs here instead of in one Entry widget per cell.
+    """
+
+    def __init__(self, allocation=None, maximum=None, request=None, available=None):
+        self.allocation = None if allocation is None else _as_array(allocation, "allocation", 2)
+        self.maximum = None if maximum is None else _as_array(maximum, "maximum", 2)
+        self.request = None if request is None else _as_array(request, "request", 2)
+        self.available = None if available is None else _as_array(available, "available", 1).ravel()
+
+        shapes = {key: getattr(self, key).shape for key in MATRICES if getattr(self, key) is not None}
+        if len(set(shapes.values())) > 1:
+            raise ValueError(f"Matrix shapes differ: {shapes}")
+        if shapes:
+            self.num_processes, self.num_resources = next(iter(shapes.values()))
+        else:
+            self.num_processes, self.num_resources = 0, 0 if self.available is None else len(self.available)
+        if self.available is not None and len(self.available) != self.num_resources:
+            raise ValueError(f"Available must list exactly {self.num_resources} resource values.")
+
+    @classmethod
+    def empty(cls, processes, resources, keys=KEYS):
+        # All-zero matrices for the keys a tool edits
+        return cls(**{key: np.zeros((processes, resources) if key in MATRICES else resources, dtype=DTYPE)
+                      for key in keys})
+
+    @classmethod
+    def from_scenario(cls, scenario):
+        """The matrices of a scenario dict; NPZ stacks contribute their first scenario."""
+        if "stack" in scenario:
+            from scenario_check import unstack
+            scenario = unstack(scenario["stack"], 0)
+        return cls(**{key: scenario[key] for key in KEYS if key in scenario})
+
+    @classmethod
+    def load(cls, *paths):
+        """Load from one scenario file or from one file per matrix.
+
+        A file whose name ends in allocation, maximum, request or available
+        (e.g. `maximum.npy`, `run1_request.csv`) holds just that matrix, as
+        NPY or plain comma-separated integers. Any other file is a scenario
+        file as read by scenario_check (JSON, sectioned CSV, NPZ).
+        """
+        with metrics.phase("load"):
+            keys = [matrix_key(path) for path in paths]
+            if len(paths) == 1 and keys[0] is None:
+                from scenario_check import load_scenarios
+                return cls.from_scenario(load_scenarios(paths[0])[0])
+            if None in keys:
+                raise ValueError("Per-matrix files must be named after their matrix, e.g. allocation.npy.")
+            return cls(**{key: load_matrix(path) for key, path in zip(keys, paths)})
+
+    def save(self, path):
+        np.savez_compressed(path, **self.to_scenario())
+
+    def to_scenario(self):
+        return {key: getattr(self, key) for key in KEYS if getattr(self, key) is not None}
+
+    def to_lists(self):
+        return {key: value.tolist() for key, value in self.to_scenario().items()}
+
+    @property
+    def need(self):
+        return self.maximum - self.allocation
+
+    @property
+    def nbytes(self):
+        return sum(value.nbytes for value in self.to_scenario().values())
+
+
+class BitMatrix:
+    """A 0/1 matrix packed eight cells to a byte along each row."""
+
+    def __init__(self, rows, cols, bits=None):
+        self.rows = rows
+        self.cols = cols
+        self.bits = np.zeros((rows, (cols + 7) // 8), dtype=np.uint8) if bits is None else bits
+
+    @classmethod
+    def from_dense(cls, matrix):
+        matrix = np.asarray(matrix) != 0
+        return cls(matrix.shape[0], matrix.shape[1], np.packbits(matrix, axis=1))
+
+    def __getitem__(self, cell):
+        i, j = cell
+        return bool(self.bits[i, j >> 3] & (0x80 >> (j & 7)))
+
+    def __setitem__(self, cell, value):
+        i, j = cell
+        if value:
+            self.bits[i, j >> 3] |= 0x80 >> (j & 7)
+        else:
+            self.bits[i, j >> 3] &= ~np.uint8(0x80 >> (j & 7))
+
+    def row(self, i):
+        return np.flatnonzero(np.unpackbits(self.bits[i], count=self.cols))
+
+    def nonzero(self):
+        # (rows, cols) of the set bits; only non-zero bytes are unpacked
+        rows, chunks = np.nonzero(self.bits)
+        k, bit = np.nonzero(np.unpackbits(self.bits[rows, chunks][:, None], axis=1))
+        return rows[k], chunks[k] * 8 + bit
+
+    def to_dense(self):
+        return np.unpackbits(self.bits, axis=1, count=self.cols)
+
+    def transpose(self):
+        return BitMatrix.from_dense(self.to_dense().T)
+
+    def count(self):
+        return int(np.unpackbits(self.bits).sum())
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class RagBits:
+    """Single-instance RAG held as two packed bitsets.
+
+    `request` has a bit per process -> resource request edge and
+    `assignment` a bit per resource -> process assignment edge, one bit per
+    cell instead of an int or a widget.
+    """
+
+    def __init__(self, request, assignment):
+        self.request = request if isinstance(request, BitMatrix) else BitMatrix.from_dense(request)
+        self.assignment = assignment if isinstance(assignment, BitMatrix) else BitMatrix.from_dense(assignment)
+        if (self.request.rows, self.request.cols) != (self.assignment.cols, self.assignment.rows):
+            raise ValueError("Request must be processes x resources and assignment resources x processes.")
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.request, state.allocation.T)
+
+    def trim(self):
+        """Processes and resources left after repeatedly peeling off sinks.
+
+        A node without an edge to a surviving node can be on no cycle. Each
+        node keeps a count of its outgoing edges; peeling a sink decrements
+        the counts of the nodes pointing at it, and a count reaching zero
+        makes another sink, so the whole peel is linear in the edges. What
+        survives can reach a cycle and is all the SCC search has to look at.
+        """
+        n, m = self.request.rows, self.request.cols
+        # Nodes are numbered processes first, then resources
+        p_src, r_dst = self.request.nonzero()
+        r_src, p_dst = self.assignment.nonzero()
+        src = np.concatenate([p_src, r_src + n])
+        dst = np.concatenate([r_dst + n, p_dst])
+        out = np.bincount(src, minlength=n + m).tolist()
+        by_dst = np.argsort(dst, kind="stable")
+        starts = np.searchsorted(dst[by_dst], np.arange(n + m + 1)).tolist()
+        sources = src[by_dst].tolist()
+
+        live = np.ones(n + m, dtype=bool)
+        sinks = [v for v, degree in enumerate(out) if not degree]
+        while sinks:
+            v = sinks.pop()
+            live[v] = False
+            for u in sources[starts[v]:starts[v + 1]]:
+                out[u] -= 1
+                if not out[u]:
+                    sinks.append(u)
+        return live[:n], live[n:]
+
+    def graph(self, processes=None, resources=None, nodes=None):
+        """Adjacency lists keyed "P{i}"/"R{j}"; `nodes` limits it to (process, resource) masks."""
+        keep_p, keep_r = nodes if nodes is not None else (None, None)
+        processes = processes or [f"P{i}" for i in range(self.request.rows)]
+        resources = resources or [f"R{j}" for j in range(self.request.cols)]
+        graph = {}
+        for names, targets, bits, keep, keep_target in ((processes, resources, self.request, keep_p, keep_r),
+                                                        (resources, processes, self.assignment, keep_r, keep_p)):
+            for i, name in enumerate(names):
+                if keep is not None and not keep[i]:
+                    continue
+                graph[name] = [targets[j] for j in bits.row(i) if keep_target is None or keep_target[j]]
+        return graph
+
+    def deadlocked_components(self, processes=None, resources=None):
+        with metrics.phase("bitset_trim"):
+            nodes = self.trim()
+        metrics.count("trimmed_nodes", int((~nodes[0]).sum() + (~nodes[1]).sum()))
+        return deadlocked_components(self.graph(processes, resources, nodes))
+
+    @property
+    def nbytes(self):
+        return self.request.nbytes + self.assignment.nbytes
@@ -0,0 +1,183 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_active = None
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+
+class Recorder:
+    """Phase timers and counters for one run of the detectors.
+
+    Detectors report into whichever recorder is active (see `recording`);
+    when none is, `phase` and `count` cost one global lookup each. Counters
+    that hot loops would have to bump per step are derived once at the end
+    of a call instead, so the loops themselves stay untouched.
+    """
+
+    def __init__(self, profile=False, trace_memory=False):
+        self.counters = {}
+        self.phases = {}    # name -> [calls, total seconds, max seconds]
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self.memory = None  # (peak bytes, top allocation lines) after a traced run
+
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = [0, 0.0, 0.0]
+        return _Phase(stats)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, snapshot):
+        # Fold in a snapshot from another process
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+        for name, p in snapshot["phases"].items():
+            stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += p["calls"]
+            stats[1] += p["seconds"]
+            stats[2] = max(stats[2], p["max_seconds"])
+
+    def snapshot(self):
+        snap = {"counters": dict(self.counters),
+                "phases": {name: {"calls": c, "seconds": s, "max_seconds": m}
+                           for name, (c, s, m) in self.phases.items()}}
+        if self.memory is not None:
+            snap["memory"] = {"peak_bytes": self.memory[0], "top": self.memory[1]}
+        return snap
+
+    def to_prometheus(self, prefix="deadlock"):
+        lines = []
+
+        def family(name, kind, samples):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+
+        if self.phases:
+            items = sorted(self.phases.items())
+            family("phase_calls_total", "counter", [(f'{{phase="{n}"}}', c) for n, (c, _, _) in items])
+            family("phase_seconds_total", "counter", [(f'{{phase="{n}"}}', f"{s:.9f}") for n, (_, s, _) in items])
+            family("phase_seconds_max", "gauge", [(f'{{phase="{n}"}}', f"{m:.9f}") for n, (_, _, m) in items])
+        for name, value in sorted(self.counters.items()):
+            family(re.sub(r"[^a-zA-Z0-9_]", "_", name) + "_total", "counter", [("", value)])
+        if self.memory is not None:
+            family("memory_peak_bytes", "gauge", [("", self.memory[0])])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="deadlock"):
+        # Written under a temporary name and renamed, as textfile collectors expect
+        _write_atomic(path, self.to_prometheus(prefix))
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.snapshot(), indent=1))
+
+    def profile_report(self, limit=30, sort="cumulative"):
+        if self.profiler is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def start(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+        if self.trace_memory:
+            tracemalloc.start()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            self.memory = (tracemalloc.get_traced_memory()[1], [str(stat) for stat in top])
+            tracemalloc.stop()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def active():
+    return _active
+
+
+def phase(name):
+    """Time a block under `name` if a recorder is active; a no-op otherwise."""
+    return _NULL_PHASE if _active is None else _active.phase(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+@contextmanager
+def recording(recorder=None, profile=False, trace_memory=False):
+    """Make a recorder active for the duration of the block."""
+    global _active
+    recorder = recorder or Recorder(profile, trace_memory)
+    previous, _active = _active, recorder
+    recorder.start()
+    try:
+        yield recorder
+    finally:
+        recorder.stop()
+        _active = previous
+
+
+def enable_from_env():
+    """Record the whole process when DEADLOCK_METRICS names an output directory.
+
+    metrics.prom and metrics.json are written there at exit; DEADLOCK_PROFILE=1
+    and DEADLOCK_TRACEMALLOC=1 add a cProfile report and allocation peaks.
+    """
+    global _active
+    directory = os.environ.get("DEADLOCK_METRICS")
+    if not directory or _active is not None:
+        return None
+    recorder = Recorder(os.environ.get("DEADLOCK_PROFILE") == "1", os.environ.get("DEADLOCK_TRACEMALLOC") == "1")
+    _active = recorder
+    recorder.start()
+
+    def export():
+        recorder.stop()
+        os.makedirs(directory, exist_ok=True)
+        recorder.write_prometheus(os.path.join(directory, "metrics.prom"))
+        recorder.write_json(os.path.join(directory, "metrics.json"))
+        if recorder.profiler is not None:
+            with open(os.path.join(directory, "profile.txt"), "w", encoding="utf-8") as f:
+                f.write(recorder.profile_report())
+
+    atexit.register(export)
+    return recorder
@@ -1,6 +1,20 @@
 import tkinter as tk
-from tkinter import messagebox
-import threading
+from tkinter import filedialog, messagebox
+
+import numpy as np
+
+import metrics
+from animation import StepPlayer
+from cycle_detection import cycle_in_component
+from graph_canvas import GraphRenderer
+from graph_layout import LayoutCache, fit
+from graph_reduction import detect_deadlock
+from grid_editor import GridEditor
+from matrix_state import MatrixState, RagBits
+
+# Above this many matrix cells the inputs switch to paged grid editors
+ENTRY_LIMIT = 2000
+RAG_KEYS = ("allocation", "request", "available")
 
 class ScrollableFrame(tk.Frame):
     def __init__(self, master):
@@ -32,6 +46,13 @@ class ResourceAllocationGraphApp:
         self.num_resources = 0
         self.process_request_entries = []
         self.resource_allocation_entries = []
+        self.available_entries = []
+        self.editors = []
+        self.matrix_widgets = []
+        self.state = None
+        self.detection_mode = tk.StringVar(value="cycle")
+        self.player = None
+        self.layouts = LayoutCache()
 
         self.setup_ui()
 
@@ -48,8 +69,14 @@ class ResourceAllocationGraphApp:
 
         tk.Button(frame, text="Create Inputs", command=self.create_inputs, bg="#4CAF50", fg="white").grid(row=0, column=4)
 
+        tk.Radiobutton(frame, text="Single-instance (cycle)", variable=self.detection_mode, value="cycle").grid(row=0, column=5)
+        tk.Radiobutton(frame, text="Multi-instance (reduction)", variable=self.detection_mode, value="reduction").grid(row=0, column=6)
+        tk.Button(frame, text="⏭ Jump to Result", command=self.jump_to_result).grid(row=0, column=7)
+        tk.Button(frame, text="📂 Import", command=self.import_matrices).grid(row=0, column=8)
+
         self.canvas = tk.Canvas(frame, width=1200, height=600, bg="white", highlightthickness=2, highlightbackground="black")
         self.canvas.grid(row=1, column=0, columnspan=10, pady=20)
+        self.renderer = GraphRenderer(self.canvas)
 
         self.status_text = tk.Text(frame, height=10, width=150, font=("Consolas", 10))
         self.status_text.grid(row=2, column=0, columnspan=10, pady=10)
@@ -57,7 +84,7 @@ class ResourceAllocationGraphApp:
         self.result_label = tk.Label(frame, text="", font=("Arial", 16, "bold"))
         self.result_label.grid(row=3, column=0, columnspan=10, pady=10)
 
-    def create_inputs(self):
+    def create_inputs(self, state=None):
         frame = self.scroll_frame.scrollable_frame
         try:
             self.num_processes = int(self.proc_entry.get())
@@ -69,110 +96,249 @@ class ResourceAllocationGraphApp:
         for widget in frame.winfo_children():
             if isinstance(widget, tk.Entry) or isinstance(widget, tk.Button):
                 widget.destroy()
+        for widget in self.matrix_widgets:
+            widget.destroy()
+        self.matrix_widgets = []
 
         self.setup_ui()
-
-        tk.Label(frame, text="Process ➔ Resource (Request)", font=("Arial", 10, "bold")).grid(row=4, column=0, columnspan=5)
         self.process_request_entries = []
+        self.resource_allocation_entries = []
+        self.available_entries = []
+        self.editors = []
+        self.state = state or MatrixState.empty(self.num_processes, self.num_resources, RAG_KEYS)
+
+        def place(widget, row, column, **grid):
+            widget.grid(row=row, column=column, **grid)
+            self.matrix_widgets.append(widget)
+            return widget
+
+        place(tk.Label(frame, text="Process ➔ Resource (Request)", font=("Arial", 10, "bold")), 4, 0, columnspan=5)
+        if self.num_processes * self.num_resources > ENTRY_LIMIT:
+            # Only the visible window of cells gets widgets; the assignment editor
+            # works on a transposed view, so its edits land in state.allocation
+            self.editors = [place(GridEditor(frame, self.state.request), 5, 0, columnspan=5, sticky="nw")]
+            place(tk.Label(frame, text="Resource ➔ Process (Allocation)", font=("Arial", 10, "bold")), 4, 6, columnspan=5)
+            self.editors.append(place(GridEditor(frame, self.state.allocation.T, row_prefix="R", col_prefix="P"),
+                                      5, 6, columnspan=5, sticky="nw"))
+            place(tk.Label(frame, text="Available Instances (multi-instance mode)", font=("Arial", 10, "bold")),
+                  6, 0, columnspan=5)
+            self.editors.append(place(GridEditor(frame, self.state.available), 7, 0, columnspan=10, sticky="nw"))
+            place(tk.Button(frame, text="Detect Deadlock", command=self.start_visualization, bg="#2196F3", fg="white"),
+                  8, 0, columnspan=5)
+            return
+
+        # Zero cells stay blank, as in a freshly created input grid
+        values = self.state.to_lists()
         for i in range(self.num_processes):
             row = []
             for j in range(self.num_resources):
                 e = tk.Entry(frame, width=4)
                 e.grid(row=5+i, column=j)
+                if values["request"][i][j]:
+                    e.insert(0, str(values["request"][i][j]))
                 row.append(e)
             self.process_request_entries.append(row)
 
-        tk.Label(frame, text="Resource ➔ Process (Allocation)", font=("Arial", 10, "bold")).grid(row=4, column=6, columnspan=5)
-        self.resource_allocation_entries = []
+        place(tk.Label(frame, text="Resource ➔ Process (Allocation)", font=("Arial", 10, "bold")), 4, 6, columnspan=5)
         for i in range(self.num_resources):
             row = []
             for j in range(self.num_processes):
                 e = tk.Entry(frame, width=4)
                 e.grid(row=5+self.num_processes+i, column=j)
+                if values["allocation"][j][i]:
+                    e.insert(0, str(values["allocation"][j][i]))
                 row.append(e)
             self.resource_allocation_entries.append(row)
 
-        tk.Button(frame, text="Detect Deadlock", command=self.start_visualization, bg="#2196F3", fg="white").grid(row=6+self.num_processes+self.num_resources, column=0, columnspan=5)
+        place(tk.Label(frame, text="Available Instances (multi-instance mode)", font=("Arial", 10, "bold")),
+              5+self.num_processes+self.num_resources, 0, columnspan=5)
+        for j in range(self.num_resources):
+            e = tk.Entry(frame, width=4)
+            e.grid(row=6+self.num_processes+self.num_resources, column=j)
+            if values["available"][j]:
+                e.insert(0, str(values["available"][j]))
+            self.available_entries.append(e)
+
+        tk.Button(frame, text="Detect Deadlock", command=self.start_visualization, bg="#2196F3", fg="white").grid(row=7+self.num_processes+self.num_resources, column=0, columnspan=5)
+
+    def show_state(self, state):
+        # Sizes the inputs to a loaded MatrixState and fills them from it
+        for entry, value in ((self.proc_entry, state.num_processes), (self.res_entry, state.num_resources)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.detection_mode.set("reduction" if state.available is not None else "cycle")
+        if state.available is None:
+            state = MatrixState(state.allocation, request=state.request,
+                                available=np.zeros(state.num_resources, dtype=state.allocation.dtype))
+        self.create_inputs(state)
+
+    def load_scenario(self, scenario):
+        # Fills the inputs from a scenario shared by the hub; available counts switch to reduction mode
+        if not scenario.get("allocation") or not scenario.get("request"):
+            return
+        self.show_state(MatrixState.from_scenario({k: scenario[k] for k in RAG_KEYS if k in scenario}))
+
+    def import_matrices(self):
+        # One scenario file, or allocation/request(/available) as separate NPY or CSV files
+        paths = filedialog.askopenfilenames(
+            title="Import matrices",
+            filetypes=[("Matrix files", "*.npy *.npz *.csv *.json"), ("All files", "*.*")])
+        if not paths:
+            return
+        try:
+            state = MatrixState.load(*paths)
+            missing = [k for k in ("allocation", "request") if getattr(state, k) is None]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+        except Exception as e:
+            messagebox.showerror("Import Error", f"Could not import matrices: {e}")
+            return
+        self.show_state(state)
+
+    def read_state(self, mode):
+        # The inputs as a MatrixState; paged editors already write into self.state
+        if self.editors:
+            if not all([editor.commit() for editor in self.editors]):
+                raise ValueError("invalid cell")
+            return self.state
+        n, m = self.num_processes, self.num_resources
+        request = [[self.read_cell(e, mode) for e in row] for row in self.process_request_entries]
+        held = [[self.read_cell(e, mode) for e in row] for row in self.resource_allocation_entries]
+        available = [self.read_cell(e, mode) for e in self.available_entries] if mode == "reduction" else None
+        return MatrixState(np.array(held, dtype=np.int64).reshape(m, n).T,
+                           request=np.array(request, dtype=np.int64).reshape(n, m), available=available)
 
     def start_visualization(self):
-        threading.Thread(target=self.visualize).start()
-
-    def visualize(self):
+        steps = self.visualize()
+        if steps is None:
+            return
+        if self.player is not None:
+            self.player.stop()
         self.status_text.delete("1.0", tk.END)
-        self.canvas.delete("all")
+        # Items of the new graph are upserted as the steps play; only vanished ones go
+        self.renderer.retain({step[1] for step in steps if step[0] == "node"},
+                             {(step[1], step[2]) for step in steps if step[0] == "edge"})
+        self.result_label.config(text="")
+        # Drawn in batches on the main loop so large graphs don't freeze the window
+        self.player = StepPlayer(self.master, steps, self.apply_step, delay_ms=0)
+        self.player.play()
+
+    def jump_to_result(self):
+        if self.player is not None:
+            self.player.finish()
+
+    def apply_step(self, step):
+        kind = step[0]
+        if kind == "world":
+            self.renderer.set_world(step[1], step[2])
+        elif kind == "node":
+            _, node, x, y, highlighted = step
+            if "P" in node:
+                self.renderer.add_node(node, x, y, "oval", "#FFD54F", highlighted)
+            else:
+                self.renderer.add_node(node, x, y, "rectangle", "#90CAF9", highlighted)
+        elif kind == "edge":
+            _, src, dest, x1, y1, x2, y2, in_cycle, count = step
+            self.renderer.add_edge((src, dest), x1, y1, x2, y2, in_cycle, str(count) if count > 1 else None)
+        elif kind == "status":
+            self.status_text.insert(tk.END, step[1])
+        else:
+            _, text, color = step
+            self.result_label.config(text=text, fg=color)
 
+    def visualize(self):
+        # Parses the inputs and runs detection up front; returns the drawing steps
+        mode = self.detection_mode.get()
         nodes = [f"P{i}" for i in range(self.num_processes)] + [f"R{j}" for j in range(self.num_resources)]
-        graph = {node: [] for node in nodes}
 
         try:
-            for i in range(self.num_processes):
-                for j in range(self.num_resources):
-                    if self.process_request_entries[i][j].get().strip() == "1":
-                        graph[f"P{i}"].append(f"R{j}")
-            for i in range(self.num_resources):
-                for j in range(self.num_processes):
-                    if self.resource_allocation_entries[i][j].get().strip() == "1":
-                        graph[f"R{i}"].append(f"P{j}")
-        except:
-            messagebox.showerror("Invalid Input", "Fill only 0 or 1.")
-            return
-
-        pos = {}
-        spacing_y = 120
+            with metrics.phase("parse"):
+                state = self.read_state(mode)
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Fill only non-negative instance counts.")
+            return None
 
-        for idx, node in enumerate(nodes):
-            x = 150 if "P" in node else 600
-            y = 100 + idx * spacing_y // 2
-            pos[node] = (x, y)
-            if "P" in node:
-                self.canvas.create_oval(x-20, y-20, x+20, y+20, fill="#FFD54F")
-            else:
-                self.canvas.create_rectangle(x-20, y-20, x+20, y+20, fill="#90CAF9")
-            self.canvas.create_text(x, y, text=node)
+        counts = {}
+        if mode == "reduction":
+            with metrics.phase("build_graph"):
+                graph = {node: [] for node in nodes}
+                for src, dest, matrix in (("P", "R", state.request), ("R", "P", state.allocation.T)):
+                    rows, cols = np.nonzero(matrix)
+                    for i, j, count in zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist()):
+                        graph[f"{src}{i}"].append(f"{dest}{j}")
+                        counts[(f"{src}{i}", f"{dest}{j}")] = count
+            result = detect_deadlock(state.allocation, state.request, state.available)
+            # Deadlocked processes together with the resources they are stuck waiting for
+            stuck = {f"P{i}" for i in result.deadlocked}
+            stuck |= {dest for src in list(stuck) for dest in graph[src]}
+            deadlocked = [[node for node in nodes if node in stuck]] if result.has_deadlock else []
+        else:
+            # Single-instance edges are plain bits; only multi-instance mode needs counts
+            with metrics.phase("build_graph"):
+                bits = RagBits.from_state(state)
+                graph = bits.graph()
+            deadlocked = self.detect_deadlocks_bits(bits)
+        deadlocked_nodes = {node for component in deadlocked for node in component}
+        component_of = {node: k for k, component in enumerate(deadlocked) for node in component}
+
+        # Big graphs get a bigger world; the renderer zooms out and aggregates
+        side = max(1.0, len(nodes) ** 0.5 / 8)
+        width, height = 1200 * side, 600 * side
+        steps = [("world", width, height)]
+        # Layered left to right along the request/assignment edges; reused while the graph is unchanged
+        pos = fit(self.layouts.layout("rag", graph, method="layered"), width, height)
+
+        for node in nodes:
+            x, y = pos[node]
+            steps.append(("node", node, x, y, node in deadlocked_nodes))
 
         for src, dests in graph.items():
             for dest in dests:
-                x1, y1 = pos[src]
-                x2, y2 = pos[dest]
-                self.canvas.create_line(x1, y1, x2, y2, arrow=tk.LAST)
-
-        cycle = self.detect_cycle(graph)
-        if cycle:
-            self.result_label.config(text="❌ Deadlock Detected!\nCycle: " + " → ".join(cycle), fg="red")
+                in_cycle = src in component_of and component_of[src] == component_of.get(dest)
+                steps.append(("edge", src, dest, *pos[src], *pos[dest], in_cycle, counts.get((src, dest), 1)))
+
+        if mode == "reduction":
+            order = ", ".join(f"P{i}" for i in result.reduction_order) or "none"
+            steps.append(("status", f"🔍 Reduced (can finish): {order}\n"))
+            steps.append(("status", f"📦 Free instances after reduction: {result.work}\n"))
+            if result.has_deadlock:
+                stuck = ", ".join(f"P{i}" for i in result.deadlocked)
+                steps.append(("result", f"❌ Deadlock Detected!\nDeadlocked processes: {stuck}", "red"))
+            else:
+                steps.append(("result", "✅ No Deadlock. Safe System!", "green"))
+            return steps
+
+        if deadlocked:
+            lines = []
+            for component in deadlocked:
+                processes = [node for node in component if node.startswith("P")]
+                resources = [node for node in component if node.startswith("R")]
+                cycle = cycle_in_component(graph, component)
+                lines.append(f"Cycle: {' → '.join(cycle + [cycle[0]])}")
+                steps.append(("status", f"❌ Deadlocked set: processes {', '.join(processes)}; "
+                                        f"resources {', '.join(resources)}\n"))
+            steps.append(("result", "❌ Deadlock Detected!\n" + "\n".join(lines), "red"))
         else:
-            self.result_label.config(text="✅ No Deadlock. Safe System!", fg="green")
-
-    def detect_cycle(self, graph):
-        visited = set()
-        rec_stack = set()
-
-        def dfs(node, path):
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
-
-            for neighbor in graph[node]:
-                if neighbor not in visited:
-                    res = dfs(neighbor, path)
-                    if res:
-                        return res
-                elif neighbor in rec_stack:
-                    cycle_idx = path.index(neighbor)
-                    return path[cycle_idx:]
-
-            rec_stack.remove(node)
-            path.pop()
-            return None
-
-        for node in graph:
-            if node not in visited:
-                path = []
-                result = dfs(node, path)
-                if result:
-                    return result
-        return None
+            steps.append(("result", "✅ No Deadlock. Safe System!", "green"))
+        return steps
+
+    def read_cell(self, entry, mode):
+        text = entry.get().strip()
+        if mode == "cycle":
+            return 1 if text == "1" else 0
+        value = int(text) if text else 0
+        if value < 0:
+            raise ValueError(text)
+        return value
+
+    def detect_deadlocks_bits(self, bits):
+        # Every strongly connected component containing a cycle is a deadlocked set; on
+        # packed bitsets, nodes that cannot reach a cycle are peeled off first
+        return bits.deadlocked_components()
 
 # Run app
-root = tk.Tk()
-app = ResourceAllocationGraphApp(root)
-root.mainloop()
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    root = tk.Tk()
+    app = ResourceAllocationGraphApp(root)
+    root.mainloop()
@@ -0,0 +1,535 @@
+import argparse
+import bisect
+import heapq
+import json
+import random
+import time
+from collections import deque
+
+import metrics
+from banker_state import BankerState
+from cycle_detection import deadlocked_components
+from recovery import ProcessCost, plan_recovery
+
+ARRIVE, STEP_DONE, DETECT = 0, 1, 2
+
+
+class Job:
+    """One unit of work: acquire each step's units in turn, work, then release everything."""
+
+    __slots__ = ("pid", "ts", "arrival", "steps", "claim", "attempt", "k", "held", "waiting",
+                 "wait_start", "step_start", "done_work", "finished")
+
+    def __init__(self, pid, ts, arrival, steps, claim):
+        self.pid = pid
+        self.ts = ts                # age for wait-die / wound-wait, kept across restarts
+        self.arrival = arrival
+        self.steps = steps          # [(rid, count, work seconds)]
+        self.claim = claim          # maximum demand per resource, for the Banker's policy
+        self.attempt = 0
+        self.k = 0
+        self.held = {}
+        self.waiting = None         # (rid, count) while blocked
+        self.wait_start = 0.0
+        self.step_start = 0.0
+        self.done_work = 0.0
+        self.finished = None
+
+
+def make_workload(jobs, capacities, steps=3, interarrival=2.0, work=1.0, seed=0):
+    """Seeded jobs as (arrival, [(rid, count, work)]); the same seed gives the same workload.
+
+    Each job takes `steps` distinct resources in random order, asking for
+    between one unit and the whole capacity of each.
+    """
+    rng = random.Random(seed)
+    m = len(capacities)
+    clock = 0.0
+    workload = []
+    for _ in range(jobs):
+        clock += rng.expovariate(1 / interarrival)
+        chosen = rng.sample(range(m), min(steps, m))
+        workload.append((clock, [(r, rng.randint(1, capacities[r]), rng.expovariate(1 / work)) for r in chosen]))
+    return workload
+
+
+class Policy:
+    """Base policy: grant whatever fits and never intervene (deadlocks stay)."""
+
+    name = "none"
+    first_fit = False           # grant any waiter the units fit, not just the head of the queue
+    global_retry = False        # whether any release may unblock waiters of other resources
+    age_queues = False          # serve each queue oldest first instead of by arrival
+    timestamped = False         # conflicts settled by age (with age-ordered queues)
+    detect_interval = None
+
+    def prepare(self, sim):
+        self.sim = sim
+
+    def steps(self, steps):
+        return steps
+
+    def admit(self, job):
+        # False turns the job away before it takes anything
+        return True
+
+    def allow(self, job, rid, count):
+        # Called only when `count` units are free; False makes the job wait
+        return True
+
+    def conflict(self, job, holders):
+        # `job` waits on `holders`; returns the jobs to abort
+        return ()
+
+    def leave(self, job):
+        pass
+
+    def detect(self):
+        return ()
+
+
+class BankersPolicy(Policy):
+    """Deadlock avoidance: a request is granted only if the state stays safe.
+
+    Any release may make another queue's waiter safe, so every release asks
+    each waiter whose units fit once more, and a refusal costs a safety run
+    over all admitted jobs. Under heavy contention that dominates: 300 jobs
+    on three single-unit resources spend about 14 s of policy time in 1,200
+    events, against well under a second for the other policies.
+    """
+
+    name = "banker"
+    first_fit = True
+    global_retry = True
+
+    def prepare(self, sim):
+        super().prepare(sim)
+        self.state = BankerState(available=sim.capacities)
+        self.m = len(sim.capacities)
+
+    def admit(self, job):
+        # Refused only when the claim exceeds what the system has, so it could never finish
+        return self.state.add_process(job.pid, job.claim)
+
+    def allow(self, job, rid, count):
+        request = [0] * self.m
+        request[rid] = count
+        return self.state.request(job.pid, request)
+
+    def leave(self, job):
+        self.state.remove_process(job.pid)
+
+
+class OrderingPolicy(Policy):
+    """Deadlock prevention: every job takes its resources in one global order."""
+
+    name = "ordering"
+
+    def steps(self, steps):
+        return sorted(steps)
+
+
+class WaitDiePolicy(Policy):
+    """Non-preemptive timestamps: an older job waits, a younger one aborts itself."""
+
+    name = "wait_die"
+    age_queues = True
+    timestamped = True
+
+    def conflict(self, job, holders):
+        return (job,) if any(h.ts < job.ts for h in holders) else ()
+
+
+class WoundWaitPolicy(Policy):
+    """Preemptive timestamps: an older job aborts the younger holders, a younger one waits."""
+
+    name = "wound_wait"
+    age_queues = True
+    timestamped = True
+
+    def conflict(self, job, holders):
+        return [h for h in holders if h.ts > job.ts]
+
+
+class DetectRecoverPolicy(Policy):
+    """Detect and recover: never refuse, periodically find deadlocks and abort victims.
+
+    Every `interval` simulated seconds the queues are reduced; whoever is
+    left is deadlocked or queued behind a deadlock, and plan_recovery picks
+    the cheapest victims. A job's cost grows with its age, and queues serve
+    the oldest job first, so the oldest job in a deadlock is never the victim
+    and gets the units the victims free. Without that, the next job in an
+    arrival-order queue took them and deadlocked again, over and over. With
+    long intervals, jobs pile up behind each deadlock faster than they drain,
+    and throughput collapses.
+    """
+
+    name = "detect"
+    age_queues = True
+
+    def __init__(self, interval=0.25):
+        self.detect_interval = interval
+
+    def stuck(self):
+        # Reduction in queue order: a queue head whose units are free gets them,
+        # finishes and releases what it holds; whoever is left can never run
+        sim = self.sim
+        queues = [deque(queue) for queue in sim.waiters]
+        free = list(sim.capacities)
+        for queue in queues:
+            for job in queue:
+                for rid, count in job.held.items():
+                    free[rid] -= count
+        pending = [rid for rid, queue in enumerate(queues) if queue]
+        while pending:
+            rid = pending.pop()
+            queue = queues[rid]
+            while queue and queue[0].waiting[1] <= free[rid]:
+                for r, count in queue.popleft().held.items():
+                    free[r] += count
+                    pending.append(r)
+        return [job for queue in queues for job in queue]
+
+    def detect(self):
+        sim = self.sim
+        # Built in queue order (never set order), so runs are reproducible
+        graph = {job.pid: [] for job in self.stuck()}
+        if not graph:
+            return ()
+        # A waiter waits for the holders and, through the one ahead of it, the whole queue
+        for rid, queue in enumerate(sim.waiters):
+            holders = [h.pid for h in sim.holders[rid] if h.pid in graph]
+            previous = None
+            for job in queue:
+                if job.pid in graph:
+                    graph[job.pid].extend(holders)
+                    if previous is not None:
+                        graph[job.pid].append(previous)
+                    previous = job.pid
+        components = deadlocked_components(graph)
+        jobs = sim.jobs
+        for component in components:
+            sim.latencies.append(sim.now - max(jobs[p].wait_start for p in component))
+        # Older jobs cost more to abort; the arrival survives restarts, so a job
+        # that keeps losing grows more expensive to pick again
+        costs = {p: ProcessCost(1 + sim.now - jobs[p].arrival, jobs[p].k / len(jobs[p].steps),
+                                sum(jobs[p].held.values()))
+                 for c in components for p in c}
+        return [jobs[p] for p in plan_recovery(graph, costs).victims]
+
+
+POLICIES = {cls.name: cls for cls in (Policy, BankersPolicy, DetectRecoverPolicy, OrderingPolicy,
+                                      WaitDiePolicy, WoundWaitPolicy)}
+
+
+class PolicyResult:
+    def __init__(self, policy, jobs, completed, rejected, makespan, waits, responses, aborts, aborted_work,
+                 detections, latencies, policy_seconds, events, wall):
+        self.policy = policy
+        self.jobs = jobs
+        self.completed = completed
+        self.rejected = rejected            # jobs the policy refused to admit
+        self.makespan = makespan            # simulated time until the last event
+        self.waits = waits                  # simulated seconds each granted request waited
+        self.responses = responses          # simulated seconds from first arrival to completion
+        self.aborts = aborts
+        self.aborted_work = aborted_work    # simulated work seconds thrown away by aborts
+        self.detections = detections        # detector runs
+        self.latencies = latencies          # simulated seconds from a deadlock forming to its detection
+        self.policy_seconds = policy_seconds    # wall seconds spent in policy decisions and detection
+        self.events = events
+        self.wall = wall
+
+    @staticmethod
+    def _mean_p99(values):
+        if not values:
+            return 0.0, 0.0
+        ordered = sorted(values)
+        return sum(values) / len(values), ordered[min(len(values) - 1, int(len(values) * 0.99))]
+
+    def to_dict(self):
+        wait_mean, wait_p99 = self._mean_p99(self.waits)
+        response_mean, response_p99 = self._mean_p99(self.responses)
+        latency_mean, _ = self._mean_p99(self.latencies)
+        return {"policy": self.policy, "jobs": self.jobs, "completed": self.completed,
+                "rejected": self.rejected,
+                "unfinished": self.jobs - self.completed, "makespan": self.makespan,
+                "throughput": self.completed / self.makespan if self.makespan else 0.0,
+                "wait_mean": wait_mean, "wait_p99": wait_p99,
+                "response_mean": response_mean, "response_p99": response_p99,
+                "aborts": self.aborts, "aborted_work": self.aborted_work,
+                "detections": self.detections, "deadlocks": len(self.latencies),
+                "detection_latency_mean": latency_mean, "policy_seconds": self.policy_seconds,
+                "events": self.events, "wall_seconds": self.wall,
+                "events_per_second": self.events / self.wall if self.wall else 0.0}
+
+
+class Simulation:
+    """Heap-driven discrete-event simulation of jobs under one policy.
+
+    Time is simulated, so nothing sleeps: the run costs only the events it
+    processes. Jobs hold everything they acquire until they finish (or are
+    aborted, losing the work done so far and restarting after a random,
+    exponentially growing backoff with their original timestamp). Each
+    resource serves its queue in order, by arrival or by age under the
+    timestamp and detection policies; the Banker's policy instead grants any
+    waiter whose request is safe.
+    """
+
+    def __init__(self, capacities, workload, policy, restart_delay=1.0, seed=0, until=None):
+        self.capacities = list(capacities)
+        self.available = list(capacities)
+        self.holders = [dict() for _ in capacities]     # rid -> {job: count}
+        self.waiters = [[] for _ in capacities]         # rid -> blocked jobs, by arrival or by age
+        self.policy = policy
+        self.restart_delay = restart_delay
+        self.rng = random.Random(seed)
+        self.until = until
+        self.heap = []
+        self.seq = 0
+        self.now = 0.0
+        self.jobs = {}
+        self.active = 0
+        self.waits = []
+        self.responses = []
+        self.latencies = []
+        self.aborts = 0
+        self.rejected = 0
+        self.aborted_work = 0.0
+        self.detections = 0
+        self.policy_seconds = 0.0
+        self.refused = set()        # waiters a first-fit policy turned down since the last release
+        policy.prepare(self)
+        for i, (arrival, steps) in enumerate(workload):
+            claim = [0] * len(capacities)
+            for rid, count, _ in steps:
+                claim[rid] += count
+            job = Job(f"J{i}", i, arrival, policy.steps(steps), claim)
+            self.jobs[job.pid] = job
+            self._schedule(arrival, ARRIVE, job)
+
+    def _schedule(self, when, kind, job=None):
+        self.seq += 1
+        heapq.heappush(self.heap, (when, self.seq, kind, job, job.attempt if job else 0))
+
+    def _start(self, job):
+        tick = time.perf_counter()
+        admitted = self.policy.admit(job)
+        self.policy_seconds += time.perf_counter() - tick
+        if not admitted:
+            job.attempt = None
+            self.rejected += 1
+            return
+        job.k = 0
+        job.done_work = 0.0
+        self.active += 1
+        self._request(job)
+
+    def _allow(self, job, rid, count):
+        if count > self.available[rid]:
+            return False
+        tick = time.perf_counter()
+        allowed = self.policy.allow(job, rid, count)
+        self.policy_seconds += time.perf_counter() - tick
+        return allowed
+
+    def _request(self, job):
+        rid, count, _ = job.steps[job.k]
+        queue = self.waiters[rid]
+        policy = self.policy
+        # Units go to waiters in queue order, so a newcomer only takes them
+        # straight away if it would be first in the queue
+        if policy.first_fit or not queue:
+            first = True
+        elif policy.age_queues:
+            first = queue[0].ts > job.ts
+        else:
+            first = False
+        if first and self._allow(job, rid, count):
+            self.waits.append(0.0)
+            self._grant(job, rid, count)
+            return
+        job.waiting = (rid, count)
+        job.wait_start = self.now
+        if policy.age_queues:
+            bisect.insort(queue, job, key=lambda w: w.ts)
+            if policy.timestamped:
+                self._resolve(job, list(self.holders[rid]) + [w for w in queue if w.ts < job.ts])
+        else:
+            queue.append(job)
+
+    def _resolve(self, job, holders):
+        tick = time.perf_counter()
+        victims = self.policy.conflict(job, holders)
+        self.policy_seconds += time.perf_counter() - tick
+        for victim in victims:
+            if victim.attempt is not None:
+                self._abort(victim)
+
+    def _grant(self, job, rid, count):
+        self.available[rid] -= count
+        self.holders[rid][job] = self.holders[rid].get(job, 0) + count
+        job.held[rid] = job.held.get(rid, 0) + count
+        job.step_start = self.now
+        self._schedule(self.now + job.steps[job.k][2], STEP_DONE, job)
+        if self.policy.timestamped and self.waiters[rid]:
+            # An older newcomer went ahead of the queue; the waiters now wait on it too
+            for waiter in list(self.waiters[rid]):
+                if waiter.waiting is not None and job.held:
+                    self._resolve(waiter, [job])
+
+    def _step_done(self, job):
+        job.done_work += job.steps[job.k][2]
+        job.k += 1
+        if job.k < len(job.steps):
+            self._request(job)
+            return
+        self._leave(job)
+        job.finished = self.now
+        job.attempt = None
+        self.responses.append(self.now - job.arrival)
+
+    def _abort(self, job):
+        self.aborts += 1
+        lost = job.done_work
+        if job.waiting is not None:
+            self.waiters[job.waiting[0]].remove(job)
+            job.waiting = None
+        elif job.held:
+            lost += self.now - job.step_start
+        self.aborted_work += lost
+        self._leave(job)
+        job.attempt += 1
+        # Exponential backoff, so a job that keeps losing stops competing for a while
+        backoff = self.restart_delay * 2 ** min(job.attempt - 1, 6)
+        self._schedule(self.now + self.rng.expovariate(1 / backoff), ARRIVE, job)
+
+    def _leave(self, job):
+        # Releases everything the job holds and hands it to whoever can now proceed
+        freed = list(job.held)
+        for rid, count in job.held.items():
+            self.available[rid] += count
+            del self.holders[rid][job]
+        job.held = {}
+        self.active -= 1
+        self.refused.clear()
+        tick = time.perf_counter()
+        self.policy.leave(job)
+        self.policy_seconds += time.perf_counter() - tick
+        if self.policy.global_retry:
+            freed = [rid for rid, queue in enumerate(self.waiters) if queue]
+        for rid in freed:
+            self._wake(rid)
+
+    def _wake(self, rid):
+        # Granting can abort jobs (and so edit the queue), hence one grant per scan
+        queue = self.waiters[rid]
+        while queue and self.available[rid]:
+            if self.policy.first_fit:
+                # Grants only take units away, so whoever was refused stays refused
+                # until the next release; each waiter is asked at most once per release
+                for job in queue:
+                    if job not in self.refused:
+                        if self._allow(job, rid, job.waiting[1]):
+                            break
+                        self.refused.add(job)
+                else:
+                    return
+            else:
+                job = queue[0]
+                if not self._allow(job, rid, job.waiting[1]):
+                    return
+            queue.remove(job)
+            self.waits.append(self.now - job.wait_start)
+            rid, count = job.waiting
+            job.waiting = None
+            self._grant(job, rid, count)
+
+    def _detect(self):
+        self.detections += 1
+        tick = time.perf_counter()
+        victims = self.policy.detect()
+        self.policy_seconds += time.perf_counter() - tick
+        for victim in victims:
+            self._abort(victim)
+        # Without pending events (an abort schedules a restart) nothing can change
+        # any more, so another pass would find the same state: stop here
+        if self.heap:
+            self._schedule(self.now + self.policy.detect_interval, DETECT)
+
+    def run(self):
+        wall = time.perf_counter()
+        if self.policy.detect_interval:
+            self._schedule(self.policy.detect_interval, DETECT)
+        events = 0
+        heap = self.heap
+        with metrics.phase(f"policy_sim/{self.policy.name}"):
+            while heap:
+                when, _, kind, job, attempt = heapq.heappop(heap)
+                if self.until is not None and when > self.until:
+                    break
+                events += 1
+                if kind == DETECT:
+                    self.now = when
+                    self._detect()
+                    continue
+                if attempt != job.attempt:
+                    continue        # scheduled for an attempt that was aborted since
+                self.now = when
+                if kind == ARRIVE:
+                    self._start(job)
+                else:
+                    self._step_done(job)
+        metrics.count("policy_sim_events", events)
+        completed = len(self.responses)
+        return PolicyResult(self.policy.name, len(self.jobs), completed, self.rejected, self.now, self.waits,
+                            self.responses, self.aborts, self.aborted_work, self.detections, self.latencies,
+                            self.policy_seconds, events, time.perf_counter() - wall)
+
+
+def compare(workload, capacities, policies=tuple(POLICIES), detect_interval=0.25, restart_delay=1.0,
+            seed=0, until=None):
+    """Run the same workload under each named policy; returns one PolicyResult per policy."""
+    results = []
+    for name in policies:
+        policy = DetectRecoverPolicy(detect_interval) if name == "detect" else POLICIES[name]()
+        results.append(Simulation(capacities, workload, policy, restart_delay, seed, until).run())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare deadlock policies on one seeded workload.")
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--resources", type=int, default=16)
+    parser.add_argument("--capacity", type=int, default=2, help="units per resource")
+    parser.add_argument("--steps", type=int, default=3, help="resources each job acquires")
+    parser.add_argument("--interarrival", type=float, default=2.0, help="mean simulated seconds between arrivals")
+    parser.add_argument("--work", type=float, default=1.0, help="mean simulated seconds of work per step")
+    parser.add_argument("--restart-delay", type=float, default=1.0, help="mean backoff after an abort")
+    parser.add_argument("--detect-interval", type=float, default=0.25)
+    parser.add_argument("--until", type=float, help="stop at this simulated time")
+    parser.add_argument("--policies", default=",".join(POLICIES), help="comma-separated: " + ", ".join(POLICIES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per policy")
+    args = parser.parse_args()
+
+    capacities = [args.capacity] * args.resources
+    workload = make_workload(args.jobs, capacities, args.steps, args.interarrival, args.work, args.seed)
+    results = compare(workload, capacities, args.policies.split(","), args.detect_interval, args.restart_delay,
+                      args.seed, args.until)
+    if args.json:
+        for result in results:
+            print(json.dumps(result.to_dict()))
+        return
+    print(f"{'policy':<11} {'done':>7} {'thruput':>8} {'wait':>7} {'wait p99':>9} {'response':>9} {'aborts':>7} "
+          f"{'lost work':>10} {'detects':>8} {'overhead':>9} {'events/s':>9}")
+    for result in results:
+        d = result.to_dict()
+        print(f"{d['policy']:<11} {d['completed']:>7} {d['throughput']:>8.3f} {d['wait_mean']:>7.2f} "
+              f"{d['wait_p99']:>9.2f} {d['response_mean']:>9.2f} {d['aborts']:>7} {d['aborted_work']:>10.1f} "
+              f"{d['detections']:>8} {d['policy_seconds']:>8.3f}s {d['events_per_second']:>9,.0f}")
+
+
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    main()
@@ -0,0 +1,257 @@
+import heapq
+
+import numpy as np
+
+import metrics
+
+VECTOR_CELLS = 50_000     # processes x resources from which SafetyEngine scans in NumPy
+ROUND_STEPS = 40          # scalar threshold steps that cost about as much as one NumPy round
+
+
+class SafetyResult:
+    def __init__(self, safe, sequence, unfinished, work, need):
+        self.safe = safe
+        self.sequence = sequence        # process indices in safe-execution order
+        self.unfinished = unfinished    # processes that can never finish (empty when safe)
+        self.work = work                # resources available after the sequence ran
+        self.need = need
+
+    def blocked_on(self, i):
+        # Resources process i still lacks once everything that could finish has finished
+        return [j for j, (n, w) in enumerate(zip(self.need[i], self.work)) if n > w]
+
+    def __repr__(self):
+        return f"SafetyResult(safe={self.safe}, sequence={self.sequence}, unfinished={self.unfinished})"
+
+
+def reduce_by_threshold(thresholds, allocation, work, done):
+    """Repeatedly let any process whose thresholds fit into `work` finish.
+
+    Processes are kept in per-resource orderings sorted by threshold, so each
+    process is only looked at again once `work` has grown past its threshold
+    for some resource. A process becomes ready once all of its thresholds are
+    met, giving O(n·m·log n) overall instead of rescanning every process after
+    each release. Among ready processes the lowest index goes first, which
+    yields the same order as the textbook scan.
+
+    `work` and `done` are updated in place; returns the finishing order.
+    """
+    n, m = len(thresholds), len(work)
+    columns = [list(col) for col in zip(*thresholds)] if n else [[] for _ in range(m)]
+    orders = [sorted((i for i in range(n) if not done[i]), key=col.__getitem__) for col in columns]
+    pointers = [0] * m
+    satisfied = [0] * n
+    ready = []
+
+    def advance(j):
+        order, col, limit = orders[j], columns[j], work[j]
+        p = pointers[j]
+        while p < len(order) and col[order[p]] <= limit:
+            i = order[p]
+            satisfied[i] += 1
+            if satisfied[i] == m:
+                heapq.heappush(ready, i)
+            p += 1
+        pointers[j] = p
+
+    if m == 0:
+        ready = [i for i in range(n) if not done[i]]
+    for j in range(m):
+        advance(j)
+
+    sequence = []
+    while ready:
+        i = heapq.heappop(ready)
+        done[i] = True
+        sequence.append(i)
+        for j, amount in enumerate(allocation[i]):
+            if amount:
+                work[j] += amount
+                advance(j)
+
+    recorder = metrics.active()
+    if recorder is not None:
+        recorder.count("safety_loop_iterations", len(sequence))
+        recorder.count("threshold_checks", sum(pointers))
+    return sequence
+
+
+def reduce_in_rounds(thresholds, allocation, work, done):
+    """NumPy counterpart of `reduce_by_threshold` for large int64 states.
+
+    The same per-resource orderings are kept as one argsorted array, and a
+    round advances every resource's pointer at once with a single
+    searchsorted over them. Every process whose last threshold is crossed
+    in a round finishes in that round, lowest index first, so a round costs
+    a handful of array operations instead of m Python steps per process.
+    Processes that are ready together may finish in any order, so the
+    sequence can differ from the textbook scan's, but it is as safe. Once
+    rounds keep finishing too few processes to pay for themselves (a chain
+    of single releases), the rest is handed to `reduce_by_threshold`.
+
+    `work` (int64 array) and `done` (bool array) are updated in place;
+    returns the finishing order.
+    """
+    rows = np.flatnonzero(~done)
+    r, m = len(rows), len(work)
+    if not r or not m:
+        done[rows] = True
+        return rows.tolist()
+    columns = thresholds[rows].T
+    low = int(columns.min())
+    span = int(columns.max()) - low + 2
+    if span <= 1 << 16:
+        # Small counts: a radix sort on 16-bit offsets is several times faster
+        order = np.argsort((columns - low).astype(np.uint16), axis=1, kind="stable")
+    else:
+        order = np.argsort(columns, axis=1)
+    ranked = np.take_along_axis(columns, order, axis=1)
+    if span * m >= 1 << 62:
+        # Column offsets would overflow int64
+        return _reduce_rest(thresholds, allocation, work, done).tolist()
+    # Resource j's thresholds, shifted into [j * span, (j + 1) * span), in one sorted array
+    offsets = np.arange(m, dtype=np.int64) * span
+    keys = (ranked - low + offsets[:, None]).ravel()
+    order = order.ravel()
+    pointers = np.arange(m, dtype=np.int64) * r
+    satisfied = np.zeros(r, dtype=np.int64)
+
+    finished = []
+    count = rounds = 0
+    while True:
+        if rounds > 64 and rounds * ROUND_STEPS > count * m:
+            # Rounds are finishing too few processes to beat the scalar scan
+            finished.append(_reduce_rest(thresholds, allocation, work, done))
+            break
+        rounds += 1
+        reached = np.searchsorted(keys, offsets + np.clip(work - low, -1, span - 1), side="right")
+        lengths = reached - pointers
+        total = int(lengths.sum())
+        if not total:
+            break
+        # Processes whose threshold for some resource was crossed in this round
+        crossed = order[np.repeat(reached - np.cumsum(lengths), lengths) + np.arange(total)]
+        pointers = reached
+        np.add.at(satisfied, crossed, 1)
+        ready = crossed[satisfied[crossed] == m]
+        if not ready.size:
+            break
+        if ready.size > 1:
+            # A process whose last thresholds were crossed together shows up once per resource
+            ready.sort()
+            ready = ready[np.concatenate(([True], ready[1:] != ready[:-1]))]
+        ready = rows[ready]
+        finished.append(ready)
+        count += len(ready)
+        done[ready] = True
+        work += allocation[ready].sum(axis=0)
+
+    recorder = metrics.active()
+    if recorder is not None:
+        recorder.count("safety_loop_iterations", count)
+        recorder.count("safety_rounds", rounds)
+    return np.concatenate(finished).tolist() if finished else []
+
+
+def _reduce_rest(thresholds, allocation, work, done):
+    # `reduce_by_threshold` over the unfinished rows; returns their finishing order
+    rows = np.flatnonzero(~done)
+    work_list = work.tolist()
+    order = reduce_by_threshold(thresholds[rows].tolist(), allocation[rows].tolist(), work_list, [False] * len(rows))
+    sequence = rows[order]
+    done[sequence] = True
+    work[:] = work_list
+    return sequence
+
+
+def _int_arrays(allocation, maximum, available):
+    # int64 arrays of a rectangular integer state, else None (the row checks then name the problem)
+    try:
+        arrays = [np.asarray(part) for part in (allocation, maximum, available)]
+    except ValueError:
+        return None
+    alloc, maxi, avail = arrays
+    if alloc.ndim != 2 or maxi.shape != alloc.shape or avail.shape != alloc.shape[1:]:
+        return None
+    if any(array.dtype.kind not in "iub" for array in arrays):
+        return None
+    return [array.astype(np.int64, copy=False) for array in arrays]
+
+
+def as_rows(matrix):
+    # Accept nested lists, tuples or NumPy arrays
+    if hasattr(matrix, "tolist"):
+        matrix = matrix.tolist()
+    return [list(row) for row in matrix]
+
+
+class SafetyEngine:
+    """Banker's safety check on one state.
+
+    States of at least VECTOR_CELLS processes x resources are kept as int64
+    arrays and reduced with `reduce_in_rounds`; smaller ones (and ragged or
+    non-integer input, so its errors name the offending process) stay as
+    lists of rows and get the textbook order from `reduce_by_threshold`.
+    """
+
+    def __init__(self, allocation, maximum, available):
+        arrays = None
+        if len(allocation) * len(available) >= VECTOR_CELLS:
+            arrays = _int_arrays(allocation, maximum, available)
+        self.vectorized = arrays is not None
+        if self.vectorized:
+            self.allocation, self.maximum, available = arrays
+            self.available = available.tolist()
+        else:
+            self.allocation = as_rows(allocation)
+            self.maximum = as_rows(maximum)
+            self.available = list(available.tolist() if hasattr(available, "tolist") else available)
+
+        self.num_processes = len(self.allocation)
+        self.num_resources = len(self.available)
+
+        if self.vectorized:
+            self.need = self.maximum - self.allocation
+            negative = (self.need < 0).any(axis=1)
+            if negative.any():
+                raise ValueError(f"P{int(negative.argmax())} holds more than its maximum claim.")
+            return
+
+        if len(self.maximum) != self.num_processes:
+            raise ValueError("Allocation and Maximum must have the same number of processes.")
+        for i, (alloc_row, max_row) in enumerate(zip(self.allocation, self.maximum)):
+            if len(alloc_row) != self.num_resources or len(max_row) != self.num_resources:
+                raise ValueError(f"P{i} must list exactly {self.num_resources} resource values.")
+
+        self.need = [[mx - al for al, mx in zip(alloc_row, max_row)]
+                     for alloc_row, max_row in zip(self.allocation, self.maximum)]
+        for i, row in enumerate(self.need):
+            if any(v < 0 for v in row):
+                raise ValueError(f"P{i} holds more than its maximum claim.")
+
+    def run(self, finished=None, work=None):
+        """Run the safety algorithm and return a SafetyResult.
+
+        `finished` and `work` let callers resume from an already validated
+        prefix of a safe sequence.
+        """
+        if self.vectorized:
+            work = np.array(self.available if work is None else work, dtype=np.int64)
+            done = np.zeros(self.num_processes, dtype=bool)
+            done[list(finished or ())] = True
+            with metrics.phase("safety"):
+                sequence = reduce_in_rounds(self.need, self.allocation, work, done)
+            unfinished = np.flatnonzero(~done).tolist()
+            return SafetyResult(not unfinished, sequence, unfinished, work.tolist(), self.need)
+        work = list(self.available if work is None else work)
+        done = [False] * self.num_processes
+        for i in finished or ():
+            done[i] = True
+        with metrics.phase("safety"):
+            sequence = reduce_by_threshold(self.need, self.allocation, work, done)
+        unfinished = [i for i, d in enumerate(done) if not d]
+        return SafetyResult(not unfinished, sequence, unfinished, work, self.need)
+
+
+def check_safety(allocation, maximum, available):
+    return SafetyEngine(allocation, maximum, available).run()
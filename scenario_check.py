@@ -0,0 +1,300 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from itertools import islice
+
+import numpy as np
+
+import metrics
+import verdict_cache
+from batch_safety import check_safety_batch
+from cycle_detection import deadlocked_components
+from graph_reduction import detect_deadlock
+from recovery import ProcessCost, plan_recovery
+from safety_engine import check_safety
+from wait_for_builder import build_wait_for_graph, held_and_requested, names
+
+EXTENSIONS = (".json", ".csv", ".npz")
+MATRICES = ("allocation", "maximum", "request")
+
+
+def _load_csv(path):
+    # Rows of "section,process,<resource columns...>"; the available row has no process
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        scenario = {"resources": header[2:]}
+        processes = []
+        for row in reader:
+            if not row:
+                continue
+            section, process, values = row[0].strip().lower(), row[1].strip(), [int(v) for v in row[2:]]
+            if section == "available":
+                scenario["available"] = values
+            elif section in MATRICES:
+                scenario.setdefault(section, []).append(values)
+                if process not in processes:
+                    processes.append(process)
+            else:
+                raise ValueError(f"Unknown section '{row[0]}'")
+        scenario["processes"] = processes
+    return [scenario]
+
+
+def _load_npz(path):
+    # 2-D arrays are one scenario, 3-D arrays a stack of scenarios
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    stacked = arrays.get("allocation", next(iter(arrays.values()))).ndim == 3
+    return [arrays] if not stacked else [{"stack": arrays}]
+
+
+def load_scenarios(path):
+    """Scenarios stored in a JSON, CSV or NPZ file.
+
+    A JSON file holds one scenario object or a list of them. Recognised keys:
+    allocation/maximum/available (Banker's check), allocation/request/available
+    (RAG reduction), held/requested as process -> resource lists (wait-for
+    graph), priority/progress per process (recovery costs), and optional
+    processes/resources names.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else [data]
+    if ext == ".csv":
+        return _load_csv(path)
+    if ext == ".npz":
+        return _load_npz(path)
+    raise ValueError(f"Unsupported scenario file '{path}'")
+
+
+def normalize(scenario):
+    # Plain lists instead of NumPy arrays
+    return {k: v.tolist() if hasattr(v, "tolist") else v for k, v in scenario.items()}
+
+
+def unstack(arrays, s):
+    # Scenario s of an NPZ stack; available may be one vector shared by the whole stack
+    return {k: v[s] if v.ndim == (3 if k in MATRICES else 2) else v for k, v in arrays.items()}
+
+
+def first_scenario(path):
+    """The first scenario in a file, as plain lists; used by the GUI hub."""
+    scenario = load_scenarios(path)[0]
+    return normalize(unstack(scenario["stack"], 0) if "stack" in scenario else scenario)
+
+
+def analyze(scenario, verdicts=None, safety=None):
+    """Run every check the scenario has data for; returns a JSON-ready dict.
+
+    With a VerdictCache as `verdicts`, Banker's states seen before are not
+    checked again; `safety` is a Banker's verdict already computed for this
+    scenario (NPZ stacks check theirs in one batch).
+    """
+    scenario = normalize(scenario)
+    processes, resources = names(scenario)
+    result = {}
+    if "name" in scenario:
+        result["name"] = scenario["name"]
+
+    if all(k in scenario for k in ("allocation", "maximum", "available")):
+        if safety is None:
+            safety = (verdicts.check if verdicts is not None else check_safety)(
+                scenario["allocation"], scenario["maximum"], scenario["available"])
+        result["banker"] = {"safe": safety.safe,
+                            "sequence": [processes[i] for i in safety.sequence],
+                            "unfinished": [processes[i] for i in safety.unfinished]}
+
+    if all(k in scenario for k in ("allocation", "request", "available")):
+        reduction = detect_deadlock(scenario["allocation"], scenario["request"], scenario["available"])
+        result["rag"] = {"deadlock": reduction.has_deadlock,
+                         "deadlocked": [processes[i] for i in reduction.deadlocked],
+                         "reduction_order": [processes[i] for i in reduction.reduction_order]}
+
+    explicit = "held" in scenario or "requested" in scenario
+    if explicit or ("allocation" in scenario and "request" in scenario):
+        held, requested = held_and_requested(scenario)
+        wait_for = build_wait_for_graph(held, requested, None if explicit else processes)
+        components = deadlocked_components(wait_for)
+        result["wait_for"] = {"deadlock": bool(components), "components": components}
+        if components:
+            priority, progress = scenario.get("priority", {}), scenario.get("progress", {})
+            costs = {p: ProcessCost(priority.get(p, 1), progress.get(p, 0.0), len(held.get(p, ())))
+                     for c in components for p in c}
+            plan = plan_recovery(wait_for, costs)
+            result["resolver"] = {"actions": [list(a) for a in plan.actions], "total_cost": plan.total_cost}
+    return result
+
+
+def _stack_verdicts(arrays, verdicts=None):
+    # Banker's verdict per scenario of an NPZ stack: cached ones from `verdicts`,
+    # the rest through the vectorized safety check in one call
+    missing = [k for k in ("allocation", "available") if k not in arrays]
+    if missing:
+        raise ValueError(f"NPZ stack has maximum but no {' or '.join(missing)}")
+    allocation, maximum = arrays["allocation"], arrays["maximum"]
+    available = np.broadcast_to(arrays["available"], (len(allocation), allocation.shape[2]))
+    keys = [verdict_cache.state_key(*state) for state in zip(allocation, maximum, available)] if verdicts is not None else None
+    found = [verdicts.get(key) for key in keys] if verdicts is not None else [None] * len(allocation)
+    todo = [s for s, verdict in enumerate(found) if verdict is None]
+    if todo:
+        batch = check_safety_batch(allocation[todo], maximum[todo], available[todo])
+        for k, s in enumerate(todo):
+            sequence = batch.sequence(k)
+            unfinished = np.setdiff1d(np.arange(allocation.shape[1]), sequence)
+            work = available[s] + allocation[s][sequence].sum(axis=0)
+            found[s] = verdict_cache.Verdict(batch.safe[k], sequence, unfinished, work)
+            if verdicts is not None:
+                verdicts.put(keys[s], found[s])
+    return found
+
+
+def _analyze_stack(arrays, verdicts=None):
+    # One record per scenario of an NPZ stack, shaped like analyze() on each
+    count = next((len(v) for k, v in arrays.items() if k in MATRICES), 0)
+    banker = _stack_verdicts(arrays, verdicts) if "maximum" in arrays else [None] * count
+    return [analyze(unstack(arrays, s), safety=banker[s]) for s in range(count)]
+
+
+def _check(path, cache_path=None):
+    start = time.perf_counter()
+    verdicts = verdict_cache.shared(cache_path) if cache_path else None
+    try:
+        results = []
+        with metrics.phase("load"):
+            scenarios = load_scenarios(path)
+        for scenario in scenarios:
+            if "stack" in scenario:
+                results.extend(_analyze_stack(scenario["stack"], verdicts))
+            else:
+                results.append(analyze(scenario, verdicts))
+        error = None
+    except Exception as e:
+        results, error = [], f"{type(e).__name__}: {e}"
+    return path, results, time.perf_counter() - start, error
+
+
+def check_file(path, instrument=False, cache_path=None):
+    """(path, results, seconds, error, metrics snapshot) for one file; runs in a worker process."""
+    if not instrument:
+        return _check(path, cache_path) + (None,)
+    with metrics.recording() as recorder:
+        outcome = _check(path, cache_path)
+    return outcome + (recorder.snapshot(),)
+
+
+def check_files(paths, instrument=False, cache_path=None):
+    # One chunk of files per pool task
+    return [check_file(path, instrument, cache_path) for path in paths]
+
+
+def find_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def run(paths, out=sys.stdout, workers=None, chunksize=16, recorder=None, cache_path=None):
+    """Check every scenario file, streaming one JSONL record per scenario.
+
+    Files fan out over a process pool in chunks of `chunksize`, with at most
+    two chunks per worker in flight; results are written as each chunk
+    completes, so memory does not grow with the number of files. Every record
+    carries its file's checking time. Returns (path, seconds, scenarios,
+    error) per file for the timing summary.
+
+    With a `recorder`, worker metrics are merged into it. A recorder that
+    profiles or traces memory needs to see the work itself, so then the
+    files are checked in this process instead. With a `cache_path`, Banker's
+    verdicts are memoized in that SQLite file across workers and runs.
+    """
+    timings = []
+
+    def write(outcomes):
+        for path, results, seconds, error, snapshot in outcomes:
+            if error is not None:
+                out.write(json.dumps({"file": path, "file_seconds": seconds, "error": error}) + "\n")
+            for index, result in enumerate(results):
+                out.write(json.dumps({"file": path, "file_seconds": seconds, "scenario": index, **result}) + "\n")
+            if snapshot is not None:
+                recorder.merge(snapshot)
+            timings.append((path, seconds, len(results), error))
+
+    if recorder is not None and (recorder.profiler is not None or recorder.trace_memory):
+        with metrics.recording(recorder):
+            write(check_file(path, cache_path=cache_path) for path in find_files(paths))
+        return timings
+    task = partial(check_files, instrument=recorder is not None, cache_path=cache_path)
+    files = find_files(paths)
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in iter(lambda: list(islice(files, chunksize)), []):
+            pending.add(pool.submit(task, chunk))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+        for future in wait(pending).done:
+            write(future.result())
+    return timings
+
+
+def summarize(timings, elapsed, out=sys.stderr, slowest=10):
+    scenarios = sum(n for _, _, n, _ in timings)
+    errors = sum(1 for *_, e in timings if e is not None)
+    busy = sum(s for _, s, _, _ in timings)
+    print(f"{len(timings)} files, {scenarios} scenarios, {errors} errors in {elapsed:.2f}s "
+          f"({busy:.2f}s of checking, {scenarios / max(elapsed, 1e-9):,.0f} scenarios/s)", file=out)
+    for path, seconds, n, error in sorted(timings, key=lambda t: -t[1])[:slowest]:
+        print(f"  {seconds * 1000:9.1f} ms  {n:6d}  {path}{'  ERROR' if error else ''}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check scenario files for unsafe states and deadlocks.")
+    parser.add_argument("paths", nargs="+", help="scenario files or directories (.json, .csv, .npz)")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="files handed to a worker at a time")
+    parser.add_argument("--slowest", type=int, default=10, help="slowest files listed in the summary")
+    parser.add_argument("--verdict-cache", metavar="FILE", help="SQLite file memoizing Banker's verdicts across runs")
+    parser.add_argument("--metrics", metavar="DIR", help="write metrics.prom and metrics.json to DIR")
+    parser.add_argument("--profile", action="store_true", help="cProfile the run (in-process, needs --metrics)")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc the run (in-process, needs --metrics)")
+    args = parser.parse_args()
+    if (args.profile or args.trace_memory) and not args.metrics:
+        parser.error("--profile and --trace-memory need --metrics DIR to write their report")
+
+    recorder = metrics.Recorder(args.profile, args.trace_memory) if args.metrics else None
+    start = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        timings = run(args.paths, out, args.workers, args.chunksize, recorder, args.verdict_cache)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summarize(timings, time.perf_counter() - start, slowest=args.slowest)
+    if recorder is not None:
+        os.makedirs(args.metrics, exist_ok=True)
+        recorder.write_prometheus(os.path.join(args.metrics, "metrics.prom"))
+        recorder.write_json(os.path.join(args.metrics, "metrics.json"))
+        if recorder.profiler is not None:
+            with open(os.path.join(args.metrics, "profile.txt"), "w", encoding="utf-8") as f:
+                f.write(recorder.profile_report())
+    sys.exit(1 if any(e is not None for *_, e in timings) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+from cycle_detection import deadlocked_components
+from recovery import ProcessCost, plan_recovery
+from trace_ingest import LiveState, TraceEvent
+
+
+class Aborted(Exception):
+    """Raised inside a simulated process chosen as a deadlock victim."""
+
+
+class _Waiter:
+    __slots__ = ("pid", "count", "signal", "error")
+
+    def __init__(self, pid, count, signal):
+        self.pid = pid
+        self.count = count
+        self.signal = signal    # asyncio.Future or threading.Event
+        self.error = None
+
+    def wake(self, error=None):
+        if isinstance(self.signal, threading.Event):
+            self.error = error
+            self.signal.set()
+        elif not self.signal.done():
+            if error is None:
+                self.signal.set_result(None)
+            else:
+                self.signal.set_exception(error)
+
+
+class CountedResource:
+    """`capacity` interchangeable units, granted to the first waiter they fit.
+
+    A mutex is a resource with capacity 1, a counting semaphore one with
+    capacity n. A request is only ever blocked by units that are held, never
+    by a larger request queued ahead of it, so the watchdog's wait-for graph
+    and graph reduction see exactly the blocking that exists. Every request,
+    grant and release is reported to the simulation. `acquire` is for
+    asyncio processes, `acquire_blocking` for threads.
+    """
+
+    def __init__(self, sim, name, capacity=1):
+        self.sim = sim
+        self.name = name
+        self.capacity = capacity
+        self.free = capacity
+        self.holders = {}
+        self.waiters = deque()
+
+    def _request(self, pid, count, make_signal):
+        # Called with the simulation lock held; returns None when granted at once
+        if count > self.capacity:
+            raise ValueError(f"{pid} asks for {count} units of {self.name}, which only has {self.capacity}")
+        self.sim._event("request", pid, self.name, count)
+        if count <= self.free:
+            self._grant(pid, count)
+            return None
+        waiter = _Waiter(pid, count, make_signal())
+        self.waiters.append(waiter)
+        self.sim._blocked(pid, self, waiter)
+        return waiter
+
+    def _grant(self, pid, count):
+        self.free -= count
+        self.holders[pid] = self.holders.get(pid, 0) + count
+        self.sim._event("acquire", pid, self.name, count)
+
+    def _wake_waiters(self):
+        waiters = self.waiters
+        while waiters and waiters[0].count <= self.free:
+            self._hand_over(waiters.popleft())
+        if self.free and waiters:
+            # Someone further back may ask for fewer units than the head
+            still_waiting = deque()
+            for waiter in waiters:
+                if waiter.count <= self.free:
+                    self._hand_over(waiter)
+                else:
+                    still_waiting.append(waiter)
+            self.waiters = still_waiting
+
+    def _hand_over(self, waiter):
+        self.sim._unblocked(waiter.pid)
+        self._grant(waiter.pid, waiter.count)
+        waiter.wake()
+
+    def _withdraw(self, waiter, error=None):
+        self.waiters.remove(waiter)
+        self.sim._unblocked(waiter.pid)
+        if error is not None:
+            waiter.wake(error)
+
+    async def acquire(self, pid, count=1):
+        loop = asyncio.get_running_loop()
+        with self.sim.lock:
+            waiter = self._request(pid, count, loop.create_future)
+        if waiter is None:
+            return
+        try:
+            await waiter.signal
+        except asyncio.CancelledError:
+            with self.sim.lock:
+                if waiter in self.waiters:
+                    self._withdraw(waiter)
+                elif not waiter.signal.cancelled() and waiter.signal.exception() is None:
+                    # Granted just as we were cancelled: hand the units back
+                    self._release(pid, count)
+            raise
+
+    def acquire_blocking(self, pid, count=1):
+        with self.sim.lock:
+            waiter = self._request(pid, count, threading.Event)
+        if waiter is not None:
+            waiter.signal.wait()
+            if waiter.error is not None:
+                raise waiter.error
+
+    def _release(self, pid, count):
+        held = self.holders.get(pid, 0)
+        if count > held:
+            raise RuntimeError(f"{pid} releases {count} units of {self.name} but holds {held}")
+        if held == count:
+            del self.holders[pid]
+        else:
+            self.holders[pid] = held - count
+        self.free += count
+        self.sim._event("release", pid, self.name, count)
+        self._wake_waiters()
+
+    def release(self, pid, count=1):
+        with self.sim.lock:
+            self._release(pid, count)
+
+
+def Mutex(sim, name):
+    return CountedResource(sim, name, 1)
+
+
+def Semaphore(sim, name, value):
+    return CountedResource(sim, name, value)
+
+
+def random_script(rng, resources, rounds=3, max_locks=2, work=0.001, ordered=False, spread=0.0):
+    """A randomized process: each round locks a few resources, works, unlocks.
+
+    Resources are taken in random order, so independent processes can
+    deadlock; with `ordered=True` they follow one global order and cannot.
+    The process arrives at a uniformly random time within `spread` seconds.
+    """
+    script = [("work", rng.uniform(0, spread))] if spread else []
+    for _ in range(rounds):
+        chosen = rng.sample(resources, rng.randint(1, max_locks))
+        if ordered:
+            chosen.sort()
+        for rid in chosen:
+            script.append(("acquire", rid, 1))
+            script.append(("work", rng.expovariate(1 / work) / len(chosen)))
+        for rid in reversed(chosen):
+            script.append(("release", rid, 1))
+        script.append(("work", rng.expovariate(1 / work)))
+    return script
+
+
+class SimulationReport:
+    def __init__(self, mode, processes, elapsed, completed, killed, unfinished, acquisitions,
+                 blocked, latencies, scans, deadlocks):
+        self.mode = mode
+        self.processes = processes
+        self.elapsed = elapsed
+        self.completed = completed
+        self.killed = killed
+        self.unfinished = unfinished
+        self.acquisitions = acquisitions
+        self.blocked = blocked          # seconds each satisfied or aborted wait took
+        self.latencies = latencies      # seconds from a deadlock forming to its detection
+        self.scans = scans              # seconds per watchdog scan
+        self.deadlocks = deadlocks      # deadlocked process sets, as detected
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {"count": 0}
+        ordered = sorted(values)
+        return {"count": len(values), "total": sum(values), "mean": sum(values) / len(values),
+                "p50": ordered[len(values) // 2], "p99": ordered[min(len(values) - 1, int(len(values) * 0.99))],
+                "max": ordered[-1]}
+
+    def to_dict(self):
+        return {"mode": self.mode, "processes": self.processes, "elapsed": self.elapsed,
+                "completed": self.completed, "killed": self.killed, "unfinished": self.unfinished,
+                "acquisitions": self.acquisitions,
+                "acquisitions_per_second": self.acquisitions / self.elapsed if self.elapsed else 0.0,
+                "completions_per_second": self.completed / self.elapsed if self.elapsed else 0.0,
+                "blocked_seconds": self._summary(self.blocked),
+                "detection_latency_seconds": self._summary(self.latencies),
+                "watchdog_scan_seconds": self._summary(self.scans),
+                "deadlocks": len(self.deadlocks)}
+
+    def __str__(self):
+        d = self.to_dict()
+        lines = [f"{d['processes']} processes ({d['mode']}) in {d['elapsed']:.2f}s: {d['completed']} completed, "
+                 f"{d['killed']} killed, {d['unfinished']} unfinished",
+                 f"  {d['acquisitions']} acquisitions ({d['acquisitions_per_second']:,.0f}/s), "
+                 f"{d['completions_per_second']:,.0f} completions/s"]
+        for label, key in (("blocked", "blocked_seconds"), ("detection latency", "detection_latency_seconds"),
+                           ("watchdog scan", "watchdog_scan_seconds")):
+            s = d[key]
+            if s["count"]:
+                lines.append(f"  {label}: n={s['count']} mean={s['mean'] * 1e3:.2f}ms "
+                             f"p99={s['p99'] * 1e3:.2f}ms max={s['max'] * 1e3:.2f}ms")
+        lines.append(f"  deadlocks detected: {d['deadlocks']}")
+        return "\n".join(lines)
+
+
+class Simulation:
+    """Runs scripted processes against instrumented resources under a watchdog.
+
+    Scripts are lists of ("acquire", rid, count), ("release", rid, count) and
+    ("work", seconds) steps. In "async" mode every process is an asyncio
+    task, which comfortably scales past 10k processes; "threads" mode runs
+    each process on a real thread. Every `watchdog_interval` seconds the
+    watchdog snapshots the wait-for graph under the lock and runs detection
+    on the copy: SCCs for single-unit resources, confirmed by graph reduction
+    when some resources have several units. With `resolve`, a low-cost set
+    of victims picked by plan_recovery is aborted, releasing what they hold.
+    """
+
+    def __init__(self, capacities, watchdog_interval=0.05, resolve=True):
+        self.lock = threading.Lock()
+        self.resources = {rid: CountedResource(self, rid, c) for rid, c in capacities.items()}
+        self.capacities = dict(capacities)
+        self.single_unit = all(c == 1 for c in capacities.values())
+        self.watchdog_interval = watchdog_interval
+        self.resolve = resolve
+        self.state = LiveState()
+        self.waiting_on = {}        # pid -> (resource, waiter)
+        self.blocked_since = {}     # pid -> when its current wait began
+        self.progress = {}          # pid -> fraction of its script done
+        self.blocked = []
+        self.latencies = []
+        self.scans = []
+        self.deadlocks = []
+        self._reported = set()
+        self.acquisitions = 0
+        self.completed = 0
+        self.killed = 0
+
+    # Bookkeeping, always with self.lock held
+
+    def _event(self, op, pid, rid=None, count=1):
+        self.state.apply(TraceEvent(0.0, op, pid, rid, count))
+        if op == "acquire":
+            self.acquisitions += 1
+
+    def _blocked(self, pid, resource, waiter):
+        self.waiting_on[pid] = (resource, waiter)
+        self.blocked_since[pid] = time.perf_counter()
+
+    def _unblocked(self, pid):
+        del self.waiting_on[pid]
+        self.blocked.append(time.perf_counter() - self.blocked_since.pop(pid))
+
+    def _finish(self, pid, held, outcome):
+        with self.lock:
+            for rid, count in held.items():
+                if count:
+                    self.resources[rid]._release(pid, count)
+            self._event("exit", pid)
+            self.progress.pop(pid, None)
+            if outcome == "completed":
+                self.completed += 1
+            elif outcome == "killed":
+                self.killed += 1
+
+    def abort(self, pid):
+        """Wake `pid` out of its current wait with Aborted."""
+        with self.lock:
+            entry = self.waiting_on.get(pid)
+            if entry is not None:
+                resource, waiter = entry
+                resource._withdraw(waiter, Aborted(pid))
+
+    # Watchdog
+
+    def snapshot(self):
+        # Only waiting processes can be deadlocked, and only what they hold can
+        # block them, so the copy taken under the lock is sized by the waiters
+        with self.lock:
+            state = LiveState()
+            state.waiting = {p: dict(waits) for p, waits in self.state.waiting.items()}
+            state.held = {p: dict(self.state.held.get(p, {})) for p in state.waiting}
+            since = dict(self.blocked_since)
+            progress = {p: self.progress.get(p, 0.0) for p in state.waiting}
+        for p, held in state.held.items():
+            for rid, count in held.items():
+                state.holders.setdefault(rid, {})[p] = count
+        return state, since, progress
+
+    def detect(self, snapshot):
+        """Deadlocked process sets in a snapshot, plus the victims to abort.
+
+        Reads only the snapshot, so it can run off the event loop or outside
+        the lock; `_record` files the results.
+        """
+        state, since, progress = snapshot
+        with metrics.phase("watchdog"):
+            graph = state.wait_for_graph()
+            if not self.single_unit:
+                # With several units per resource a cycle is necessary but not
+                # sufficient; keep the processes graph reduction cannot finish
+                stuck = set(state.reduction(self.capacities))
+                graph = {p: [q for q in qs if q in stuck] for p, qs in graph.items() if p in stuck}
+            components = deadlocked_components(graph)
+            victims = []
+            if components and self.resolve:
+                costs = {p: ProcessCost(1, progress[p], sum(state.held[p].values())) for c in components for p in c}
+                victims = plan_recovery(graph, costs).victims
+        metrics.count("deadlocks_detected", len(components))
+        return components, victims
+
+    def _record(self, components, since):
+        # Files newly seen deadlocks and how long after forming they were found
+        now = time.perf_counter()
+        with self.lock:
+            for component in components:
+                key = frozenset(component)
+                if key not in self._reported:
+                    self._reported.add(key)
+                    self.deadlocks.append(component)
+                    # The deadlock formed when its last member started waiting
+                    self.latencies.append(now - max(since.get(p, now) for p in component))
+
+    def _scan(self):
+        start = time.perf_counter()
+        snapshot = self.snapshot()
+        components, victims = self.detect(snapshot)
+        self._record(components, snapshot[1])
+        for pid in victims:
+            self.abort(pid)
+        self.scans.append(time.perf_counter() - start)
+        return components
+
+    # Running
+
+    async def _run_async_process(self, pid, script):
+        held = {}
+        outcome = "unfinished"     # still set if the task is cancelled at the deadline
+        with self.lock:
+            self._event("start", pid)
+        try:
+            for k, (op, *args) in enumerate(script):
+                if op == "acquire":
+                    rid, count = args[0], args[1] if len(args) > 1 else 1
+                    await self.resources[rid].acquire(pid, count)
+                    held[rid] = held.get(rid, 0) + count
+                elif op == "release":
+                    rid, count = args[0], args[1] if len(args) > 1 else 1
+                    self.resources[rid].release(pid, count)
+                    held[rid] -= count
+                else:
+                    await asyncio.sleep(args[0])
+                with self.lock:
+                    self.progress[pid] = (k + 1) / len(script)
+            outcome = "completed"
+        except Aborted:
+            outcome = "killed"
+        finally:
+            self._finish(pid, held, outcome)
+
+    async def _watchdog_async(self, stop):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.watchdog_interval)
+            except asyncio.TimeoutError:
+                pass
+            start = time.perf_counter()
+            snapshot = self.snapshot()
+            # Detection runs off the event loop; only the snapshot holds the lock
+            components, victims = await loop.run_in_executor(None, self.detect, snapshot)
+            self._record(components, snapshot[1])
+            for pid in victims:
+                self.abort(pid)
+            self.scans.append(time.perf_counter() - start)
+
+    async def run_async(self, scripts, duration=None):
+        stop = asyncio.Event()
+        watchdog = asyncio.create_task(self._watchdog_async(stop))
+        tasks = [asyncio.create_task(self._run_async_process(pid, script)) for pid, script in scripts.items()]
+        done, pending = await asyncio.wait(tasks, timeout=duration)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        stop.set()
+        await watchdog
+        for task in done:
+            task.result()
+        return len(pending)
+
+    def _run_thread_process(self, pid, script):
+        held = {}
+        outcome = "unfinished"     # still set if the task is cancelled at the deadline
+        with self.lock:
+            self._event("start", pid)
+        try:
+            for k, (op, *args) in enumerate(script):
+                if op == "acquire":
+                    rid, count = args[0], args[1] if len(args) > 1 else 1
+                    self.resources[rid].acquire_blocking(pid, count)
+                    held[rid] = held.get(rid, 0) + count
+                elif op == "release":
+                    rid, count = args[0], args[1] if len(args) > 1 else 1
+                    self.resources[rid].release(pid, count)
+                    held[rid] -= count
+                else:
+                    time.sleep(args[0])
+                with self.lock:
+                    self.progress[pid] = (k + 1) / len(script)
+            outcome = "completed"
+        except Aborted:
+            outcome = "killed"
+        finally:
+            self._finish(pid, held, outcome)
+
+    def run_threads(self, scripts, duration=None):
+        stop = threading.Event()
+
+        def watchdog():
+            while not stop.wait(self.watchdog_interval):
+                self._scan()
+
+        threads = [threading.Thread(target=self._run_thread_process, args=(pid, script), daemon=True)
+                   for pid, script in scripts.items()]
+        guard = threading.Thread(target=watchdog, daemon=True)
+        guard.start()
+        for t in threads:
+            t.start()
+        deadline = None if duration is None else time.perf_counter() + duration
+        for t in threads:
+            t.join(None if deadline is None else max(deadline - time.perf_counter(), 0))
+        stop.set()
+        guard.join()
+        # Threads cannot be cancelled; whatever is still running is left behind as daemons
+        return sum(t.is_alive() for t in threads)
+
+    def run(self, scripts, mode="async", duration=None):
+        start = time.perf_counter()
+        if mode == "async":
+            unfinished = asyncio.run(self.run_async(scripts, duration))
+        elif mode == "threads":
+            unfinished = self.run_threads(scripts, duration)
+        else:
+            raise ValueError(f"Unknown mode '{mode}'")
+        return SimulationReport(mode, len(scripts), time.perf_counter() - start, self.completed, self.killed,
+                                unfinished, self.acquisitions, self.blocked, self.latencies, self.scans,
+                                self.deadlocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate processes contending for locks under a deadlock watchdog.")
+    parser.add_argument("--script", help="JSON file of pid -> [[op, arg, ...], ...] (default: random workload)")
+    parser.add_argument("--capacities", help="JSON object of resource -> units (default: --resources mutexes)")
+    parser.add_argument("--processes", type=int, default=10000)
+    parser.add_argument("--resources", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-locks", type=int, default=2)
+    parser.add_argument("--work-ms", type=float, default=1.0)
+    parser.add_argument("--spread", type=float, default=5.0, help="seconds over which processes arrive")
+    parser.add_argument("--ordered", action="store_true", help="take locks in a global order (no deadlocks)")
+    parser.add_argument("--mode", choices=("async", "threads"), default="async")
+    parser.add_argument("--interval", type=float, default=0.05, help="watchdog interval in seconds")
+    parser.add_argument("--no-resolve", action="store_true", help="only detect, never abort victims")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.capacities:
+        capacities = json.loads(args.capacities)
+    else:
+        capacities = {f"R{j}": 1 for j in range(args.resources)}
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            scripts = {pid: [tuple(step) for step in steps] for pid, steps in json.load(f).items()}
+    else:
+        rng = random.Random(args.seed)
+        names = sorted(capacities)
+        scripts = {f"P{i}": random_script(rng, names, args.rounds, args.max_locks, args.work_ms / 1000,
+                                           args.ordered, args.spread)
+                   for i in range(args.processes)}
+
+    sim = Simulation(capacities, args.interval, resolve=not args.no_resolve)
+    report = sim.run(scripts, args.mode, args.duration)
+    print(json.dumps(report.to_dict()) if args.json else report)
+
+
+if __name__ == "__main__":
+    metrics.enable_from_env()
+    main()
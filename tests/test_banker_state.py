@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from banker_state import BankerState
+from safety_engine import check_safety
+
+
+def matrices(state):
+    pids = list(state.allocation)
+    return [state.allocation[p] for p in pids], [state.maximum[p] for p in pids], state.available
+
+
+def snapshot(state):
+    return (list(state.available), {p: list(r) for p, r in state.allocation.items()},
+            {p: list(r) for p, r in state.need.items()}, state.sequence, state.is_safe())
+
+
+def assert_consistent(state):
+    allocation, maximum, available = matrices(state)
+    assert state.is_safe() == check_safety(allocation, maximum, available).safe
+    if state.is_safe():
+        work = list(available)
+        assert sorted(state.sequence) == sorted(state.allocation)
+        for pid in state.sequence:
+            assert all(n <= w for n, w in zip(state.need[pid], work))
+            work = [w + a for w, a in zip(work, state.allocation[pid])]
+
+
+def safe_after(state, pid, request):
+    allocation, maximum, available = matrices(state)
+    i = list(state.allocation).index(pid)
+    allocation = [list(row) for row in allocation]
+    allocation[i] = [a + r for a, r in zip(allocation[i], request)]
+    return check_safety(allocation, maximum, [v - r for v, r in zip(available, request)]).safe
+
+
+def test_textbook_request():
+    state = BankerState([[0, 1, 0], [2, 0, 0], [3, 0, 2], [2, 1, 1], [0, 0, 2]],
+                        [[7, 5, 3], [3, 2, 2], [9, 0, 2], [2, 2, 2], [4, 3, 3]], [3, 3, 2])
+    assert state.is_safe()
+    assert state.request("P1", [1, 0, 2])
+    assert state.available == [2, 3, 0]
+    before = snapshot(state)
+    assert not state.request("P0", [0, 2, 0])
+    assert snapshot(state) == before
+    with pytest.raises(ValueError):
+        state.request("P1", [0, 0, 1])
+
+
+def test_operations_match_a_full_safety_check():
+    rng = random.Random(3)
+    for _ in range(60):
+        m = rng.randint(1, 3)
+        n = rng.randint(1, 6)
+        allocation = [[rng.randint(0, 2) for _ in range(m)] for _ in range(n)]
+        maximum = [[a + rng.randint(0, 3) for a in row] for row in allocation]
+        state = BankerState(allocation, maximum, [rng.randint(0, 4) for _ in range(m)])
+        assert_consistent(state)
+        next_pid = n
+        for _ in range(40):
+            op = rng.random()
+            pids = list(state.allocation)
+            if pids and op < 0.5:
+                pid = rng.choice(pids)
+                request = [rng.randint(0, need) for need in state.need[pid]]
+                expected = (all(r <= a for r, a in zip(request, state.available))
+                            and safe_after(state, pid, request))
+                before = snapshot(state)
+                assert state.request(pid, request) == expected
+                if not expected:
+                    assert snapshot(state) == before
+            elif pids and op < 0.75:
+                pid = rng.choice(pids)
+                state.release(pid, [rng.randint(0, a) for a in state.allocation[pid]])
+            elif pids and op < 0.85:
+                state.remove_process(rng.choice(pids))
+            else:
+                maximum = [rng.randint(0, 4) for _ in range(m)]
+                allocation = [rng.randint(0, mx) for mx in maximum]
+                pid = f"P{next_pid}"
+                next_pid += 1
+                allocs, maxes, available = matrices(state)
+                expected = (all(a <= v for a, v in zip(allocation, available))
+                            and check_safety(allocs + [allocation], maxes + [maximum],
+                                             [v - a for v, a in zip(available, allocation)]).safe)
+                before = snapshot(state)
+                assert state.add_process(pid, maximum, allocation) == expected
+                if not expected:
+                    assert snapshot(state) == before
+            assert_consistent(state)
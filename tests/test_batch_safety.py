@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from batch_safety import check_safety_batch
+from safety_engine import check_safety
+
+
+def random_stack(rng, scenarios, n, m):
+    allocation = rng.integers(0, 4, (scenarios, n, m))
+    maximum = allocation + rng.integers(0, 6, (scenarios, n, m))
+    return allocation, maximum, rng.integers(0, 8, (scenarios, m))
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 7])
+def test_matches_check_safety_per_scenario(chunk_size):
+    rng = np.random.default_rng(4)
+    for n, m in [(1, 1), (5, 3), (40, 4), (12, 0)]:
+        allocation, maximum, available = random_stack(rng, 50, n, m)
+        batch = check_safety_batch(allocation, maximum, available, chunk_size)
+        assert len(batch) == 50
+        for s in range(50):
+            scalar = check_safety(allocation[s], maximum[s], available[s])
+            assert bool(batch.safe[s]) == scalar.safe
+            # Processes ready in the same round may finish in another order, but the set is the same
+            sequence = batch.sequence(s)
+            assert sorted(sequence) == sorted(scalar.sequence)
+            work = available[s].copy()
+            for i in sequence:
+                assert (maximum[s, i] - allocation[s, i] <= work).all()
+                work += allocation[s, i]
+
+
+def test_shared_available_vector():
+    rng = np.random.default_rng(5)
+    allocation, maximum, _ = random_stack(rng, 20, 6, 3)
+    available = np.array([2, 1, 3])
+    batch = check_safety_batch(allocation, maximum, available)
+    assert batch.safe.tolist() == [check_safety(a, mx, available).safe for a, mx in zip(allocation, maximum)]
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError, match="Scenario 1: P0 holds more"):
+        check_safety_batch([[[0]], [[2]]], [[[1]], [[1]]], [0])
+    with pytest.raises(ValueError):
+        check_safety_batch([[0]], [[1]], [0])
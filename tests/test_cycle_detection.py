@@ -0,0 +1,60 @@
+import random
+
+from cycle_detection import cycle_in_component, deadlocked_components, strongly_connected_components
+
+
+def reachable(graph, start):
+    seen = {start}
+    stack = [start]
+    while stack:
+        for nxt in graph.get(stack.pop(), ()):
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def reference_components(graph):
+    # Two nodes share a component when each reaches the other
+    nodes = set(graph) | {q for targets in graph.values() for q in targets}
+    reach = {node: reachable(graph, node) for node in nodes}
+    return {frozenset(q for q in reach[node] if node in reach[q]) for node in nodes}
+
+
+def random_graph(rng, n, p):
+    return {i: [j for j in range(n) if rng.random() < p] for i in range(n)}
+
+
+def test_matches_pairwise_reachability():
+    rng = random.Random(5)
+    for _ in range(200):
+        graph = random_graph(rng, rng.randint(1, 15), rng.uniform(0.02, 0.3))
+        components = strongly_connected_components(graph)
+        assert {frozenset(c) for c in components} == reference_components(graph)
+        assert sum(map(len, components)) == len({*graph, *(q for t in graph.values() for q in t)})
+        # Tarjan emits sinks first: no edge leads to a component emitted later
+        emitted = {node: k for k, component in enumerate(components) for node in component}
+        assert all(emitted[q] <= emitted[p] for p, targets in graph.items() for q in targets)
+
+
+def test_deadlocked_components_and_their_cycles():
+    rng = random.Random(6)
+    for _ in range(200):
+        graph = random_graph(rng, rng.randint(1, 15), rng.uniform(0.02, 0.3))
+        deadlocked = deadlocked_components(graph)
+        expected = {c for c in reference_components(graph)
+                    if len(c) > 1 or next(iter(c)) in graph.get(next(iter(c)), ())}
+        assert {frozenset(c) for c in deadlocked} == expected
+        for component in deadlocked:
+            cycle = cycle_in_component(graph, component)
+            assert set(cycle) <= set(component)
+            assert all(b in graph[a] for a, b in zip(cycle, cycle[1:] + cycle[:1]))
+
+
+def test_deep_chain_and_ring_do_not_recurse():
+    n = 100_000
+    chain = {i: [i + 1] for i in range(n - 1)}
+    assert deadlocked_components(chain) == []
+    ring = {i: [(i + 1) % n] for i in range(n)}
+    [component] = deadlocked_components(ring)
+    assert len(component) == n
@@ -0,0 +1,68 @@
+import random
+
+from cycle_detection import deadlocked_components
+from dynamic_wait_for import DynamicWaitForGraph
+
+
+def as_sets(components):
+    return sorted(sorted(component) for component in components)
+
+
+def reference(edges):
+    graph = {}
+    for p, q in edges:
+        graph.setdefault(p, []).append(q)
+    return as_sets(deadlocked_components(graph))
+
+
+def test_cycle_through_an_edge_that_already_closed_one():
+    graph = DynamicWaitForGraph()
+    assert graph.add_wait("B", "A") is None
+    assert graph.add_wait("A", "B") == ["A", "B"]
+    assert graph.add_wait("B", "C") is None
+    assert graph.add_wait("C", "A") == ["C", "A", "B"]
+    assert as_sets(graph.cycles()) == [["A", "B", "C"]]
+
+
+def test_removing_a_wait_splits_the_deadlock():
+    graph = DynamicWaitForGraph()
+    for p, q in [("A", "B"), ("B", "A"), ("B", "C"), ("C", "A")]:
+        graph.add_wait(p, q)
+    assert as_sets(graph.remove_wait("B", "A")) == [["A", "B", "C"]]
+    assert graph.remove_wait("C", "A") == []
+    assert not graph.has_deadlock()
+    assert graph.add_wait("C", "A") == ["C", "A", "B"]
+
+
+def test_self_wait_is_a_deadlock():
+    graph = DynamicWaitForGraph()
+    assert graph.add_wait("A", "A") == ["A"]
+    assert graph.cycles() == [["A"]]
+    graph.remove_process("A")
+    assert not graph.has_deadlock()
+
+
+def test_matches_scc_recomputation():
+    rng = random.Random(7)
+    for _ in range(200):
+        graph = DynamicWaitForGraph()
+        live = set()
+        for _ in range(40):
+            if live and rng.random() < 0.3:
+                edge = rng.choice(sorted(live))
+                live.discard(edge)
+                remaining = graph.remove_wait(*edge)
+            else:
+                edge = (rng.randrange(8), rng.randrange(8))
+                live.add(edge)
+                cycle = graph.add_wait(*edge)
+                if cycle is not None:
+                    steps = list(zip(cycle, cycle[1:] + cycle[:1]))
+                    assert steps[0] == edge and set(steps) <= live
+                remaining = graph.cycles()
+            assert as_sets(remaining) == reference(live)
+            assert sorted(graph.edges()) == sorted(live)
+            # Every edge between components runs forward in the order
+            for p, q in live:
+                a, b = graph.leader[p], graph.leader[q]
+                assert a == b or graph.order[a] < graph.order[b]
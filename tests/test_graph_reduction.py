@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+
+from graph_reduction import detect_deadlock
+
+
+def naive_reduction(allocation, request, available):
+    # Erase the first process whose request fits, until none does
+    work = list(available)
+    left = list(range(len(allocation)))
+    order = []
+    while True:
+        ready = next((i for i in left if all(r <= w for r, w in zip(request[i], work))), None)
+        if ready is None:
+            return left, order, work
+        left.remove(ready)
+        order.append(ready)
+        work = [w + a for w, a in zip(work, allocation[ready])]
+
+
+def test_matches_naive_reduction():
+    rng = random.Random(8)
+    for _ in range(300):
+        n, m = rng.randint(1, 12), rng.randint(1, 4)
+        allocation = [[rng.randint(0, 2) for _ in range(m)] for _ in range(n)]
+        request = [[rng.randint(0, 3) for _ in range(m)] for _ in range(n)]
+        available = [rng.randint(0, 2) for _ in range(m)]
+        result = detect_deadlock(allocation, request, available)
+        deadlocked, order, work = naive_reduction(allocation, request, available)
+        assert result.deadlocked == deadlocked
+        assert result.reduction_order == order
+        assert result.work == work
+        assert result.has_deadlock == bool(deadlocked)
+
+
+def test_two_processes_waiting_on_each_other():
+    # P0 holds R0 and wants R1, P1 holds R1 and wants R0; P2 is free to finish
+    result = detect_deadlock(np.array([[1, 0], [0, 1], [0, 0]]), np.array([[0, 1], [1, 0], [0, 0]]), np.array([0, 0]))
+    assert result.deadlocked == [0, 1]
+    assert result.reduction_order == [2]
+
+
+def test_rejects_ragged_rows():
+    with pytest.raises(ValueError, match="P1 must list exactly 2"):
+        detect_deadlock([[0, 0], [0]], [[0, 0], [0, 0]], [1, 1])
@@ -0,0 +1,38 @@
+from lock_order import LockOrderChecker
+
+
+def nested(checker, pid, ts, held, acquired):
+    checker.apply(ts, "acquire", pid, held)
+    checker.apply(ts, "acquire", pid, acquired)
+    checker.apply(ts, "exit", pid, None)
+
+
+def test_reports_opposite_orders():
+    checker = LockOrderChecker()
+    nested(checker, "P1", 1.0, "A", "B")
+    nested(checker, "P2", 2.0, "B", "A")
+    [inversion] = checker.report().inversions
+    assert inversion.locks == ["B", "A"]
+    assert [(pid, ts) for *_, pid, ts in inversion.chain] == [("P2", 2.0), ("P1", 1.0)]
+
+
+def test_cycle_through_an_already_reported_pair():
+    # B → A closes A → B → A and is parked; A → C → B → A must still be found
+    checker = LockOrderChecker()
+    nested(checker, "P1", 1.0, "A", "B")
+    nested(checker, "P2", 2.0, "B", "A")
+    nested(checker, "P3", 3.0, "C", "B")
+    nested(checker, "P4", 4.0, "A", "C")
+    inversions = checker.report().inversions
+    assert [inversion.locks for inversion in inversions] == [["B", "A"], ["A", "C", "B"]]
+    assert [pid for *_, pid, _ in inversions[1].chain] == ["P4", "P3", "P2"]
+
+
+def test_repeated_pairs_are_not_reported_again():
+    checker = LockOrderChecker()
+    for ts in range(3):
+        nested(checker, "P1", float(ts), "A", "B")
+        nested(checker, "P2", float(ts), "B", "A")
+    report = checker.report()
+    assert len(report.inversions) == 1
+    assert report.cached == 4
@@ -0,0 +1,47 @@
+import numpy as np
+
+from cycle_detection import deadlocked_components
+from matrix_state import BitMatrix, RagBits
+
+
+def random_rag(rng, n, m, density):
+    return (rng.random((n, m)) < density).astype(np.uint8), (rng.random((m, n)) < density).astype(np.uint8)
+
+
+def test_bit_matrix_round_trip():
+    rng = np.random.default_rng(0)
+    dense = (rng.random((37, 21)) < 0.3).astype(np.uint8)
+    bits = BitMatrix.from_dense(dense)
+    assert (bits.to_dense() == dense).all()
+    assert [arr.tolist() for arr in bits.nonzero()] == [arr.tolist() for arr in np.nonzero(dense)]
+    assert bits.count() == dense.sum()
+    assert bits[3, 5] == bool(dense[3, 5])
+    bits[3, 5] = not bits[3, 5]
+    assert bits[3, 5] != bool(dense[3, 5])
+
+
+def test_trim_keeps_exactly_what_can_reach_a_cycle():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        n, m = rng.integers(1, 25, 2)
+        rag = RagBits(*random_rag(rng, n, m, rng.uniform(0.02, 0.2)))
+        graph = rag.graph()
+        processes, resources = rag.trim()
+        live = {f"P{i}" for i in np.flatnonzero(processes)} | {f"R{j}" for j in np.flatnonzero(resources)}
+        # Survivors all have an edge to another survivor; everyone else was a sink once peeled
+        assert all(any(dest in live for dest in graph[node]) for node in live)
+        on_cycle = {node for component in deadlocked_components(graph) for node in component}
+        assert on_cycle <= live
+        assert sorted(map(sorted, rag.deadlocked_components())) == sorted(map(sorted, deadlocked_components(graph)))
+
+
+def test_long_chain_is_peeled_completely():
+    n = 3000
+    request = np.eye(n, dtype=np.uint8)
+    assignment = np.eye(n, k=1, dtype=np.uint8)
+    rag = RagBits(request, assignment)
+    processes, resources = rag.trim()
+    assert not processes.any() and not resources.any()
+    assignment[n - 1, 0] = 1
+    [ring] = RagBits(request, assignment).deadlocked_components()
+    assert len(ring) == 2 * n
@@ -0,0 +1,19 @@
+from policy_sim import POLICIES, BankersPolicy, Simulation, compare, make_workload
+
+
+def test_bankers_policy_rejects_a_claim_beyond_capacity():
+    # J0 needs both units of a single-unit resource, one step after the other
+    workload = [(0.0, [(0, 1, 1.0), (0, 1, 1.0)]), (0.5, [(0, 1, 1.0)])]
+    result = Simulation([1], workload, BankersPolicy()).run()
+    assert (result.rejected, result.completed) == (1, 1)
+    assert result.to_dict()["unfinished"] == 1
+
+
+def test_every_policy_finishes_a_light_workload():
+    capacities = [2] * 4
+    workload = make_workload(200, capacities, steps=2, interarrival=5.0, seed=1)
+    for result in compare(workload, capacities):
+        assert result.policy in POLICIES
+        assert result.rejected == 0
+        if result.policy != "none":
+            assert result.completed == 200
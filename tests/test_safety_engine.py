@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import safety_engine
+from safety_engine import SafetyEngine, check_safety
+
+
+def textbook(allocation, maximum, available):
+    # The original scan: restart from P0 after every process that finishes
+    need = [[mx - al for al, mx in zip(a, m)] for a, m in zip(allocation, maximum)]
+    work = list(available)
+    done = [False] * len(allocation)
+    sequence = []
+    progressed = True
+    while progressed:
+        progressed = False
+        for i, row in enumerate(need):
+            if not done[i] and all(n <= w for n, w in zip(row, work)):
+                done[i] = progressed = True
+                sequence.append(i)
+                work = [w + a for w, a in zip(work, allocation[i])]
+                break
+    return sequence, work
+
+
+def random_state(rng, n, m):
+    allocation = rng.integers(0, 4, (n, m))
+    maximum = allocation + rng.integers(0, 6, (n, m))
+    return allocation, maximum, rng.integers(0, 8, m)
+
+
+def test_textbook_example():
+    allocation = [[0, 1, 0], [2, 0, 0], [3, 0, 2], [2, 1, 1], [0, 0, 2]]
+    maximum = [[7, 5, 3], [3, 2, 2], [9, 0, 2], [2, 2, 2], [4, 3, 3]]
+    result = check_safety(allocation, maximum, [3, 3, 2])
+    assert result.safe
+    assert result.sequence == [1, 3, 0, 2, 4]
+    assert result.work == [10, 5, 7]
+
+
+def test_matches_the_textbook_scan():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        state = [part.tolist() for part in random_state(rng, int(rng.integers(1, 30)), int(rng.integers(1, 5)))]
+        result = SafetyEngine(*state).run()
+        sequence, work = textbook(*state)
+        assert result.sequence == sequence
+        assert result.work == work
+        assert result.unfinished == sorted(set(range(len(state[0]))) - set(sequence))
+
+
+def test_rounds_agree_with_the_scalar_scan(monkeypatch):
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        allocation, maximum, available = random_state(rng, int(rng.integers(1, 300)), int(rng.integers(0, 6)))
+        scalar = SafetyEngine(allocation, maximum, available).run()
+        monkeypatch.setattr(safety_engine, "VECTOR_CELLS", 0)
+        engine = SafetyEngine(allocation, maximum, available)
+        monkeypatch.undo()
+        assert engine.vectorized
+        result = engine.run()
+        assert (result.safe, result.unfinished, result.work) == (scalar.safe, scalar.unfinished, scalar.work)
+        # Processes ready in the same round may finish in another order, but each must fit
+        work = available.copy()
+        for i in result.sequence:
+            assert (maximum[i] - allocation[i] <= work).all()
+            work += allocation[i]
+
+
+def test_chain_of_single_releases_hands_off(monkeypatch):
+    # Each process frees exactly what the next one needs, so rounds stop paying off
+    monkeypatch.setattr(safety_engine, "VECTOR_CELLS", 0)
+    n = 500
+    allocation = np.ones((n, 2), dtype=np.int64)
+    maximum = allocation + np.arange(n)[::-1, None]
+    result = check_safety(allocation, maximum, [0, 0])
+    assert result.safe
+    assert result.sequence == list(range(n))[::-1]
+
+
+def test_large_state_errors_name_the_process(monkeypatch):
+    monkeypatch.setattr(safety_engine, "VECTOR_CELLS", 0)
+    with pytest.raises(ValueError, match="P1 holds more"):
+        SafetyEngine(np.array([[0, 0], [2, 0]]), np.array([[1, 1], [1, 1]]), [1, 1])
+    with pytest.raises(ValueError, match="P1 must list exactly 2"):
+        SafetyEngine([[0, 0], [0]], [[1, 1], [1]], [1, 1])
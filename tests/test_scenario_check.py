@@ -0,0 +1,32 @@
+import numpy as np
+
+from scenario_check import _check, analyze, unstack
+
+
+def write_stack(path, **arrays):
+    np.savez(path, **arrays)
+    return str(path)
+
+
+def test_stack_records_match_single_scenarios(tmp_path):
+    rng = np.random.default_rng(9)
+    allocation = rng.integers(0, 3, (40, 5, 3))
+    arrays = {"allocation": allocation, "maximum": allocation + rng.integers(0, 4, (40, 5, 3)),
+              "available": rng.integers(0, 4, (40, 3)), "processes": np.array(list("ABCDE"))}
+    path = write_stack(tmp_path / "stack.npz", **arrays)
+    for cache in (None, str(tmp_path / "verdicts.sqlite")):
+        _, results, _, error = _check(path, cache)
+        assert error is None and len(results) == 40
+        for s, result in enumerate(results):
+            expected = analyze(unstack(arrays, s))["banker"]
+            assert result["banker"]["safe"] == expected["safe"]
+            assert result["banker"]["unfinished"] == expected["unfinished"]
+            # Processes ready in the same round may finish in another order
+            assert sorted(result["banker"]["sequence"]) == sorted(expected["sequence"])
+
+
+def test_stack_missing_available_is_a_file_error(tmp_path):
+    allocation = np.zeros((2, 2, 1), dtype=int)
+    path = write_stack(tmp_path / "bad.npz", allocation=allocation, maximum=allocation + 1)
+    _, results, _, error = _check(path)
+    assert results == [] and error == "ValueError: NPZ stack has maximum but no available"
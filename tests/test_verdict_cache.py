@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from safety_engine import check_safety
+from verdict_cache import DiskTier, Verdict, VerdictCache, state_key
+
+
+def random_state(rng, n=6, m=3):
+    allocation = rng.integers(0, 3, (n, m))
+    return allocation, allocation + rng.integers(0, 4, (n, m)), rng.integers(0, 5, m)
+
+
+def same_result(a, b):
+    return (a.safe, a.sequence, a.unfinished, a.work, np.asarray(a.need).tolist()) == \
+           (b.safe, b.sequence, b.unfinished, b.work, np.asarray(b.need).tolist())
+
+
+def test_state_key():
+    rng = np.random.default_rng(0)
+    allocation, maximum, available = random_state(rng)
+    key = state_key(allocation, maximum, available)
+    assert state_key(allocation.tolist(), maximum.astype(np.int32), tuple(available)) == key
+    assert state_key(allocation.astype(float), maximum, available) == key
+    assert state_key(allocation.reshape(3, 6), maximum.reshape(3, 6), np.append(available, [0] * 3)) != key
+    with pytest.raises(ValueError):
+        state_key(allocation + 0.5, maximum, available)
+    with pytest.raises(TypeError):
+        state_key(allocation.astype(str), maximum, available)
+
+
+def test_hits_return_the_engine_result():
+    rng = np.random.default_rng(1)
+    cache = VerdictCache()
+    states = [random_state(rng) for _ in range(20)]
+    for state in states + states:
+        assert same_result(cache.check(*state), check_safety(*state))
+    assert (cache.hits, cache.misses) == (20, 20)
+    assert cache.hit_rate == 0.5
+
+
+def test_lru_eviction_by_bytes():
+    rng = np.random.default_rng(2)
+    states = [random_state(rng) for _ in range(5)]
+    size = Verdict.from_result(check_safety(*states[0])).nbytes
+    cache = VerdictCache(max_bytes=3 * size)
+    for state in states[:3]:
+        cache.check(*state)
+    cache.check(*states[0])             # now the most recently used
+    cache.check(*states[3])             # evicts states[1]
+    assert cache.evictions == 1
+    assert cache.bytes == 3 * size
+    keys = list(cache.entries)
+    assert keys == [state_key(*s) for s in (states[2], states[0], states[3])]
+    hits = cache.hits
+    cache.check(*states[1])
+    assert cache.hits == hits and cache.misses == 5
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    rng = np.random.default_rng(3)
+    path = str(tmp_path / "verdicts.sqlite")
+    states = [random_state(rng) for _ in range(10)]
+    first = VerdictCache(path=path)
+    for state in states:
+        first.check(*state)
+    first.close()
+    assert len(DiskTier(path)) == 10
+
+    second = VerdictCache(path=path)
+    for state in states:
+        assert same_result(second.check(*state), check_safety(*state))
+    assert (second.disk_hits, second.misses) == (10, 0)
+    second.clear()
+    assert len(second.entries) == 0 and len(second.disk) == 0
+    second.close()
@@ -0,0 +1,79 @@
+import time
+from collections import deque
+
+
+class EventStore:
+    """Ring buffer of the latest events plus per-bucket event counts.
+
+    Both are capped, so memory stays constant however long the app runs.
+    """
+
+    def __init__(self, capacity=1000, bucket_seconds=1.0, max_buckets=600, clock=time.monotonic):
+        self.events = deque(maxlen=capacity)
+        self.buckets = deque(maxlen=max_buckets)     # [bucket start in seconds, count]
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.start = clock()
+        self.total = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def append(self, message, timestamp=None):
+        """Store an event; returns the event that fell off the buffer, if any."""
+        now = self.clock() - self.start if timestamp is None else timestamp
+        evicted = self.events[0] if len(self.events) == self.events.maxlen else None
+        self.events.append((now, message))
+        self.total += 1
+
+        bucket = int(now // self.bucket_seconds) * self.bucket_seconds
+        if self.buckets and self.buckets[-1][0] == bucket:
+            self.buckets[-1][1] += 1
+        else:
+            if self.buckets:
+                # Zero buckets on both sides of an idle gap so the rate drops back down
+                last = self.buckets[-1][0]
+                if bucket - last > self.bucket_seconds:
+                    self.buckets.append([last + self.bucket_seconds, 0])
+                if bucket - last > 2 * self.bucket_seconds:
+                    self.buckets.append([bucket - self.bucket_seconds, 0])
+            self.buckets.append([bucket, 1])
+        return evicted
+
+    def rate_series(self):
+        # (bucket starts, events per second) ready for Line2D.set_data
+        xs = [b for b, _ in self.buckets]
+        ys = [c / self.bucket_seconds for _, c in self.buckets]
+        return xs, ys
+
+
+class RedrawCoalescer:
+    """Collapses redraw requests so `draw` runs at most `max_fps` times a second.
+
+    Requests that arrive while a frame is already scheduled are merged into
+    it; scheduling goes through Tk's `after`, so drawing stays on the main loop.
+    """
+
+    def __init__(self, widget, draw, max_fps=10, clock=time.monotonic):
+        self.widget = widget
+        self.draw = draw
+        self.interval = 1.0 / max_fps
+        self.clock = clock
+        self.last_draw = float("-inf")
+        self.pending = None
+
+    def request(self):
+        if self.pending is not None:
+            return
+        wait = max(self.last_draw + self.interval - self.clock(), 0)
+        self.pending = self.widget.after(int(wait * 1000), self._run)
+
+    def _run(self):
+        self.pending = None
+        self.last_draw = self.clock()
+        self.draw()
+
+    def cancel(self):
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
@@ -0,0 +1,227 @@
+import argparse
+import csv
+import json
+import time
+
+from cycle_detection import deadlocked_components
+from graph_reduction import detect_deadlock
+from wait_for_builder import build_wait_for_graph
+
+OPS = ("start", "exit", "request", "acquire", "release")
+
+
+class TraceEvent:
+    __slots__ = ("ts", "op", "pid", "rid", "count")
+
+    def __init__(self, ts, op, pid, rid=None, count=1):
+        if op not in OPS:
+            raise ValueError(f"Unknown trace op '{op}'")
+        self.ts = ts
+        self.op = op
+        self.pid = pid
+        self.rid = rid
+        self.count = count
+
+    def __repr__(self):
+        return f"TraceEvent({self.ts}, {self.op}, {self.pid}, {self.rid}, {self.count})"
+
+
+def _event_from_record(record):
+    count = record.get("count")
+    rid = record.get("rid")
+    return TraceEvent(float(record.get("ts") or 0), record["op"], str(record["pid"]),
+                      str(rid) if rid not in (None, "") else None,
+                      int(count) if count not in (None, "") else 1)
+
+
+def read_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield _event_from_record(json.loads(line))
+
+
+def read_csv(lines):
+    # Header row with at least ts, op, pid; rid and count are optional
+    for record in csv.DictReader(lines):
+        yield _event_from_record(record)
+
+
+def read_events(path):
+    """Stream events from a JSONL or CSV trace one line at a time."""
+    reader = read_csv if path.endswith(".csv") else read_jsonl
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from reader(f)
+
+
+class LiveState:
+    """Current holds and pending requests; sized by live processes, not trace length."""
+
+    def __init__(self):
+        self.held = {}          # pid -> {rid: count}
+        self.waiting = {}       # pid -> {rid: count}
+        self.holders = {}       # rid -> {pid: count}
+
+    def apply(self, event):
+        op, pid, rid, count = event.op, event.pid, event.rid, event.count
+        if op == "start":
+            self.held.setdefault(pid, {})
+        elif op == "exit":
+            for r in self.held.pop(pid, {}):
+                self._drop_holder(r, pid)
+            self.waiting.pop(pid, None)
+        elif op == "request":
+            waits = self.waiting.setdefault(pid, {})
+            waits[rid] = waits.get(rid, 0) + count
+        elif op == "acquire":
+            waits = self.waiting.get(pid)
+            if waits and rid in waits:
+                waits[rid] -= count
+                if waits[rid] <= 0:
+                    del waits[rid]
+                if not waits:
+                    del self.waiting[pid]
+            held = self.held.setdefault(pid, {})
+            held[rid] = held.get(rid, 0) + count
+            holders = self.holders.setdefault(rid, {})
+            holders[pid] = holders.get(pid, 0) + count
+        elif op == "release":
+            held = self.held.get(pid, {})
+            if rid in held:
+                held[rid] -= count
+                if held[rid] <= 0:
+                    del held[rid]
+                    self._drop_holder(rid, pid)
+                else:
+                    self.holders[rid][pid] -= count
+
+    def _drop_holder(self, rid, pid):
+        holders = self.holders.get(rid)
+        if holders is not None:
+            holders.pop(pid, None)
+            if not holders:
+                del self.holders[rid]
+
+    def wait_for_graph(self):
+        return build_wait_for_graph(self.held, self.waiting)
+
+    def resource_allocation_graph(self):
+        # Nodes are ("P", pid) and ("R", rid), so a pid and a rid with the same name stay apart
+        graph = {}
+        for pid, waits in self.waiting.items():
+            graph[("P", pid)] = [("R", rid) for rid in waits]
+        for rid, holders in self.holders.items():
+            graph[("R", rid)] = [("P", pid) for pid in holders]
+        return graph
+
+    def reduction(self, capacities):
+        # A process that waits for nothing always reduces, and a resource nobody
+        # waits for blocks nobody, so only waiting processes and the resources
+        # they request take part; holders that are not waiting count as free.
+        pids = sorted(self.waiting)
+        rids = sorted({r for waits in self.waiting.values() for r in waits if r in capacities})
+        allocation = [[self.held.get(p, {}).get(r, 0) for r in rids] for p in pids]
+        request = [[self.waiting[p].get(r, 0) for r in rids] for p in pids]
+        available = [capacities[r] - sum(c for q, c in self.holders.get(r, {}).items() if q in self.waiting)
+                     for r in rids]
+        result = detect_deadlock(allocation, request, available)
+        return [pids[i] for i in result.deadlocked]
+
+
+class CheckpointReport:
+    def __init__(self, events, ts, findings):
+        self.events = events        # events consumed so far
+        self.ts = ts                # trace timestamp of the last event
+        self.findings = findings    # detector name -> deadlocked sets / processes
+
+    @property
+    def has_deadlock(self):
+        return any(self.findings.values())
+
+    def to_dict(self):
+        return {"events": self.events, "ts": self.ts, "findings": self.findings}
+
+
+class TraceIngestor:
+    """Replays an event stream into LiveState and runs detectors at checkpoints.
+
+    A checkpoint fires every `every_events` events and/or whenever trace time
+    advances by `every_seconds`. Detectors: "wait_for" and "rag" report
+    deadlocked strongly connected components; "reduction" needs per-resource
+    `capacities` and reports the deadlocked processes for multi-instance
+    resources.
+    """
+
+    def __init__(self, every_events=10000, every_seconds=None, detectors=("wait_for", "rag"), capacities=None):
+        if "reduction" in detectors and capacities is None:
+            raise ValueError("The reduction detector needs resource capacities.")
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.detectors = detectors
+        self.capacities = capacities
+        self.state = LiveState()
+        self.events = 0
+        self.elapsed = 0.0
+
+    @property
+    def events_per_second(self):
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    def checkpoint(self, ts):
+        findings = {}
+        if "wait_for" in self.detectors:
+            findings["wait_for"] = deadlocked_components(self.state.wait_for_graph())
+        if "rag" in self.detectors:
+            findings["rag"] = deadlocked_components(self.state.resource_allocation_graph())
+        if "reduction" in self.detectors:
+            findings["reduction"] = self.state.reduction(self.capacities)
+        return CheckpointReport(self.events, ts, findings)
+
+    def run(self, events):
+        """Consume `events` lazily, yielding a CheckpointReport at each checkpoint."""
+        start = time.perf_counter()
+        next_ts = None
+        ts = None
+        reported = False
+        try:
+            for event in events:
+                self.state.apply(event)
+                self.events += 1
+                ts = event.ts
+                due = self.every_events and self.events % self.every_events == 0
+                if self.every_seconds:
+                    if next_ts is None:
+                        next_ts = ts + self.every_seconds
+                    elif ts >= next_ts:
+                        due = True
+                        next_ts = ts + self.every_seconds
+                reported = bool(due)
+                if due:
+                    self.elapsed = time.perf_counter() - start
+                    yield self.checkpoint(ts)
+            # Always report the final state, unless the last event just did
+            if not reported:
+                yield self.checkpoint(ts)
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a lock trace through the deadlock detectors.")
+    parser.add_argument("trace", help="JSONL or CSV trace (ts, op, pid, rid, count)")
+    parser.add_argument("--every", type=int, default=10000, help="checkpoint every N events")
+    parser.add_argument("--every-seconds", type=float, help="checkpoint every N seconds of trace time")
+    parser.add_argument("--detectors", default="wait_for,rag", help="comma-separated: wait_for, rag, reduction")
+    parser.add_argument("--capacities", help="JSON object of resource -> instances (for reduction)")
+    args = parser.parse_args()
+
+    capacities = json.loads(args.capacities) if args.capacities else None
+    ingestor = TraceIngestor(args.every, args.every_seconds, tuple(args.detectors.split(",")), capacities)
+    for report in ingestor.run(read_events(args.trace)):
+        if report.has_deadlock:
+            print(json.dumps(report.to_dict()))
+    print(f"{ingestor.events} events in {ingestor.elapsed:.2f}s ({ingestor.events_per_second:,.0f} events/s)")
+
+
+if __name__ == "__main__":
+    main()
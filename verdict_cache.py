@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from safety_engine import SafetyEngine, SafetyResult
+
+ENTRY_OVERHEAD = 200    # rough bytes per cached entry besides its arrays
+
+
+def state_key(allocation, maximum, available):
+    """Canonical digest of a Banker's state.
+
+    Equal matrices give equal keys whether they come as lists, tuples or
+    arrays of any integer dtype; the shapes are hashed too, so a 2x3 and a
+    3x2 state never collide. Values that are not integers (1.5, "2") raise
+    ValueError or TypeError instead of being truncated into another state's key.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (allocation, maximum, available):
+        array = np.asarray(part)
+        if array.dtype.kind == "f":
+            if not (np.isfinite(array).all() and np.array_equal(array, np.trunc(array))):
+                raise ValueError("State values must be integers.")
+        elif array.dtype.kind not in "iub":
+            raise TypeError(f"State values must be integers, got {array.dtype}.")
+        array = np.ascontiguousarray(array, dtype=np.int64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.digest()
+
+
+class Verdict:
+    __slots__ = ("safe", "sequence", "unfinished", "work")
+
+    def __init__(self, safe, sequence, unfinished, work):
+        self.safe = bool(safe)
+        self.sequence = np.asarray(sequence, dtype=np.int32)
+        self.unfinished = np.asarray(unfinished, dtype=np.int32)
+        self.work = np.asarray(work, dtype=np.int64)
+
+    @classmethod
+    def from_result(cls, result):
+        return cls(result.safe, result.sequence, result.unfinished, result.work)
+
+    def to_result(self, need):
+        return SafetyResult(self.safe, self.sequence.tolist(), self.unfinished.tolist(), self.work.tolist(), need)
+
+    @property
+    def nbytes(self):
+        return ENTRY_OVERHEAD + self.sequence.nbytes + self.unfinished.nbytes + self.work.nbytes
+
+
+class DiskTier:
+    """Verdicts persisted in an SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._pid = None
+
+    @property
+    def db(self):
+        # One connection per process, so a cache survives being forked into pool workers
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS verdicts (key BLOB PRIMARY KEY, safe INTEGER,"
+                             " sequence BLOB, unfinished BLOB, work BLOB)")
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key):
+        row = self.db.execute("SELECT safe, sequence, unfinished, work FROM verdicts WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            return None
+        safe, sequence, unfinished, work = row
+        return Verdict(safe, np.frombuffer(sequence, np.int32), np.frombuffer(unfinished, np.int32),
+                       np.frombuffer(work, np.int64))
+
+    def put(self, key, verdict):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)",
+                            (key, int(verdict.safe), verdict.sequence.tobytes(), verdict.unfinished.tobytes(),
+                             verdict.work.tobytes()))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM verdicts")
+
+    def close(self):
+        if self._db is not None and self._pid == os.getpid():
+            self._db.close()
+        self._db = self._pid = None
+
+
+class VerdictCache:
+    """Safety verdicts memoized by state, for what-if edits and repeated sweeps.
+
+    An in-memory LRU holds up to `max_bytes` of verdicts; with a `path`, an
+    SQLite tier behind it keeps them across runs and processes. A hit skips
+    the safety loop entirely and only rebuilds `need`, which is one
+    vectorized subtraction.
+    """
+
+    def __init__(self, max_bytes=64 << 20, path=None):
+        self.max_bytes = max_bytes
+        self.disk = DiskTier(path) if path else None
+        self.entries = OrderedDict()    # key -> Verdict, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        verdict = self.entries.get(key)
+        if verdict is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            metrics.count("verdict_cache_hits")
+            return verdict
+        if self.disk is not None:
+            verdict = self.disk.get(key)
+            if verdict is not None:
+                self.disk_hits += 1
+                metrics.count("verdict_cache_disk_hits")
+                self._remember(key, verdict)
+                return verdict
+        self.misses += 1
+        metrics.count("verdict_cache_misses")
+        return None
+
+    def put(self, key, verdict):
+        self._remember(key, verdict)
+        if self.disk is not None:
+            self.disk.put(key, verdict)
+
+    def _remember(self, key, verdict):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.nbytes
+        if verdict.nbytes > self.max_bytes:
+            return
+        self.entries[key] = verdict
+        self.bytes += verdict.nbytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def check(self, allocation, maximum, available):
+        """Same SafetyResult as `check_safety`, served from the cache when the state was seen before."""
+        try:
+            key = state_key(allocation, maximum, available)
+        except (ValueError, TypeError, OverflowError):
+            # Ragged or non-integer input: let the engine report it
+            return SafetyEngine(allocation, maximum, available).run()
+        verdict = self.get(key)
+        if verdict is None:
+            result = SafetyEngine(allocation, maximum, available).run()
+            self.put(key, Verdict.from_result(result))
+            return result
+        need = (np.asarray(maximum, dtype=np.int64) - np.asarray(allocation, dtype=np.int64)).tolist()
+        return verdict.to_result(need)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": self.hit_rate, "evictions": self.evictions,
+                "entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+_shared = {}
+
+
+def shared(path=None, max_bytes=64 << 20):
+    """The cache this process uses for `path`; pool workers each get their own memory tier."""
+    key = (os.getpid(), path)
+    if key not in _shared:
+        _shared[key] = VerdictCache(max_bytes, path)
+    return _shared[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear a persistent safety-verdict cache.")
+    parser.add_argument("path", help="SQLite cache file")
+    parser.add_argument("--clear", action="store_true", help="delete every cached verdict")
+    args = parser.parse_args()
+
+    disk = DiskTier(args.path)
+    if args.clear:
+        disk.clear()
+    count = len(disk)
+    disk.close()    # checkpoints the WAL, so the file size below is current
+    print(f"{count} verdicts, {os.path.getsize(args.path):,} bytes in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
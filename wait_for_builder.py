@@ -0,0 +1,70 @@
+import metrics
+
+
+def index_holders(held):
+    # Inverted index resource -> processes holding it
+    holders = {}
+    for p, resources in held.items():
+        for r in resources:
+            holders.setdefault(r, []).append(p)
+    return holders
+
+
+def wait_for_reasons(held, requested, holders=None):
+    """Yield (waiting process, resource, holder) for every blocked request.
+
+    `held` and `requested` map each process to the resources it holds and is
+    waiting for (any iterable, so a process may hold or want several). With
+    the inverted holder index this is O(total holds + requests + edges)
+    instead of comparing every pair of processes.
+    """
+    if holders is None:
+        holders = index_holders(held)
+    for p, resources in requested.items():
+        for r in resources:
+            for q in holders.get(r, ()):
+                if q != p:
+                    yield p, r, q
+
+
+def names(scenario):
+    # Process and resource names, defaulting to P0.. and R0..
+    rows = scenario.get("allocation") or scenario.get("maximum") or scenario.get("request") or []
+    processes = scenario.get("processes") or [f"P{i}" for i in range(len(rows))]
+    resources = scenario.get("resources") or [f"R{j}" for j in range(len(rows[0]) if rows else 0)]
+    return processes, resources
+
+
+def held_and_requested(scenario):
+    """Resources each process holds and waits for, as name lists.
+
+    Taken from the held/requested keys when present, otherwise derived from
+    the matrices: only requests that cannot be served from the free pool
+    make a process wait.
+    """
+    if "held" in scenario or "requested" in scenario:
+        return scenario.get("held", {}), scenario.get("requested", {})
+    processes, resources = names(scenario)
+    available = scenario.get("available", [0] * len(resources))
+    held = {p: [r for r, a in zip(resources, row) if a]
+            for p, row in zip(processes, scenario.get("allocation", []))}
+    requested = {p: [r for r, q, free in zip(resources, row, available) if q > free]
+                 for p, row in zip(processes, scenario.get("request", []))}
+    return held, requested
+
+
+def build_wait_for_graph(held, requested, processes=None):
+    """Return the wait-for graph as {process: [processes it waits for]}."""
+    graph = {p: [] for p in processes} if processes is not None else {}
+    for p in held:
+        graph.setdefault(p, [])
+    for p in requested:
+        graph.setdefault(p, [])
+    seen = set()
+    with metrics.phase("build_wait_for"):
+        for p, _, q in wait_for_reasons(held, requested):
+            if (p, q) not in seen:
+                seen.add((p, q))
+                graph[p].append(q)
+    metrics.count("wait_for_edges", len(seen))
+    return graph
@@ -1,6 +1,10 @@
 import tkinter as tk
 from tkinter import messagebox
-import math
+
+import metrics
+from graph_canvas import GraphRenderer
+from graph_layout import LayoutCache, fit
+from wait_for_builder import build_wait_for_graph, held_and_requested, wait_for_reasons
 
 class WaitForGraphVisualizer:
     def __init__(self, master):
@@ -14,6 +18,7 @@ class WaitForGraphVisualizer:
         self.edges = []
         self.cycle_nodes = set()
         self.cycle_path = []
+        self.layouts = LayoutCache()
 
         # Compact canvas
         self.canvas = tk.Canvas(master, width=900, height=600, bg="white", scrollregion=(0, 0, 900, 600))
@@ -25,6 +30,10 @@ class WaitForGraphVisualizer:
         self.h_scroll.grid(row=1, column=1, sticky="ew")
 
         self.canvas.configure(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
+        self.renderer = GraphRenderer(self.canvas, node_radius=30, font=("Arial", 12, "bold"),
+                                      edge_fill="green", edge_width=3)
+        self.v_scroll.configure(command=self.renderer.yview)
+        self.h_scroll.configure(command=self.renderer.xview)
 
         # Controls on left
         self.controls_frame = tk.Frame(master)
@@ -53,35 +62,27 @@ class WaitForGraphVisualizer:
         self.output_box.grid(row=2, column=0, columnspan=3, padx=10, pady=10, sticky="ew")
 
     def setup_graph(self):
-        self.canvas.delete("all")
         self.output_box.delete("1.0", tk.END)
         self.cycle_nodes.clear()
         self.cycle_path = []
 
         try:
-            self.processes = [p.strip() for p in self.proc_entry.get().split(",")]
-            self.resources = [r.strip() for r in self.res_entry.get().split(",")]
-
-            held_pairs = [pair.strip() for pair in self.held_entry.get().split(",")]
-            self.held_resources = {p.split(":")[0]: p.split(":")[1] for p in held_pairs}
-
-            req_pairs = [pair.strip() for pair in self.req_entry.get().split(",")]
-            self.requested_resources = {p.split(":")[0]: p.split(":")[1] for p in req_pairs}
-
+            with metrics.phase("parse"):
+                self.processes = [p.strip() for p in self.proc_entry.get().split(",") if p.strip()]
+                self.resources = [r.strip() for r in self.res_entry.get().split(",") if r.strip()]
+                self.held_resources = self.parse_pairs(self.held_entry.get())
+                self.requested_resources = self.parse_pairs(self.req_entry.get())
         except Exception as e:
             messagebox.showerror("Input Error", f"Invalid input format. Error: {e}")
             return
 
-        self.edges = []
-        for p in self.processes:
-            held = self.held_resources.get(p)
-            requested = self.requested_resources.get(p)
-
-            if held and requested:
-                for other_p, other_held in self.held_resources.items():
-                    if other_held == requested:
-                        self.edges.append((p, other_p))
-                        self.output_box.insert(tk.END, f"🔍 {p} holds {held}, requests {requested} → waiting for {other_p}\n")
+        # Processes only mentioned in the held/requested fields still take part
+        graph = build_wait_for_graph(self.held_resources, self.requested_resources, self.processes)
+        self.processes = list(graph)
+        self.edges = [(p, q) for p, targets in graph.items() for q in targets]
+        for p, r, other_p in wait_for_reasons(self.held_resources, self.requested_resources):
+            held = ", ".join(self.held_resources.get(p, [])) or "nothing"
+            self.output_box.insert(tk.END, f"🔍 {p} holds {held}, requests {r} → waiting for {other_p}\n")
 
         has_cycle = self.detect_cycle()
         self.draw_graph()
@@ -92,26 +93,54 @@ class WaitForGraphVisualizer:
         else:
             self.output_box.insert(tk.END, "\n✅ No Deadlock. System is safe.\n")
 
+    def load_scenario(self, scenario):
+        # Fills the inputs from a scenario shared by the hub and redraws
+        held, requested = held_and_requested(scenario)
+        processes = list(dict.fromkeys(scenario.get("processes", []) + list(held) + list(requested)))
+        resources = list(dict.fromkeys(r for rs in list(held.values()) + list(requested.values()) for r in rs))
+        fields = ((self.proc_entry, ",".join(processes)), (self.res_entry, ",".join(resources)),
+                  (self.held_entry, ",".join(f"{p}:{r}" for p, rs in held.items() for r in rs)),
+                  (self.req_entry, ",".join(f"{p}:{r}" for p, rs in requested.items() for r in rs)))
+        for entry, text in fields:
+            entry.delete(0, tk.END)
+            entry.insert(0, text)
+        self.setup_graph()
+
+    def parse_pairs(self, text):
+        # "P1:R1,P1:R2,P2:R3" -> {"P1": ["R1", "R2"], "P2": ["R3"]}
+        pairs = {}
+        for pair in text.split(","):
+            if not pair.strip():
+                continue
+            p, r = (part.strip() for part in pair.split(":"))
+            if not p or not r:
+                raise ValueError(f"'{pair.strip()}' is not a P:R pair")
+            resources = pairs.setdefault(p, [])
+            if r not in resources:
+                resources.append(r)
+        return pairs
+
     def draw_graph(self):
-        positions = {}
         radius = 30
-        center_x, center_y = 450, 300
-        angle_step = 360 / len(self.processes) if self.processes else 1
-
-        for i, p in enumerate(self.processes):
-            angle = math.radians(i * angle_step)
-            x = center_x + 200 * math.cos(angle)
-            y = center_y + 200 * math.sin(angle)
-            positions[p] = (x, y)
+        graph = {p: [] for p in self.processes}
+        for src, dst in self.edges:
+            graph[src].append(dst)
+        # Force-directed; small edits refine the previous picture instead of redrawing from scratch
+        side = max(1.0, len(self.processes) ** 0.5 / 6)
+        width, height = 900 * side, 600 * side
+        positions = fit(self.layouts.layout("wait-for", graph), width, height, margin=radius + 10)
+        # Upserts the current nodes and edges; only the ones that are gone get deleted
+        self.renderer.retain(self.processes, self.edges)
+
+        for p in self.processes:
+            x, y = positions[p]
             node_color = "#FFD54F" if p not in self.cycle_nodes else "#FF6F61"
-            self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill=node_color, outline="black", width=2)
-            self.canvas.create_text(x, y, text=p, font=("Arial", 12, "bold"))
+            self.renderer.add_node(p, x, y, "oval", node_color, p in self.cycle_nodes)
 
         for (src, dst) in self.edges:
-            x1, y1 = positions[src]
-            x2, y2 = positions[dst]
-            edge_color = "red" if src in self.cycle_nodes and dst in self.cycle_nodes else "green"
-            self.canvas.create_line(x1, y1, x2, y2, arrow=tk.LAST, width=3, fill=edge_color)
+            in_cycle = src in self.cycle_nodes and dst in self.cycle_nodes
+            self.renderer.add_edge((src, dst), *positions[src], *positions[dst], in_cycle)
+        self.renderer.set_world(width, height)
 
     def detect_cycle(self):
         graph = {p: [] for p in self.processes}
@@ -137,13 +166,18 @@ class WaitForGraphVisualizer:
             path.pop()
             return False
 
-        for node in self.processes:
-            if node not in visited:
-                if dfs(node, []):
-                    return True
-        return False
+        found = False
+        with metrics.phase("detect_cycle"):
+            for node in self.processes:
+                if node not in visited and dfs(node, []):
+                    found = True
+                    break
+        metrics.count("nodes_visited", len(visited))
+        metrics.count("cycles_found", found)
+        return found
 
 if __name__ == "__main__":
+    metrics.enable_from_env()
     root = tk.Tk()
     root.geometry("1500x900")
     app = WaitForGraphVisualizer(root)